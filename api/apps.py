@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+
+        from . import jobs, metrics, signals, tasks  # noqa: F401
+
+        # Cada conexión (también las que abran otros hilos) cuenta sus consultas para /metrics
+        connection_created.connect(metrics.install)
+        for connection in connections.all():
+            metrics.install(connection)
+        # Estado de la cola de tareas en segundo plano
+        metrics.registry.add_collector(jobs.collect_metrics)
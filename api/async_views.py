@@ -0,0 +1,175 @@
+import asyncio
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .events import get_broker
+from .mixins import menu_cache_variant
+from .models import Order
+from .renderers import FastJSONRenderer
+from .serializers import CategorySerializer, DishSerializer, TableSerializer, OrderSerializer
+from .services import CategoryService, DishService, TableService, OrderService
+
+# Vistas asíncronas de lectura para ASGI: no ocupan un hilo mientras esperan
+# a la base de datos o a clientes lentos. Las vistas síncronas de views.py
+# siguen disponibles con las mismas respuestas.
+
+
+def authenticate(request):
+    """Usuario según los autenticadores configurados en DRF (p. ej. Basic) o None"""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except exceptions.APIException:
+        return None
+    return user if user.is_authenticated else None
+
+
+def async_login_required(view):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated and 'HTTP_AUTHORIZATION' in request.META:
+            # Mismas credenciales que la API síncrona (Basic, etc.); la sesión no necesita el hilo
+            user = await sync_to_async(authenticate)(request)
+            if user is not None:
+                request.user = user
+        if user is None or not user.is_authenticated:
+            return json_response({"error": "Authentication required"}, status_code=status.HTTP_401_UNAUTHORIZED)
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    # Mismo renderer que las vistas de DRF, para respuestas idénticas a las síncronas
+    return HttpResponse(FastJSONRenderer().render(data), status=status_code, content_type='application/json')
+
+
+def serialize_many(serializer_class, request):
+    context = {'request': request}
+    return lambda objects: list(serializer_class(objects, many=True, context=context).data)
+
+
+@require_GET
+@async_login_required
+async def menu_categories(request):
+    active_only = request.GET.get('active_only', 'true').lower() == 'true'
+    data = await CategoryService.aget_cached_categories(
+        serialize_many(CategorySerializer, request),
+        active_only=active_only, variant=menu_cache_variant(CategorySerializer, request)
+    )
+    return json_response(data)
+
+
+@require_GET
+@async_login_required
+async def menu_dishes(request):
+    available_only = request.GET.get('available_only', 'true').lower() == 'true'
+    data = await DishService.aget_cached_dishes(
+        serialize_many(DishSerializer, request), available_only=available_only,
+        category_id=request.GET.get('category_id'), variant=menu_cache_variant(DishSerializer, request)
+    )
+    return json_response(data)
+
+
+@require_GET
+@async_login_required
+async def featured_dishes(request):
+    data = await DishService.aget_cached_featured_dishes(
+        serialize_many(DishSerializer, request), variant=menu_cache_variant(DishSerializer, request)
+    )
+    return json_response(data)
+
+
+@require_GET
+@async_login_required
+async def available_tables(request):
+    tables = await TableService.aget_available_tables()
+    return json_response(serialize_many(TableSerializer, request)(tables))
+
+
+@require_GET
+@async_login_required
+async def orders_by_table(request):
+    table_id = request.GET.get('table_id')
+    if not table_id:
+        return json_response({"error": "Table ID is required"}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    before = request.GET.get('before')
+    if before:
+        before = parse_datetime(before)
+        if before is None:
+            return json_response({"error": "Invalid 'before' timestamp"}, status_code=status.HTTP_400_BAD_REQUEST)
+    before_id = request.GET.get('before_id')
+    if before_id is not None and not before_id.isdigit():
+        return json_response({"error": "Invalid 'before_id'"}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = min(int(request.GET.get('page_size', 50)), 200)
+    except ValueError:
+        return json_response({"error": "Invalid page size"}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    orders = await OrderService.aget_orders_by_table(
+        table_id, limit + 1, before=before, before_id=int(before_id) if before_id else None
+    )
+    next_url = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        query = request.GET.copy()
+        query['before'] = orders[-1].created_at.isoformat()
+        query['before_id'] = orders[-1].id
+        next_url = request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+    return json_response({
+        'next': next_url,
+        'results': serialize_many(OrderSerializer, request)(orders),
+    })
+
+
+@require_GET
+@async_login_required
+async def order_detail(request, pk):
+    try:
+        order = await OrderService.aget_order_by_id(pk)
+    except Order.DoesNotExist:
+        return json_response({"error": "Order not found"}, status_code=status.HTTP_404_NOT_FOUND)
+    return json_response(OrderSerializer(order, context={'request': request}).data)
+
+
+@require_GET
+@async_login_required
+async def order_events(request):
+    """Stream Server-Sent Events de órdenes, items y pagos
+
+    Filtros opcionales por query string: `table`, `status` y `station` (categoría del plato).
+    """
+    filters = {key: request.GET.get(key) for key in ('table', 'status', 'station')}
+    heartbeat = getattr(settings, 'EVENT_HEARTBEAT_SECONDS', 15)
+
+    async def stream():
+        broker = get_broker()
+        subscription = broker.subscribe(filters)
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ': ping\n\n'
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
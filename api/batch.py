@@ -0,0 +1,126 @@
+import json
+import logging
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.viewsets import ViewSetMixin
+
+logger = logging.getLogger(__name__)
+
+# Cabeceras de las sub-respuestas que se devuelven al cliente
+FORWARDED_HEADERS = ('ETag', 'Last-Modified', 'Location')
+
+
+class BatchAborted(Exception):
+    """Interrumpe un lote atómico para deshacer la transacción"""
+
+
+class BatchView(APIView):
+    """Ejecuta varias peticiones a la API en un solo viaje de red
+
+    Cuerpo: {"requests": [{"method": "GET", "url": "/api/tables/1/", "body": {...},
+    "headers": {...}}], "atomic": false}. Las sub-peticiones se resuelven contra el
+    router de la API y se ejecutan en el mismo proceso, con el usuario ya
+    autenticado y la misma conexión a la base de datos. Con "atomic": true todo
+    corre en una transacción que se deshace si alguna sub-petición falla. Las
+    excepciones de una sub-petición se devuelven como su respuesta 500 y los
+    endpoints en streaming (exportaciones) se rechazan con 400.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        requests = request.data.get('requests')
+        max_requests = getattr(settings, 'BATCH_MAX_REQUESTS', 20)
+        if not isinstance(requests, list) or not requests:
+            return Response({"error": "A non-empty list of requests is required"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(requests) > max_requests:
+            return Response({"error": f"At most {max_requests} requests per batch"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        atomic = bool(request.data.get('atomic', False))
+        responses = []
+        rolled_back = False
+        if atomic:
+            try:
+                with transaction.atomic():
+                    for spec in requests:
+                        responses.append(self.run(request, spec))
+                        if responses[-1]['status'] >= 400:
+                            raise BatchAborted
+            except BatchAborted:
+                rolled_back = True
+        else:
+            responses = [self.run(request, spec) for spec in requests]
+
+        return Response({'atomic': atomic, 'rolled_back': rolled_back, 'responses': responses})
+
+    def run(self, request, spec):
+        if not isinstance(spec, dict) or not isinstance(spec.get('url'), str):
+            return {'status': status.HTTP_400_BAD_REQUEST, 'body': {"error": "Each request needs a url"}}
+
+        method = str(spec.get('method', 'GET')).upper()
+        url = urlsplit(spec['url'])
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            match = None
+        # Solo endpoints del router de la API (nada de lotes anidados ni vistas asíncronas)
+        view_class = getattr(match.func, 'cls', None) if match else None
+        if view_class is None or not issubclass(view_class, ViewSetMixin):
+            return {'status': status.HTTP_404_NOT_FOUND, 'body': {"error": f"Unknown endpoint {url.path}"}}
+
+        sub_request = self.build_request(request, method, url, spec)
+        try:
+            response = match.func(sub_request, *match.args, **match.kwargs)
+        except Exception:
+            # Un fallo inesperado es la respuesta de esa sub-petición, no de todo el lote
+            logger.exception("Error en la sub-petición %s %s del lote", method, url.path)
+            return {'status': status.HTTP_500_INTERNAL_SERVER_ERROR, 'body': {"error": "Internal server error"}}
+        if response.streaming:
+            # Exportaciones y similares no caben en el cuerpo JSON del lote
+            response.close()
+            return {'status': status.HTTP_400_BAD_REQUEST,
+                    'body': {"error": f"Streaming endpoint {url.path} is not supported in batches"}}
+        return {
+            'status': response.status_code,
+            'headers': {name: response[name] for name in FORWARDED_HEADERS if name in response},
+            'body': getattr(response, 'data', None),
+        }
+
+    def build_request(self, request, method, url, spec):
+        body = json.dumps(spec['body']).encode() if spec.get('body') is not None else b''
+        # Se heredan las cabeceras del lote salvo las condicionales y la clave de idempotencia,
+        # que son de cada sub-petición
+        environ = {
+            key: value for key, value in request.META.items()
+            if key.startswith(('HTTP_', 'SERVER_', 'REMOTE_'))
+            and not key.startswith('HTTP_IF_') and key != 'HTTP_IDEMPOTENCY_KEY'
+        }
+        environ.update({
+            'REQUEST_METHOD': method,
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': BytesIO(body),
+            'wsgi.url_scheme': request.scheme,
+        })
+        for name, value in (spec.get('headers') or {}).items():
+            environ['HTTP_' + name.upper().replace('-', '_')] = str(value)
+
+        sub_request = WSGIRequest(environ)
+        # Autenticación única: DRF usa este usuario en lugar de volver a autenticar
+        sub_request._force_auth_user = request.user
+        sub_request._dont_enforce_csrf_checks = True
+        sub_request.user = request.user
+        sub_request.session = getattr(request._request, 'session', None)
+        return sub_request
@@ -0,0 +1,67 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+MENU_VERSION_KEY = 'menu:version'
+LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_shared_cache():
+    """Si todos los procesos comparten el cache por defecto (no LocMemCache ni DummyCache)"""
+    return settings.CACHES['default']['BACKEND'] not in LOCAL_BACKENDS
+
+
+def menu_timeout(default):
+    # Con un cache local bump_menu_version solo invalida el proceso que escribió: la
+    # versión y los payloads caducan pronto para que el resto no sirva un menú viejo
+    return default if is_shared_cache() else settings.MENU_LOCAL_CACHE_SECONDS
+
+
+def get_menu_version():
+    """Versión actual del menú; se inicializa si el cache la perdió"""
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        # Un valor nuevo basado en el reloj evita reutilizar versiones antiguas
+        cache.add(MENU_VERSION_KEY, int(time.time() * 1000), timeout=menu_timeout(None))
+        version = cache.get(MENU_VERSION_KEY)
+    return version
+
+
+def bump_menu_version():
+    """Invalida todos los payloads del menú cambiando la versión"""
+    try:
+        cache.incr(MENU_VERSION_KEY)
+    except ValueError:
+        get_menu_version()
+
+
+def cached_menu_payload(key_parts, builder):
+    """Devuelve el payload cacheado para la versión actual o lo construye con `builder`"""
+    key = 'menu:{}:{}'.format(get_menu_version(), ':'.join(str(part) for part in key_parts))
+    payload = cache.get(key)
+    if payload is None:
+        payload = builder()
+        cache.set(key, payload, timeout=menu_timeout(getattr(settings, 'MENU_CACHE_TIMEOUT', 60 * 60 * 24)))
+    return payload
+
+
+async def aget_menu_version():
+    version = await cache.aget(MENU_VERSION_KEY)
+    if version is None:
+        await cache.aadd(MENU_VERSION_KEY, int(time.time() * 1000), timeout=menu_timeout(None))
+        version = await cache.aget(MENU_VERSION_KEY)
+    return version
+
+
+async def acached_menu_payload(key_parts, abuilder):
+    """Versión asíncrona de `cached_menu_payload`; `abuilder` es una corrutina"""
+    key = 'menu:{}:{}'.format(await aget_menu_version(), ':'.join(str(part) for part in key_parts))
+    payload = await cache.aget(key)
+    if payload is None:
+        payload = await abuilder()
+        await cache.aset(key, payload, timeout=menu_timeout(getattr(settings, 'MENU_CACHE_TIMEOUT', 60 * 60 * 24)))
+    return payload
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """Cola de eventos de un cliente conectado, con filtros por mesa, estado o estación
+
+    Pertenece al event loop que la creó; los eventos se entregan de forma
+    segura desde cualquier hilo (las vistas síncronas corren en hilos aparte).
+    """
+
+    def __init__(self, loop, filters=None, max_size=100):
+        self.loop = loop
+        self.filters = {key: str(value) for key, value in (filters or {}).items() if value}
+        self.queue = asyncio.Queue(maxsize=max_size)
+
+    def matches(self, event):
+        for key, expected in self.filters.items():
+            value = event.get(key)
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            if expected not in {str(v) for v in values}:
+                return False
+        return True
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # El loop ya se cerró: el cliente se desconectó
+            pass
+
+    def _put(self, event):
+        if self.queue.full():
+            # Cliente lento: se descarta el evento más antiguo
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class InProcessBroker:
+    """Broker en memoria que reparte eventos entre los clientes de este proceso
+
+    Un broker compartido (p. ej. Redis pub/sub) puede reemplazarlo con la misma
+    interfaz `subscribe` / `unsubscribe` / `publish` vía `settings.EVENT_BROKER`.
+    """
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, filters=None):
+        subscription = Subscription(asyncio.get_running_loop(), filters)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.matches(event):
+                subscription.deliver(event)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker_path = getattr(settings, 'EVENT_BROKER', 'api.events.InProcessBroker')
+                _broker = import_string(broker_path)()
+    return _broker
+
+
+def publish_event(event_type, **payload):
+    """Publica un evento cuando la transacción actual se confirma"""
+    event = {'type': event_type, **payload}
+    transaction.on_commit(lambda: get_broker().publish(event))
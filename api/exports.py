@@ -0,0 +1,161 @@
+import csv
+import re
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .renderers import FastJSONRenderer
+from .services import OrderService, PaymentService
+
+# Exportación contable en streaming: las filas se generan a medida que se leen
+# de la base con .iterator(chunk_size), que aplica los prefetch por bloque, así
+# que la memoria no depende del número de órdenes del rango.
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+CHUNK_SIZE = 2000
+
+# Celdas que una hoja de cálculo interpretaría como fórmula (inyección de fórmulas en CSV)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+NUMBER = re.compile(r'-?\d+(\.\d+)?')
+
+ORDER_COLUMNS = [
+    'order_id', 'created_at', 'status', 'table', 'customer_document', 'customer_name', 'waiter',
+    'total_amount', 'amount_paid', 'is_paid', 'payment_method', 'payments',
+    'item_id', 'dish_id', 'dish', 'quantity', 'price', 'subtotal', 'item_status',
+]
+PAYMENT_COLUMNS = [
+    'payment_id', 'created_at', 'order_id', 'order_created_at', 'table', 'customer_document',
+    'amount', 'payment_method', 'payment_reference', 'order_total', 'order_is_paid',
+]
+
+
+def date_range(start, end):
+    """[inicio de `start`, inicio del día siguiente a `end`) en la zona horaria actual"""
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start, time.min), tz),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz),
+    )
+
+
+def timestamp(value):
+    return timezone.localtime(value).isoformat() if value else ''
+
+
+def money(value):
+    return str(value)
+
+
+def order_record(order):
+    """Orden con sus items y pagos (ya precargados) como dict listo para JSON"""
+    return {
+        'id': order.id,
+        'created_at': timestamp(order.created_at),
+        'status': order.status,
+        'table': order.table.number if order.table else None,
+        'customer': {'document_number': order.customer.document_number, 'name': order.customer.name}
+        if order.customer else None,
+        'waiter': order.waiter.username if order.waiter else None,
+        'total_amount': money(order.total_amount),
+        'amount_paid': money(order.amount_paid),
+        'is_paid': order.is_paid,
+        'payment_method': order.payment_method,
+        'items': [
+            {
+                'id': item.id, 'dish_id': item.dish_id, 'dish': item.dish.name, 'quantity': item.quantity,
+                'price': money(item.price), 'subtotal': money(item.subtotal), 'status': item.status,
+            } for item in order.orderitem_set.all()
+        ],
+        'payments': [
+            {
+                'id': payment.id, 'created_at': timestamp(payment.created_at), 'amount': money(payment.amount),
+                'payment_method': payment.payment_method, 'payment_reference': payment.payment_reference,
+            } for payment in order.payment_set.all()
+        ],
+    }
+
+
+def order_rows(record):
+    """Filas CSV de una orden: una por item (la orden sin items ocupa una fila)"""
+    customer = record['customer'] or {}
+    head = [
+        record['id'], record['created_at'], record['status'], record['table'] or '',
+        customer.get('document_number', ''), customer.get('name', ''), record['waiter'] or '',
+        record['total_amount'], record['amount_paid'], record['is_paid'], record['payment_method'],
+        '; '.join(f"{payment['payment_method']} {payment['amount']}" for payment in record['payments']),
+    ]
+    if not record['items']:
+        return [head + [''] * 7]
+    return [
+        head + [
+            item['id'], item['dish_id'], item['dish'], item['quantity'], item['price'], item['subtotal'],
+            item['status'],
+        ] for item in record['items']
+    ]
+
+
+def payment_record(payment):
+    order = payment.order
+    return {
+        'id': payment.id,
+        'created_at': timestamp(payment.created_at),
+        'order_id': order.id,
+        'order_created_at': timestamp(order.created_at),
+        'table': order.table.number if order.table else None,
+        'customer_document': order.customer.document_number if order.customer else None,
+        'amount': money(payment.amount),
+        'payment_method': payment.payment_method,
+        'payment_reference': payment.payment_reference,
+        'order_total': money(order.total_amount),
+        'order_is_paid': order.is_paid,
+    }
+
+
+def payment_rows(record):
+    return [['' if value is None else value for value in record.values()]]
+
+
+RESOURCES = {
+    'orders': (OrderService.get_orders_for_export, order_record, ORDER_COLUMNS, order_rows),
+    'payments': (PaymentService.get_payments_for_export, payment_record, PAYMENT_COLUMNS, payment_rows),
+}
+
+
+def csv_cell(value):
+    """Neutraliza el texto que empieza como una fórmula anteponiendo un apóstrofo"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) and not NUMBER.fullmatch(value):
+        return "'" + value
+    return value
+
+
+class Echo:
+    """Pseudo-buffer para csv.writer: devuelve la línea en lugar de guardarla"""
+
+    def write(self, value):
+        return value
+
+
+def stream(resource, file_format, start, end, chunk_size=CHUNK_SIZE):
+    """Genera el contenido (bytes) de la exportación de `resource` entre las fechas `start` y `end`"""
+    fetch, to_record, columns, to_rows = RESOURCES[resource]
+    objects = fetch(*date_range(start, end)).iterator(chunk_size=chunk_size)
+
+    if file_format == 'ndjson':
+        render = FastJSONRenderer().render
+        for obj in objects:
+            yield render(to_record(obj)) + b'\n'
+        return
+
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns).encode()
+    for obj in objects:
+        yield ''.join(
+            writer.writerow([csv_cell(value) for value in row]) for row in to_rows(to_record(obj))
+        ).encode()
+
+
+def filename(resource, file_format, start, end):
+    return f'{resource}-{start.isoformat()}-{end.isoformat()}.{file_format}'
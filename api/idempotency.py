@@ -0,0 +1,117 @@
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+from .renderers import FastJSONRenderer
+
+# Reintentos seguros de las creaciones (órdenes, pagos): la primera petición con una
+# cabecera Idempotency-Key reclama la clave (una fila por usuario y clave) y guarda
+# su respuesta; las repeticiones devuelven esa respuesta sin volver a ejecutar la
+# vista ni tocar las tablas de órdenes. Un duplicado que llega mientras la primera
+# sigue en curso espera a que termine. Los errores 5xx y las excepciones (p. ej. de
+# validación) liberan la clave para que el cliente pueda reintentar de verdad.
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def fingerprint(request):
+    """Hash del método, la ruta y el cuerpo de la petición"""
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method}\n{request.path}\n{body}'.encode()).hexdigest()
+
+
+def claim(user, key, digest):
+    """(registro, True) si esta petición es la primera con la clave; (registro existente, False) si no"""
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                user=user, key=key, fingerprint=digest,
+                expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS)
+            )
+        return record, True
+    except IntegrityError:
+        pass
+
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    stale = now - timedelta(seconds=settings.IDEMPOTENCY_STALE_SECONDS)
+    if record is not None and (record.expires_at <= now or (record.status_code is None and record.created_at < stale)):
+        # Clave caducada o abandonada (el proceso que la reclamó murió): se libera
+        IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at).delete()
+        record = None
+    return record, False
+
+
+def replay(record):
+    return Response(record.response, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(view_method):
+    """Decorador de acciones de creación que admiten la cabecera Idempotency-Key"""
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return view_method(self, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response({"error": f"{HEADER} must have between 1 and {MAX_KEY_LENGTH} characters"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        digest = fingerprint(request)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        delay = 0.05
+        while True:
+            record, created = claim(request.user, key, digest)
+            if created:
+                break
+            if record is not None:
+                if record.fingerprint != digest:
+                    return Response({"error": f"{HEADER} was already used for a different request"},
+                                    status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                if record.status_code is not None:
+                    return replay(record)
+            # La primera petición sigue en curso (o acaba de liberar la clave): se espera
+            if time.monotonic() >= deadline:
+                return Response({"error": f"A request with this {HEADER} is still being processed"},
+                                status=status.HTTP_409_CONFLICT)
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+        if response.status_code >= 500:
+            record.delete()
+        else:
+            # Se guarda tal como lo verá el cliente (p. ej. Decimal ya convertido por el renderer)
+            IdempotencyKey.objects.filter(pk=record.pk).update(
+                status_code=response.status_code, response=json.loads(FastJSONRenderer().render(response.data))
+            )
+        return response
+
+    return wrapper
+
+
+def purge_expired(batch_size=1000):
+    """Borra por lotes las claves caducadas; devuelve cuántas"""
+    total = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        total += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,147 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+
+from .cache import bump_menu_version
+
+# Variantes de las fotos de los platos: al guardar un plato con una imagen nueva se
+# generan, fuera del hilo de la petición, versiones redimensionadas y recodificadas
+# (miniatura, tarjeta y completa). Cada archivo lleva en el nombre un hash de su
+# contenido, así que su URL nunca cambia de contenido y se sirve con cache de un año.
+
+logger = logging.getLogger(__name__)
+
+# nombre: (ancho, alto, recortar). Sin recorte la imagen se ajusta dentro del tamaño.
+VARIANTS = {
+    'thumbnail': (120, 120, True),
+    'card': (480, 360, True),
+    'full': (1600, 1600, False),
+}
+FORMAT, EXTENSION, CONTENT_TYPE = 'WEBP', 'webp', 'image/webp'
+QUALITY = 80
+VARIANTS_DIR = 'dishes/variants'
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_name(source_name, variant, content):
+    """dishes/variants/<original>.<variante>.<hash del contenido>.webp"""
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    return f'{VARIANTS_DIR}/{stem}.{variant}.{digest}.{EXTENSION}'
+
+
+def render_variants(source):
+    """Bytes codificados de cada variante a partir del archivo de imagen original"""
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as original:
+        # Respeta la orientación EXIF de las fotos de móvil y descarta el resto de metadatos
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        rendered = {}
+        for variant, (width, height, crop) in VARIANTS.items():
+            if crop:
+                resized = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+            else:
+                resized = image.copy()
+                resized.thumbnail((width, height), Image.Resampling.LANCZOS)
+            buffer = BytesIO()
+            resized.save(buffer, FORMAT, quality=QUALITY, method=4)
+            rendered[variant] = buffer.getvalue()
+    return rendered
+
+
+def generate_variants(dish_id):
+    """Genera y guarda las variantes del plato; devuelve {variante: nombre} o None si no hay imagen"""
+    from .models import Dish
+
+    dish = Dish.objects.filter(pk=dish_id).only('image', 'image_variants').first()
+    if dish is None or not dish.image:
+        return None
+    source = dish.image.name
+    with dish.image.open('rb') as original:
+        rendered = render_variants(original)
+
+    variants = {'source': source}
+    for variant, content in rendered.items():
+        name = variant_name(source, variant, content)
+        # El nombre depende del contenido: si ya existe es el mismo archivo
+        if not default_storage.exists(name):
+            default_storage.save(name, ContentFile(content))
+        variants[variant] = name
+
+    # Solo si la imagen no cambió mientras tanto (si cambió, ya hay otra generación en cola)
+    if Dish.objects.filter(pk=dish_id, image=source).update(image_variants=variants):
+        bump_menu_version()
+    return variants
+
+
+def _run(dish_id):
+    try:
+        generate_variants(dish_id)
+    except Exception:
+        logger.exception("No se pudieron generar las variantes de imagen del plato %s", dish_id)
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.DISH_IMAGE_WORKERS, thread_name_prefix='dish-images'
+            )
+        return _executor
+
+
+def schedule(dish_id):
+    """Encola la generación de variantes; con DISH_IMAGE_WORKERS = 0 se ejecuta en el acto"""
+    if not settings.DISH_IMAGE_WORKERS:
+        generate_variants(dish_id)
+        return
+    get_executor().submit(_run, dish_id)
+
+
+def needs_variants(dish):
+    return bool(dish.image) and (dish.image_variants or {}).get('source') != dish.image.name
+
+
+def variant_urls(dish, request=None):
+    """URLs de las variantes ya generadas ({} mientras se generan o si no hay imagen)"""
+    variants = dish.image_variants or {}
+    if not dish.image or variants.get('source') != dish.image.name:
+        return {}
+    urls = {}
+    for variant in VARIANTS:
+        url = default_storage.url(variants[variant])
+        urls[variant] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+def variant_view(request, name):
+    """Sirve una variante con cache inmutable (en producción lo haría el servidor web o la CDN)"""
+    path = f'{VARIANTS_DIR}/{name}'
+    if '/' in name or not name.endswith(f'.{EXTENSION}') or not default_storage.exists(path):
+        raise Http404
+    etag = '"{}"'.format(name.rsplit('.', 2)[-2])
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        with default_storage.open(path, 'rb') as variant:
+            response = HttpResponse(variant.read(), content_type=CONTENT_TYPE)
+    response['ETag'] = etag
+    response['Cache-Control'] = CACHE_CONTROL
+    return response
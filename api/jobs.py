@@ -0,0 +1,224 @@
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from . import metrics
+
+# Tareas en segundo plano sin broker externo: los servicios encolan con enqueue()
+# (una fila de Job que se inserta tras el commit de la transacción que la pide) y
+# el comando run_jobs las ejecuta en un pool de hilos. Cada tarea se reclama con
+# un UPDATE condicional (varios workers pueden compartir la cola) y se ejecuta en
+# una transacción junto con su marca de completada, así que sus escrituras se
+# aplican una sola vez. Si falla se reintenta con espera exponencial hasta
+# max_attempts; las que quedan "en ejecución" porque un worker murió se devuelven
+# a la cola pasado JOBS_LOCK_SECONDS.
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+class ClaimLost(Exception):
+    """La tarea dejó de pertenecer a este worker antes de marcarse como completada"""
+
+
+def register(name, max_attempts=None):
+    """Registra `function(**payload)` como la tarea `name`"""
+    def decorator(function):
+        HANDLERS[name] = (function, max_attempts)
+        return function
+    return decorator
+
+
+def enqueue(name, delay=0, **payload):
+    """Encola la tarea cuando la transacción en curso confirme (no se encola si se revierte)"""
+    from .models import Job
+
+    if name not in HANDLERS:
+        raise ValueError(f"Tarea desconocida: {name}")
+    max_attempts = HANDLERS[name][1] or settings.JOBS_MAX_ATTEMPTS
+
+    def create():
+        Job.objects.create(
+            name=name, payload=payload, max_attempts=max_attempts,
+            run_at=timezone.now() + timedelta(seconds=delay)
+        )
+        if settings.JOBS_RUN_INLINE:
+            # Sin proceso run_jobs: las tareas vencidas se ejecutan aquí mismo
+            run_pending()
+    transaction.on_commit(create)
+
+
+def backoff(attempts):
+    """Segundos hasta el siguiente intento: exponencial con tope y un 25% de variación"""
+    delay = min(settings.JOBS_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.JOBS_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.75, 1.25)
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def requeue_stale():
+    """Devuelve a la cola las tareas de workers que dejaron de responder"""
+    from .models import Job
+
+    limit = timezone.now() - timedelta(seconds=settings.JOBS_LOCK_SECONDS)
+    return Job.objects.filter(status='running', locked_at__lt=limit).update(
+        status='queued', locked_by='', locked_at=None
+    )
+
+
+def claim(worker, limit):
+    """Reclama hasta `limit` tareas vencidas; cada una con un UPDATE condicional, sin bloqueos largos"""
+    from .models import Job
+
+    now = timezone.now()
+    candidates = Job.objects.filter(status='queued', run_at__lte=now).order_by('run_at').values_list('pk', flat=True)
+    claimed = []
+    for pk in candidates[:limit * 2]:
+        if Job.objects.filter(pk=pk, status='queued').update(
+            status='running', locked_by=worker, locked_at=now, attempts=F('attempts') + 1, updated_at=now
+        ):
+            claimed.append(pk)
+            if len(claimed) == limit:
+                break
+    return list(Job.objects.filter(pk__in=claimed).order_by('run_at'))
+
+
+def execute(job):
+    """Ejecuta una tarea reclamada y registra el resultado; devuelve el estado final"""
+    from .models import Job
+
+    started = time.perf_counter()
+    handler = HANDLERS.get(job.name, (None, None))[0]
+    # Este reclamo concreto: si requeue_stale devolvió la tarea a la cola y otro worker
+    # (o este mismo proceso) la reclamó de nuevo, locked_by o attempts ya no coinciden
+    claimed = Job.objects.filter(pk=job.pk, status='running', locked_by=job.locked_by, attempts=job.attempts)
+    try:
+        if handler is None:
+            raise LookupError(f"Tarea desconocida: {job.name}")
+        with transaction.atomic():
+            handler(**job.payload)
+            if not claimed.update(
+                status='succeeded', finished_at=timezone.now(), last_error='', updated_at=timezone.now()
+            ):
+                # Se revierten las escrituras de la tarea: las aplicará quien la tiene ahora
+                raise ClaimLost(job.pk)
+        outcome = 'succeeded'
+    except ClaimLost:
+        outcome = 'lost'
+        logger.warning("La tarea %s #%s se reclamó de nuevo mientras se ejecutaba; se descarta este intento",
+                       job.name, job.pk)
+    except Exception:
+        now = timezone.now()
+        outcome = 'failed' if job.attempts >= job.max_attempts else 'retried'
+        claimed.update(
+            status='failed' if outcome == 'failed' else 'queued',
+            run_at=now + timedelta(seconds=backoff(job.attempts)),
+            finished_at=now if outcome == 'failed' else None,
+            locked_by='', locked_at=None, last_error=traceback.format_exc()[-4000:], updated_at=now
+        )
+        logger.warning("La tarea %s #%s falló (intento %s de %s)", job.name, job.pk, job.attempts,
+                       job.max_attempts, exc_info=True)
+
+    labels = (('job', job.name),)
+    metrics.registry.observe('waiterdnd_job_duration_seconds', labels, time.perf_counter() - started)
+    metrics.registry.increment('waiterdnd_jobs_total', (*labels, ('outcome', outcome)))
+    return outcome
+
+
+def run_pending(limit=100):
+    """Ejecuta en este hilo las tareas vencidas hasta vaciar la cola (pruebas, cron, --once)"""
+    worker, done = worker_id(), 0
+    while True:
+        jobs = claim(worker, limit)
+        if not jobs:
+            return done
+        for job in jobs:
+            execute(job)
+            done += 1
+
+
+def purge_finished():
+    """Borra las tareas completadas más antiguas que JOBS_KEEP_SECONDS (las fallidas se conservan)"""
+    from .models import Job
+
+    limit = timezone.now() - timedelta(seconds=settings.JOBS_KEEP_SECONDS)
+    return Job.objects.filter(status='succeeded', finished_at__lt=limit).delete()[0]
+
+
+class Worker:
+    """Pool de hilos que consulta la cola cada `poll_interval` segundos"""
+
+    def __init__(self, threads, poll_interval):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.stopping = threading.Event()
+        self.processed = 0
+
+    def run_job(self, job):
+        try:
+            return execute(job)
+        finally:
+            close_old_connections()
+
+    def run(self, once=False):
+        worker = worker_id()
+        last_maintenance = 0
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='jobs') as pool:
+            while not self.stopping.is_set():
+                if time.monotonic() - last_maintenance > settings.JOBS_LOCK_SECONDS / 2:
+                    requeue_stale()
+                    purge_finished()
+                    last_maintenance = time.monotonic()
+                jobs = claim(worker, self.threads)
+                if jobs and self.threads == 1:
+                    # Con un solo hilo se ejecuta aquí mismo, con la conexión de este hilo
+                    for job in jobs:
+                        execute(job)
+                    self.processed += len(jobs)
+                elif jobs:
+                    # Los hilos reciben el trabajo ya reclamado; este hilo solo reparte
+                    wait([pool.submit(self.run_job, job) for job in jobs])
+                    self.processed += len(jobs)
+                elif once:
+                    return self.processed
+                else:
+                    self.stopping.wait(self.poll_interval)
+        return self.processed
+
+    def stop(self):
+        self.stopping.set()
+
+
+def collect_metrics():
+    """Estado de la cola leído de la base (lo comparten todos los procesos) para /metrics"""
+    from .models import Job
+
+    lines = [
+        '# HELP waiterdnd_jobs Tareas en la cola por nombre y estado',
+        '# TYPE waiterdnd_jobs gauge',
+    ]
+    for row in Job.objects.values('name', 'status').annotate(count=Count('pk')).order_by('name', 'status'):
+        labels = metrics.format_labels((('job', row['name']), ('status', row['status'])))
+        lines.append(f"waiterdnd_jobs{labels} {row['count']}")
+    oldest = Job.objects.filter(status='queued', run_at__lte=timezone.now()).aggregate(oldest=Min('run_at'))['oldest']
+    lag = (timezone.now() - oldest).total_seconds() if oldest else 0
+    lines += [
+        '# HELP waiterdnd_jobs_lag_seconds Antigüedad de la tarea vencida más antigua sin ejecutar',
+        '# TYPE waiterdnd_jobs_lag_seconds gauge',
+        f'waiterdnd_jobs_lag_seconds {lag:.3f}',
+    ]
+    return lines
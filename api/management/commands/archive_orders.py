@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.services import ArchiveService
+
+
+class Command(BaseCommand):
+    help = "Mueve por lotes al archivo las órdenes entregadas y pagadas más antiguas, con sus items y pagos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                            help="Antigüedad mínima en días de las órdenes a archivar")
+        parser.add_argument('--batch-size', type=int, default=settings.ARCHIVE_BATCH_SIZE,
+                            help="Órdenes movidas por transacción")
+        parser.add_argument('--pause', type=float, default=0, help="Segundos de espera entre lotes")
+        parser.add_argument('--dry-run', action='store_true', help="Solo cuenta las órdenes que se archivarían")
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] < 1:
+            raise CommandError("--days no puede ser negativo y --batch-size debe ser al menos 1")
+
+        before = timezone.now() - timedelta(days=options['days'])
+        if options['dry_run']:
+            count = ArchiveService.get_archivable_orders(before).count()
+            self.stdout.write(f"{count} órdenes anteriores a {before:%Y-%m-%d %H:%M} se archivarían")
+            return
+
+        total = ArchiveService.archive_orders(
+            before=before, batch_size=options['batch_size'], pause=options['pause'],
+            progress=lambda total: self.stdout.write(f"{total} órdenes archivadas", ending='\r')
+        )
+        self.stdout.write(self.style.SUCCESS(f"{total} órdenes archivadas"))
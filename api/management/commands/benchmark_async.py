@@ -0,0 +1,74 @@
+import asyncio
+import statistics
+import time
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+
+from api.models import Order
+
+
+class Command(BaseCommand):
+    help = "Compara las lecturas síncronas y asíncronas bajo ASGI con N peticiones concurrentes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help="Usuario con el que se autentican las peticiones")
+        parser.add_argument('--requests', type=int, default=200, help="Peticiones por endpoint y modo")
+        parser.add_argument('--concurrency', type=int, default=50, help="Peticiones simultáneas")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"El usuario {options['username']} no existe")
+
+        order = Order.objects.exclude(table=None).order_by('-created_at').first()
+        if order is None:
+            raise CommandError("Se necesita al menos una orden con mesa")
+
+        # Una sesión real, compartida por el cliente ASGI
+        login = Client()
+        login.force_login(user)
+        client = AsyncClient()
+        client.cookies = login.cookies
+
+        endpoints = [
+            ('menu', '/api/dishes/', '/api/async/dishes/'),
+            ('tables/available', '/api/tables/available/', '/api/async/tables/available/'),
+            ('orders/by_table', f'/api/orders/by_table/?table_id={order.table_id}',
+             f'/api/async/orders/by_table/?table_id={order.table_id}'),
+            ('order detail', f'/api/orders/{order.id}/', f'/api/async/orders/{order.id}/'),
+        ]
+
+        self.stdout.write(f"{'endpoint':<20}{'modo':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, sync_url, async_url in endpoints:
+            for mode, url in (('sync', sync_url), ('async', async_url)):
+                # El cliente de pruebas usa el host 'testserver'
+                with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                    elapsed, latencies = async_to_sync(self.run)(
+                        client, url, options['requests'], options['concurrency']
+                    )
+                quantiles = statistics.quantiles(latencies, n=20)
+                self.stdout.write(
+                    f"{name:<20}{mode:<8}{len(latencies) / elapsed:>10.1f}"
+                    f"{statistics.median(latencies):>10.2f}{quantiles[18]:>10.2f}"
+                )
+
+    async def run(self, client, url, total, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(url)
+                if response.status_code != 200:
+                    raise CommandError(f"{url} respondió {response.status_code}")
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return time.perf_counter() - started, latencies
@@ -0,0 +1,237 @@
+import json
+import platform
+import statistics
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from api.models import Order, Payment
+from api.urls import async_urlpatterns, router
+
+# Parámetros de consulta obligatorios por nombre de URL, a partir de una orden de muestra
+QUERY_PARAMS = {
+    'customer-by-document': lambda order: {'document_number': order.customer.document_number},
+    'customer-search': lambda order: {'q': order.customer.name[:4]},
+    'dish-search': lambda order: {'q': order.orderitem_set.first().dish.name[:5]},
+    'dish-autocomplete': lambda order: {'q': order.orderitem_set.first().dish.name[:5]},
+    'order-by-table': lambda order: {'table_id': order.table_id},
+    'order-by-customer': lambda order: {'customer_id': order.customer_id},
+    'order-daily-sales': lambda order: {'date': order.created_at.date().isoformat()},
+    'order-sales-report': lambda order: {
+        'start': (order.created_at - timedelta(days=30)).date().isoformat(),
+        'end': order.created_at.date().isoformat(),
+    },
+    'order-export': lambda order: {'start': order.created_at.date().isoformat()},
+    'payment-by-order': lambda order: {'order_id': order.id},
+    'payment-export': lambda order: {'start': order.created_at.date().isoformat()},
+    'async-orders-by-table': lambda order: {'table_id': order.table_id},
+}
+
+# Objeto de muestra para las rutas de detalle, por basename del router
+DETAIL_OBJECTS = {
+    'category': lambda order, item, payment: item.dish.category_id,
+    'dish': lambda order, item, payment: item.dish_id,
+    'table': lambda order, item, payment: order.table_id,
+    'customer': lambda order, item, payment: order.customer_id,
+    'order': lambda order, item, payment: order.id,
+    'order-item': lambda order, item, payment: item.id,
+    'payment': lambda order, item, payment: payment.id,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide latencia (p50/p95/p99), throughput y consultas SQL de cada endpoint de lectura de api/urls.py "
+        "y guarda los resultados en JSON para comparar ejecuciones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help="Usuario con el que se autentican las peticiones")
+        parser.add_argument('--requests', type=int, default=200, help="Peticiones por endpoint")
+        parser.add_argument('--concurrency', type=int, default=10, help="Hilos que envían peticiones a la vez")
+        parser.add_argument('--endpoint', action='append', default=[],
+                            help="Solo endpoints cuyo nombre contenga este texto (repetible)")
+        parser.add_argument('--output', help="Archivo JSON donde guardar los resultados")
+        parser.add_argument('--baseline', help="Resultados JSON de una ejecución anterior para comparar el p95")
+        parser.add_argument('--label', default='', help="Etiqueta de la ejecución (rama, commit...)")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"El usuario {options['username']} no existe")
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--requests y --concurrency deben ser al menos 1")
+
+        endpoints = [
+            endpoint for endpoint in self.discover_endpoints()
+            if not options['endpoint'] or any(text in endpoint[0] for text in options['endpoint'])
+        ]
+        login = Client()
+        login.force_login(user)
+        cookies = login.cookies
+
+        results = []
+        self.stdout.write(
+            f"{'endpoint':<28}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'SQL/req':>9}{'errores':>9}"
+        )
+        # El cliente de pruebas usa el host 'testserver'
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name, method, url, body in endpoints:
+                result = self.run(cookies, method, url, body, options['requests'], options['concurrency'])
+                result.update(name=name, method=method, url=url)
+                results.append(result)
+                self.stdout.write(
+                    f"{name:<28}{result['throughput_rps']:>9.1f}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+                    f"{result['p99_ms']:>9.2f}{result['queries_per_request']:>9.1f}{result['errors']:>9}"
+                )
+
+        report = {
+            'label': options['label'],
+            'started_at': timezone.now().isoformat(),
+            'settings': {
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'orders': Order.objects.count(),
+            },
+            'endpoints': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
+        if options['baseline']:
+            self.compare(options['baseline'], results)
+
+    def discover_endpoints(self):
+        """(nombre, método, url, cuerpo) de cada ruta de lectura de api/urls.py
+
+        Las escrituras quedan fuera para que ejecuciones sucesivas midan los mismos datos;
+        /api/events/ es un stream sin fin y tampoco se mide.
+        """
+        order = Order.objects.exclude(table=None).exclude(customer=None).order_by('-created_at').first()
+        payment = Payment.objects.order_by('-created_at').first()
+        item = order.orderitem_set.select_related('dish').first() if order else None
+        if order is None or payment is None or item is None:
+            raise CommandError("Se necesitan órdenes con mesa, cliente, items y pagos (usa generate_restaurant_data)")
+
+        def url_for(name, kwargs=None):
+            query = QUERY_PARAMS[name](order) if name in QUERY_PARAMS else {}
+            url = reverse(name, kwargs=kwargs)
+            return f'{url}?{urlencode(query)}' if query else url
+
+        endpoints = []
+        for _, viewset, basename in router.registry:
+            pk = DETAIL_OBJECTS[basename](order, item, payment)
+            endpoints.append((f'{basename}-list', 'GET', url_for(f'{basename}-list'), None))
+            endpoints.append((f'{basename}-detail', 'GET', url_for(f'{basename}-detail', {'pk': pk}), None))
+            for action in viewset.get_extra_actions():
+                if 'get' not in action.mapping:
+                    continue
+                name = f'{basename}-{action.url_name}'
+                endpoints.append((name, 'GET', url_for(name, {'pk': pk} if action.detail else None), None))
+
+        for pattern in async_urlpatterns:
+            kwargs = {'pk': order.id} if 'pk' in pattern.pattern.converters else None
+            endpoints.append((pattern.name, 'GET', url_for(pattern.name, kwargs), None))
+
+        sub_requests = [{'url': url} for name, _, url, _ in endpoints if name in (
+            'table-available', 'order-by-table', 'dish-list'
+        )]
+        endpoints.append(('batch', 'POST', reverse('batch'), {'requests': sub_requests}))
+        return endpoints
+
+    def run(self, cookies, method, url, body, total, concurrency):
+        latencies, statuses, queries = [], Counter(), []
+        lock = threading.Lock()
+        local = threading.local()
+
+        def count_queries(execute, sql, params, many, context):
+            local.queries += 1
+            return execute(sql, params, many, context)
+
+        def one(client):
+            local.queries = 0
+            with ExitStack() as stack:
+                # Se cuentan las consultas en todas las bases (principal y réplicas)
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(count_queries))
+                started = time.perf_counter()
+                if method == 'GET':
+                    response = client.get(url)
+                else:
+                    response = client.generic(method, url, json.dumps(body), content_type='application/json')
+                if response.streaming:
+                    # Las exportaciones consultan la base a medida que se consume el contenido
+                    b''.join(response.streaming_content)
+                elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] += 1
+                queries.append(local.queries)
+
+        def worker(requests):
+            client = Client()
+            client.cookies = cookies
+            try:
+                for _ in range(requests):
+                    one(client)
+            finally:
+                # Cada hilo abre sus propias conexiones
+                if threading.current_thread() is not threading.main_thread():
+                    connections.close_all()
+
+        # Una petición de calentamiento (caches, conexiones) que no se mide
+        worker(1)
+        latencies.clear()
+        statuses.clear()
+        queries.clear()
+
+        shares = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+        started = time.perf_counter()
+        if concurrency == 1:
+            worker(total)
+        else:
+            threads = [threading.Thread(target=worker, args=(share,)) for share in shares if share]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - started
+
+        percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        return {
+            'requests': len(latencies),
+            'errors': sum(count for code, count in statuses.items() if code >= 400),
+            'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+            'throughput_rps': round(len(latencies) / elapsed, 2),
+            'p50_ms': round(statistics.median(latencies), 3),
+            'p95_ms': round(percentiles[94], 3),
+            'p99_ms': round(percentiles[98], 3),
+            'queries_per_request': round(statistics.mean(queries), 2),
+        }
+
+    def compare(self, path, results):
+        with open(path) as baseline_file:
+            baseline = {endpoint['name']: endpoint for endpoint in json.load(baseline_file)['endpoints']}
+        self.stdout.write(f"\n{'endpoint':<28}{'p95 antes':>11}{'p95 ahora':>11}{'cambio':>9}")
+        for result in results:
+            before = baseline.get(result['name'])
+            if before is None or not before['p95_ms']:
+                continue
+            change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100
+            line = f"{result['name']:<28}{before['p95_ms']:>11.2f}{result['p95_ms']:>11.2f}{change:>+8.1f}%"
+            self.stdout.write(self.style.WARNING(line) if change > 10 else line)
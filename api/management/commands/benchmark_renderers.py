@@ -0,0 +1,62 @@
+import gzip
+import statistics
+import time
+from io import BytesIO
+from itertools import cycle, islice
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer
+from api.serializers import OrderSerializer
+from api.services import OrderService
+
+
+class Command(BaseCommand):
+    help = "Compara el renderer/parser JSON de DRF con los basados en orjson sobre páginas de órdenes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200, help="Órdenes por página")
+        parser.add_argument('--repeat', type=int, default=50, help="Repeticiones por modo")
+
+    def handle(self, *args, **options):
+        orders = list(OrderService.get_all_orders()[:options['orders']])
+        if not orders:
+            raise CommandError("Se necesita al menos una orden")
+
+        # Página con la misma forma que /api/orders/; se repiten órdenes si hay menos que las pedidas
+        results = OrderSerializer(orders, many=True).data
+        page = {'next': None, 'previous': None, 'results': list(islice(cycle(results), options['orders']))}
+
+        body = JSONRenderer().render(page)
+        if FastJSONRenderer().render(page) != body:
+            raise CommandError("El renderer rápido no produce la misma salida que el de DRF")
+        self.stdout.write(
+            f"{len(page['results'])} órdenes: {len(body)} bytes, {len(gzip.compress(body))} bytes con gzip"
+        )
+
+        self.stdout.write(f"{'operación':<10}{'modo':<8}{'p50 ms':>10}{'p95 ms':>10}")
+        for operation, modes in (
+            ('render', (('drf', JSONRenderer()), ('orjson', FastJSONRenderer()))),
+            ('parse', (('drf', JSONParser()), ('orjson', FastJSONParser()))),
+        ):
+            for mode, codec in modes:
+                if operation == 'render':
+                    run = lambda: codec.render(page)
+                else:
+                    run = lambda: codec.parse(BytesIO(body), parser_context={'encoding': 'utf-8'})
+                latencies = self.measure(run, options['repeat'])
+                quantiles = statistics.quantiles(latencies, n=20) if len(latencies) > 1 else latencies * 19
+                self.stdout.write(
+                    f"{operation:<10}{mode:<8}{statistics.median(latencies):>10.2f}{quantiles[18]:>10.2f}"
+                )
+
+    def measure(self, run, repeat):
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            latencies.append((time.perf_counter() - started) * 1000)
+        return latencies
@@ -0,0 +1,50 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.projections import ValuesProjection
+from api.serializers import OrderSerializer, OrderItemSerializer, PaymentSerializer
+from api.services import OrderService, PaymentService
+
+
+class Command(BaseCommand):
+    help = "Compara ModelSerializer con la serialización por proyección (.values()) en los listados"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200, help="Filas por listado (tamaño de página)")
+        parser.add_argument('--repeat', type=int, default=20, help="Repeticiones por modo")
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        listings = [
+            ('orders', OrderService.get_all_orders(), OrderSerializer),
+            ('order items', OrderService.get_all_order_items().order_by('-created_at'), OrderItemSerializer),
+            ('payments', PaymentService.get_all_payments().order_by('-created_at'), PaymentSerializer),
+        ]
+
+        self.stdout.write(f"{'listado':<14}{'modo':<12}{'filas':>8}{'consultas':>11}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, queryset, serializer_class in listings:
+            projection = ValuesProjection(serializer_class())
+            modes = (
+                ('serializer', lambda: serializer_class(queryset[:rows], many=True).data),
+                ('projection', lambda: projection.represent(projection.values(queryset)[:rows])),
+            )
+            results = {}
+            for mode, run in modes:
+                with CaptureQueriesContext(connection) as ctx:
+                    results[mode] = run()
+                latencies = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    run()
+                    latencies.append((time.perf_counter() - started) * 1000)
+                quantiles = statistics.quantiles(latencies, n=20) if repeat > 1 else latencies * 19
+                self.stdout.write(
+                    f"{name:<14}{mode:<12}{len(results[mode]):>8}{len(ctx.captured_queries):>11}"
+                    f"{statistics.median(latencies):>10.2f}{quantiles[18]:>10.2f}"
+                )
+            if list(results['serializer']) != results['projection']:
+                raise CommandError(f"La proyección de {name} no coincide con el serializer")
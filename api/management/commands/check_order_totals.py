@@ -0,0 +1,40 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Abs, Coalesce
+
+from api.models import Order
+
+
+class Command(BaseCommand):
+    help = "Verifica que Order.total_amount coincida con la suma de sus items y corrige las diferencias"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Corrige los totales desviados")
+
+    def handle(self, *args, **options):
+        money = DecimalField(max_digits=10, decimal_places=2)
+        subtotal = ExpressionWrapper(F('orderitem__quantity') * F('orderitem__price'), output_field=money)
+        orders = Order.objects.annotate(
+            items_total=Coalesce(Sum(subtotal), Value(Decimal('0')), output_field=money)
+        ).annotate(
+            difference=Abs(F('total_amount') - F('items_total'))
+        ).filter(
+            # Con tolerancia de medio centavo: SQLite suma decimales como flotantes
+            difference__gte=Decimal('0.005')
+        ).values_list('id', 'total_amount', 'items_total')
+
+        drifted = 0
+        for order_id, stored, expected in orders.iterator():
+            drifted += 1
+            self.stdout.write(f"Orden #{order_id}: total {stored} != items {expected}")
+            if options['fix']:
+                Order.objects.filter(pk=order_id).update(total_amount=round(expected, 2))
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Todos los totales son correctos"))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"{drifted} órdenes corregidas"))
+        else:
+            self.stdout.write(self.style.WARNING(f"{drifted} órdenes con total desviado (usa --fix)"))
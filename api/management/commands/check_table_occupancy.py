@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import occupancy
+
+
+class Command(BaseCommand):
+    help = "Compara el mapa de ocupación de mesas del cache con las órdenes abiertas y lo reconstruye si difiere"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Reconstruye el mapa si hay diferencias")
+
+    def handle(self, *args, **options):
+        if not occupancy.enabled():
+            raise CommandError(
+                "El mapa de ocupación no está en uso: el cache por defecto es local a cada proceso "
+                "(configura un cache compartido o TABLE_OCCUPANCY_CACHE = True)"
+            )
+        drift = occupancy.check(fix=options['fix'])
+        for table_id, (cached, expected) in sorted(drift.items()):
+            self.stdout.write(f"Mesa {table_id}: cache {cached} != órdenes abiertas {expected}")
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("El mapa de ocupación es consistente"))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS("Mapa de ocupación reconstruido"))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} mesas con diferencias (usa --fix)"))
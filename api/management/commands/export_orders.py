@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import exports
+from api.management.commands.rebuild_sales_rollups import parse_date
+
+
+class Command(BaseCommand):
+    help = "Exporta en streaming las órdenes (con items y pagos) o los pagos de un rango de fechas como CSV o NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=parse_date, required=True, help="Primer día a exportar (YYYY-MM-DD)")
+        parser.add_argument('--end', type=parse_date, help="Último día a exportar (YYYY-MM-DD, por defecto --start)")
+        parser.add_argument('--type', choices=list(exports.FORMATS), default='csv', help="Formato de salida")
+        parser.add_argument('--resource', choices=list(exports.RESOURCES), default='orders', help="Qué exportar")
+        parser.add_argument('--output', help="Archivo de salida (por defecto la salida estándar)")
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE,
+                            help="Filas leídas de la base por bloque")
+
+    def handle(self, *args, **options):
+        start, end = options['start'], options['end'] or options['start']
+        if end < start:
+            raise CommandError("--end no puede ser anterior a --start")
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size debe ser al menos 1")
+
+        chunks = exports.stream(options['resource'], options['type'], start, end, chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f"Exportación guardada en {options['output']}"))
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
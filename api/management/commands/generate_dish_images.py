@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api import images
+from api.models import Dish
+
+
+class Command(BaseCommand):
+    help = "Genera las variantes (miniatura, tarjeta, completa) de las fotos de los platos que no las tienen al día"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenera también las variantes al día")
+
+    def handle(self, *args, **options):
+        generated = 0
+        for dish in Dish.objects.exclude(image='').exclude(image=None).only('image', 'image_variants').iterator():
+            if options['force'] or images.needs_variants(dish):
+                images.generate_variants(dish.pk)
+                generated += 1
+        self.stdout.write(self.style.SUCCESS(f"Variantes generadas para {generated} platos"))
@@ -0,0 +1,192 @@
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from api import occupancy, search
+from api.cache import bump_menu_version
+from api.models import Category, Dish, Table, Customer, Order, OrderItem, Payment
+from api.services import SalesReportService
+
+PAYMENT_METHODS = ('cash', 'card', 'transfer')
+# Estado de las órdenes de más de unas horas: casi todas entregadas
+HISTORY_STATUSES = (('delivered', 90), ('canceled', 5), ('ready', 5))
+OPEN_STATUSES = ('pending', 'preparing', 'ready')
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Permite fijar created_at/updated_at en bulk_create (auto_now* los sobrescribiría)"""
+    fields = [
+        (field, field.auto_now, field.auto_now_add)
+        for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = "Genera datos sintéticos de un restaurante (mesas, platos, clientes, órdenes, items y pagos) con bulk_create"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tables', type=int, default=200, help="Mesas a crear")
+        parser.add_argument('--categories', type=int, default=12, help="Categorías a crear")
+        parser.add_argument('--dishes', type=int, default=300, help="Platos a crear")
+        parser.add_argument('--customers', type=int, default=10000, help="Clientes a crear")
+        parser.add_argument('--orders', type=int, default=100000, help="Órdenes a crear")
+        parser.add_argument('--max-items', type=int, default=5, help="Máximo de items por orden")
+        parser.add_argument('--days', type=int, default=90, help="Días de historia hacia atrás")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Órdenes por lote de inserción")
+        parser.add_argument('--seed', type=int, help="Semilla para obtener siempre los mismos datos")
+        parser.add_argument('--waiter', default='benchmark', help="Usuario mesero (se crea si no existe)")
+
+    def handle(self, *args, **options):
+        if options['orders'] and (options['tables'] < 1 or options['dishes'] < 1):
+            raise CommandError("Se necesita al menos una mesa y un plato para generar órdenes")
+        if options['categories'] < 1 or options['max_items'] < 1:
+            raise CommandError("--categories y --max-items deben ser al menos 1")
+
+        self.random = random.Random(options['seed'])
+        # Prefijo único por ejecución para los campos únicos de los clientes
+        self.run = uuid.UUID(int=self.random.getrandbits(128)).hex[:8]
+        started = time.perf_counter()
+        now = timezone.now()
+
+        waiter, _ = User.objects.get_or_create(username=options['waiter'])
+        with transaction.atomic():
+            dishes = self.create_menu(options['categories'], options['dishes'])
+            table_ids = self.create_tables(options['tables'])
+            customer_ids = self.create_customers(options['customers'])
+
+        counts = {'orders': 0, 'items': 0, 'payments': 0}
+        total, batch_size = options['orders'], options['batch_size']
+        start = now - timedelta(days=options['days'])
+        with explicit_timestamps(Order, OrderItem, Payment):
+            for offset in range(0, total, batch_size):
+                with transaction.atomic():
+                    created = self.create_orders(
+                        range(offset, min(offset + batch_size, total)), total, start, now,
+                        dishes, table_ids, customer_ids, waiter, options['max_items']
+                    )
+                for key, value in created.items():
+                    counts[key] += value
+                self.stdout.write(f"{counts['orders']}/{total} órdenes", ending='\r')
+
+        # Estado derivado que bulk_create no mantiene
+        SalesReportService.rebuild(start=start.date())
+        occupancy.rebuild()
+        search.rebuild(Dish)
+        search.rebuild(Customer)
+        bump_menu_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(table_ids)} mesas, {len(dishes)} platos, {len(customer_ids)} clientes, "
+            f"{counts['orders']} órdenes, {counts['items']} items y {counts['payments']} pagos "
+            f"en {time.perf_counter() - started:.1f} s"
+        ))
+
+    def create_menu(self, category_count, dish_count):
+        Category.objects.bulk_create(Category(name=f'Categoría {self.run}-{i}') for i in range(category_count))
+        # Se releen los ids: no todos los motores los devuelven en inserciones masivas
+        category_ids = list(
+            Category.objects.filter(name__startswith=f'Categoría {self.run}-').values_list('id', flat=True)
+        )
+        Dish.objects.bulk_create(
+            Dish(
+                name=f'Plato {self.run}-{i}',
+                price=Decimal(self.random.randrange(300, 6000)) / 100,
+                category_id=category_ids[i % len(category_ids)],
+                is_featured=self.random.random() < 0.05,
+            ) for i in range(dish_count)
+        )
+        return list(Dish.objects.filter(name__startswith=f'Plato {self.run}-').values_list('id', 'price'))
+
+    def create_tables(self, count):
+        first = (Table.objects.aggregate(last=Max('number'))['last'] or 0) + 1
+        Table.objects.bulk_create(Table(number=number) for number in range(first, first + count))
+        return list(Table.objects.filter(number__gte=first).values_list('id', flat=True))
+
+    def create_customers(self, count):
+        Customer.objects.bulk_create((
+            Customer(
+                document_number=f'{self.run}{i}',
+                name=f'Cliente {i}',
+                email=f'cliente{i}.{self.run}@example.com',
+                loyalty_points=self.random.randrange(0, 500),
+            ) for i in range(count)
+        ), batch_size=5000)
+        return list(Customer.objects.filter(document_number__startswith=self.run).values_list('id', flat=True))
+
+    def pick_status(self, created_at, now):
+        if now - created_at < timedelta(hours=3):
+            return self.random.choice(OPEN_STATUSES)
+        statuses, weights = zip(*HISTORY_STATUSES)
+        return self.random.choices(statuses, weights)[0]
+
+    def create_orders(self, positions, total, start, now, dishes, table_ids, customer_ids, waiter, max_items):
+        span = (now - start).total_seconds()
+        orders, lines = [], []
+        for position in positions:
+            # Fechas crecientes con el id, como en producción
+            created_at = start + timedelta(seconds=span * (position + self.random.random()) / total)
+            status = self.pick_status(created_at, now)
+            items = [
+                (dish_id, self.random.randint(1, 3), price)
+                for dish_id, price in self.random.sample(dishes, min(self.random.randint(1, max_items), len(dishes)))
+            ]
+            order_total = sum(quantity * price for _, quantity, price in items)
+            is_paid = status == 'delivered' and self.random.random() < 0.95
+            orders.append(Order(
+                table_id=self.random.choice(table_ids),
+                customer_id=self.random.choice(customer_ids) if customer_ids and self.random.random() < 0.6 else None,
+                waiter=waiter, status=status, total_amount=order_total,
+                amount_paid=order_total if is_paid else 0, is_paid=is_paid,
+                payment_method=self.random.choice(PAYMENT_METHODS) if is_paid else '',
+                created_at=created_at, updated_at=created_at + timedelta(minutes=self.random.randint(5, 90)),
+            ))
+            lines.append(items)
+
+        Order.objects.bulk_create(orders)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            ids = Order.objects.order_by('-id').values_list('id', flat=True)[:len(orders)]
+            for order, order_id in zip(orders, reversed(list(ids))):
+                order.pk = order_id
+
+        order_items, payments = [], []
+        for order, items in zip(orders, lines):
+            order_items.extend(
+                OrderItem(
+                    order_id=order.pk, dish_id=dish_id, quantity=quantity, price=price, status=order.status,
+                    created_at=order.created_at, updated_at=order.updated_at,
+                ) for dish_id, quantity, price in items
+            )
+            if order.is_paid:
+                # Una de cada cinco cuentas se divide en dos pagos
+                split = order.total_amount / 2 if self.random.random() < 0.2 else None
+                amounts = [split.quantize(Decimal('0.01')), None] if split else [order.total_amount]
+                if split:
+                    amounts[1] = order.total_amount - amounts[0]
+                payments.extend(
+                    Payment(
+                        order_id=order.pk, amount=amount, payment_method=order.payment_method,
+                        created_at=order.updated_at, updated_at=order.updated_at,
+                    ) for amount in amounts
+                )
+
+        OrderItem.objects.bulk_create(order_items)
+        Payment.objects.bulk_create(payments)
+        return {'orders': len(orders), 'items': len(order_items), 'payments': len(payments)}
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from api.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Borra las claves de idempotencia caducadas (IDEMPOTENCY_KEY_TTL_SECONDS)"
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f"{purge_expired()} claves de idempotencia caducadas borradas"))
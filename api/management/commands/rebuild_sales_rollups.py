@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services import SalesReportService
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Fecha inválida: {value}. Usa YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los acumulados de ventas (día, hora, método de pago y plato) desde las órdenes pagadas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=parse_date, help="Primer día a reconstruir (YYYY-MM-DD)")
+        parser.add_argument('--end', type=parse_date, help="Último día a reconstruir (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        SalesReportService.rebuild(start=options['start'], end=options['end'])
+        self.stdout.write(self.style.SUCCESS("Acumulados de ventas reconstruidos"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api import search
+from api.models import Customer, Dish
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de búsqueda de platos y clientes (necesario tras bulk_create o importaciones)"
+
+    def handle(self, *args, **options):
+        for model in (Dish, Customer):
+            search.rebuild(model)
+        self.stdout.write(self.style.SUCCESS("Índice de búsqueda reconstruido"))
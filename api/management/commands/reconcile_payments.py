@@ -0,0 +1,43 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Abs, Coalesce
+
+from api.models import Order
+
+
+class Command(BaseCommand):
+    help = "Concilia Order.amount_paid e is_paid con la suma de sus pagos y corrige las diferencias"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Corrige las órdenes desviadas")
+
+    def handle(self, *args, **options):
+        money = DecimalField(max_digits=10, decimal_places=2)
+        orders = Order.objects.annotate(
+            payments_total=Coalesce(Sum('payment__amount'), Value(Decimal('0')), output_field=money)
+        ).annotate(
+            difference=Abs(F('amount_paid') - F('payments_total'))
+        ).filter(
+            # Con tolerancia de medio centavo: SQLite suma decimales como flotantes
+            Q(difference__gte=Decimal('0.005'))
+            | Q(is_paid=False, payments_total__gte=F('total_amount') - Decimal('0.005'), payments_total__gt=0)
+        ).values_list('id', 'amount_paid', 'payments_total', 'total_amount')
+
+        drifted = 0
+        for order_id, stored, expected, total in orders.iterator():
+            drifted += 1
+            self.stdout.write(f"Orden #{order_id}: pagado {stored} != pagos {expected}")
+            if options['fix']:
+                updates = {'amount_paid': round(expected, 2)}
+                if expected >= total:
+                    updates['is_paid'] = True
+                Order.objects.filter(pk=order_id).update(**updates)
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Todos los pagos están conciliados"))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"{drifted} órdenes corregidas"))
+        else:
+            self.stdout.write(self.style.WARNING(f"{drifted} órdenes desviadas (usa --fix)"))
@@ -0,0 +1,34 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import jobs, metrics
+
+
+class Command(BaseCommand):
+    help = "Ejecuta las tareas en segundo plano de la cola en base de datos con un pool de hilos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help="Tareas ejecutadas a la vez")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Segundos entre consultas a la cola cuando está vacía")
+        parser.add_argument('--once', action='store_true', help="Vacía la cola y termina (cron, pruebas)")
+        parser.add_argument('--metrics-port', type=int, default=settings.JOBS_METRICS_PORT,
+                            help="Puerto donde exponer /metrics de las tareas (por defecto JOBS_METRICS_PORT)")
+        parser.add_argument('--metrics-host', default=settings.JOBS_METRICS_HOST,
+                            help="Dirección en la que escucha el puerto de métricas")
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['poll_interval'] <= 0:
+            raise CommandError("--threads debe ser al menos 1 y --poll-interval mayor que 0")
+
+        if options['metrics_port'] is not None:
+            # Las series de las tareas viven en este proceso, no en los workers web
+            metrics.serve(options['metrics_port'], options['metrics_host'])
+        worker = jobs.Worker(options['threads'], options['poll_interval'])
+        # SIGTERM/SIGINT terminan las tareas en curso antes de salir
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: worker.stop())
+        processed = worker.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS(f"{processed} tareas ejecutadas"))
@@ -0,0 +1,299 @@
+import hmac
+import ipaddress
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import close_old_connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.decorators import sync_and_async_middleware
+
+# Métricas por acción (p. ej. OrderViewSet.by_table): tiempo total, número y tiempo
+# de consultas SQL y tiempo de serialización de cada petición. Se guardan en
+# histogramas en memoria del proceso (una lista de contadores por serie) y se
+# exponen en formato de texto de Prometheus en /metrics. Con varios procesos,
+# Prometheus agrega las series de cada uno.
+
+logger = logging.getLogger('api.slow_queries')
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+_current = ContextVar('metrics_request', default=None)
+
+
+class Histogram:
+    """Histograma acumulativo al estilo Prometheus; `observe` es O(log buckets)"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self):
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), counts):
+            cumulative += count
+            yield bound, cumulative
+        yield 'sum', total
+        yield 'count', cumulative
+
+
+class Registry:
+    """Series de métricas del proceso: histogramas y contadores por etiquetas"""
+
+    HISTOGRAMS = {
+        'waiterdnd_request_duration_seconds': ("Tiempo total de la petición", SECONDS_BUCKETS),
+        'waiterdnd_request_queries': ("Consultas SQL por petición", QUERY_BUCKETS),
+        'waiterdnd_request_sql_seconds': ("Tiempo en consultas SQL por petición", SECONDS_BUCKETS),
+        'waiterdnd_request_serialization_seconds': (
+            "Tiempo en serializers y renderizado por petición", SECONDS_BUCKETS
+        ),
+        'waiterdnd_job_duration_seconds': ("Tiempo de ejecución de las tareas en segundo plano", SECONDS_BUCKETS),
+    }
+    COUNTERS = {
+        'waiterdnd_requests_total': "Peticiones atendidas",
+        'waiterdnd_slow_queries_total': "Consultas SQL más lentas que SLOW_QUERY_SECONDS",
+        'waiterdnd_jobs_total': "Tareas en segundo plano ejecutadas por resultado",
+    }
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        # Funciones que devuelven líneas ya formateadas, calculadas en cada exportación
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    def add_collector(self, collector):
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, Histogram(self.HISTOGRAMS[name][1]))
+        histogram.observe(value)
+
+    def increment(self, name, labels, amount=1):
+        with self.lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0) + amount
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def export(self):
+        """Texto en formato de exposición de Prometheus (versión 0.0.4)"""
+        lines = []
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        for name, (help_text, _) in self.HISTOGRAMS.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            for (series, labels), histogram in histograms:
+                if series != name:
+                    continue
+                for bound, value in histogram.samples():
+                    if bound in ('sum', 'count'):
+                        lines.append(f'{name}_{bound}{format_labels(labels)} {value}')
+                    else:
+                        lines.append(f'{name}_bucket{format_labels((*labels, ("le", bound)))} {value}')
+        for name, help_text in self.COUNTERS.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            lines += [
+                f'{name}{format_labels(labels)} {value}'
+                for (series, labels), value in counters if series == name
+            ]
+        for collector in self.collectors:
+            lines += collector()
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    """Acumulados de la petición en curso (compartidos con los hilos del ORM vía contextvars)"""
+    __slots__ = ('request', 'queries', 'sql_seconds', 'serialization_seconds', 'serializing')
+
+    def __init__(self, request):
+        self.request = request
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serialization_seconds = 0.0
+        self.serializing = False
+
+
+def record_query(execute, sql, params, many, context):
+    """execute_wrapper instalado en cada conexión; sin petición en curso no mide nada"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.queries += 1
+        metrics.sql_seconds += elapsed
+        threshold = getattr(settings, 'SLOW_QUERY_SECONDS', None)
+        if threshold is not None and elapsed >= threshold:
+            view = view_label(metrics.request)
+            registry.increment('waiterdnd_slow_queries_total', (('view', view),))
+            logger.warning("Consulta lenta (%.1f ms) en %s: %s", elapsed * 1000, view, sql)
+
+
+def install(connection, **kwargs):
+    """Añade record_query una sola vez por conexión (también receptor de connection_created)"""
+    if getattr(settings, 'METRICS_ENABLED', True) and record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def serialization():
+    """Mide el tiempo de serialización de la petición en curso (sin contar anidados)"""
+    metrics = _current.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    metrics.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialization_seconds += time.perf_counter() - started
+        metrics.serializing = False
+
+
+def view_label(request):
+    """Nombre estable de la vista: `OrderViewSet.by_table`, `BatchView.post`, `api.async_views.order_detail`"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    view = match.func
+    view_class = getattr(view, 'cls', None) or getattr(view, 'view_class', None)
+    if view_class is None:
+        return f'{view.__module__}.{view.__name__}'
+    actions = getattr(view, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(request.method.lower(), request.method.lower())}'
+
+
+@sync_and_async_middleware
+def MetricsMiddleware(get_response):
+    """Registra tiempo, consultas SQL y serialización de cada petición"""
+    if not getattr(settings, 'METRICS_ENABLED', True):
+        raise MiddlewareNotUsed
+
+    def record(request, response, metrics, started):
+        labels = (('view', view_label(request)),)
+        registry.observe('waiterdnd_request_duration_seconds', labels, time.perf_counter() - started)
+        registry.observe('waiterdnd_request_queries', labels, metrics.queries)
+        registry.observe('waiterdnd_request_sql_seconds', labels, metrics.sql_seconds)
+        registry.observe('waiterdnd_request_serialization_seconds', labels, metrics.serialization_seconds)
+        registry.increment(
+            'waiterdnd_requests_total', (*labels, ('method', request.method), ('status', response.status_code))
+        )
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            metrics, started = RequestMetrics(request), time.perf_counter()
+            token = _current.set(metrics)
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+            return record(request, response, metrics, started)
+    else:
+        def middleware(request):
+            metrics, started = RequestMetrics(request), time.perf_counter()
+            token = _current.set(metrics)
+            try:
+                response = get_response(request)
+            finally:
+                _current.reset(token)
+            return record(request, response, metrics, started)
+
+    return middleware
+
+
+def scrape_allowed(remote_addr, authorization):
+    """Si el cliente puede leer /metrics: token de METRICS_TOKEN o IP en METRICS_ALLOWED_IPS"""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and hmac.compare_digest(authorization or '', f'Bearer {token}'):
+        return True
+    try:
+        address = ipaddress.ip_address(remote_addr or '')
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in getattr(settings, 'METRICS_ALLOWED_IPS', ())
+    )
+
+
+def metrics_view(request):
+    """Métricas del proceso en formato de texto de Prometheus"""
+    # Exponen tráfico por vista y consultan la base (collectors): solo para el scraper
+    if not scrape_allowed(request.META.get('REMOTE_ADDR'), request.headers.get('Authorization')):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.export(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """GET /metrics para procesos sin servidor web (run_jobs)"""
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        if not scrape_allowed(self.client_address[0], self.headers.get('Authorization')):
+            self.send_error(403)
+            return
+        try:
+            body = registry.export().encode()
+        finally:
+            # Los collectors consultan la base desde este hilo
+            close_old_connections()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host='127.0.0.1'):
+    """Expone las métricas del proceso en http://host:port/metrics desde un hilo aparte"""
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
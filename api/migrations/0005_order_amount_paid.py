@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:58
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+
+
+def backfill_amount_paid(apps, schema_editor):
+    Order = apps.get_model('api', 'Order')
+    Payment = apps.get_model('api', 'Payment')
+    paid = Payment.objects.filter(order=OuterRef('pk')).values('order').annotate(total=Sum('amount')).values('total')
+    Order.objects.filter(pk__in=Payment.objects.values('order')).update(amount_paid=Subquery(paid))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='amount_paid',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(backfill_amount_paid, migrations.RunPython.noop),
+    ]
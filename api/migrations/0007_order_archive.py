@@ -0,0 +1,156 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+ORDER_COLUMNS = (
+    'id, customer_id, table_id, status, notes, total_amount, amount_paid, payment_method, is_paid, '
+    'waiter_id, created_at, updated_at'
+)
+ITEM_COLUMNS = 'id, order_id, dish_id, quantity, price, notes, status, created_at, updated_at'
+PAYMENT_COLUMNS = 'id, order_id, amount, payment_method, payment_reference, created_at, updated_at'
+
+# Historial = tablas calientes UNION ALL archivo (los ids no se repiten: el archivo los conserva)
+HISTORY_VIEWS = [
+    migrations.RunSQL(
+        f"CREATE VIEW api_orderhistory AS "
+        f"SELECT {ORDER_COLUMNS}, FALSE AS archived FROM api_order "
+        f"UNION ALL SELECT {ORDER_COLUMNS}, TRUE AS archived FROM api_archivedorder",
+        "DROP VIEW api_orderhistory",
+    ),
+    migrations.RunSQL(
+        f"CREATE VIEW api_orderitemhistory AS "
+        f"SELECT {ITEM_COLUMNS} FROM api_orderitem UNION ALL SELECT {ITEM_COLUMNS} FROM api_archivedorderitem",
+        "DROP VIEW api_orderitemhistory",
+    ),
+    migrations.RunSQL(
+        f"CREATE VIEW api_paymenthistory AS "
+        f"SELECT {PAYMENT_COLUMNS} FROM api_payment UNION ALL SELECT {PAYMENT_COLUMNS} FROM api_archivedpayment",
+        "DROP VIEW api_paymenthistory",
+    ),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_payment_created_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('preparing', 'En preparación'), ('ready', 'Listo'), ('delivered', 'Entregado'), ('canceled', 'Cancelado')], max_length=20)),
+                ('notes', models.TextField()),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('amount_paid', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('payment_method', models.CharField(max_length=50)),
+                ('is_paid', models.BooleanField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived', models.BooleanField()),
+            ],
+            options={
+                'verbose_name_plural': 'Order history',
+                'db_table': 'api_orderhistory',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderItemHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('notes', models.TextField()),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('preparing', 'En preparación'), ('ready', 'Listo'), ('delivered', 'Entregado'), ('canceled', 'Cancelado')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'Order item history',
+                'db_table': 'api_orderitemhistory',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PaymentHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('payment_method', models.CharField(max_length=50)),
+                ('payment_reference', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'Payment history',
+                'db_table': 'api_paymenthistory',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('preparing', 'En preparación'), ('ready', 'Listo'), ('delivered', 'Entregado'), ('canceled', 'Cancelado')], max_length=20)),
+                ('notes', models.TextField(blank=True)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('payment_method', models.CharField(blank=True, max_length=50)),
+                ('is_paid', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.customer')),
+                ('table', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.table')),
+                ('waiter', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.IntegerField(default=1)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('notes', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('preparing', 'En preparación'), ('ready', 'Listo'), ('delivered', 'Entregado'), ('canceled', 'Cancelado')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('dish', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.dish')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='api.archivedorder')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedPayment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('payment_method', models.CharField(max_length=50)),
+                ('payment_reference', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='api.archivedorder')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['customer', '-created_at'], name='archived_customer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['is_paid', 'created_at'], name='archived_paid_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['-created_at'], name='archived_order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedpayment',
+            index=models.Index(fields=['created_at'], name='archived_payment_created_idx'),
+        ),
+    ] + HISTORY_VIEWS
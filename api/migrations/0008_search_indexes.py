@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from api import search
+
+
+def create_search_indexes(apps, schema_editor):
+    for model_name in search.SEARCH_COLUMNS:
+        search.create_indexes(apps.get_model('api', model_name), schema_editor)
+
+
+def drop_search_indexes(apps, schema_editor):
+    for model_name in search.SEARCH_COLUMNS:
+        search.drop_indexes(apps.get_model('api', model_name), schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_order_archive'),
+    ]
+
+    operations = [
+        # FTS5 en SQLite, GIN sobre tsvector en PostgreSQL (ver api/search.py)
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
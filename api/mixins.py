@@ -0,0 +1,168 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max, prefetch_related_objects
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from . import metrics
+from .cache import get_menu_version
+from .projections import UnsupportedProjection, ValuesProjection
+from .serializers import selected_fields
+
+
+def menu_cache_variant(serializer_class, request):
+    """Parte de la clave del cache del menú que depende de la petición"""
+    # Las URLs de imágenes son absolutas y dependen del host de la petición, y
+    # ?fields= / ?include= cambian los campos serializados
+    selected = selected_fields(serializer_class, request)
+    fields = ','.join(sorted(selected)) if selected is not None else '*'
+    return f"{request.build_absolute_uri('/')}|{fields}"
+
+
+class MenuCacheMixin:
+    """Sirve listados del menú desde el cache versionado de los servicios"""
+
+    def serialize_list(self, queryset):
+        return list(self.get_serializer(queryset, many=True).data)
+
+    def cache_variant(self):
+        return menu_cache_variant(self.get_serializer_class(), self.request)
+
+    def menu_validators(self):
+        """ETag del menú a partir de su versión, sin consultar la base de datos"""
+        return self.make_etag('menu', get_menu_version()), None
+
+
+class ConditionalGetMixin:
+    """Soporte de ETag / Last-Modified para listados y detalles basado en `updated_at`
+
+    Si el cliente ya tiene la versión actual se responde 304 tras una sola
+    consulta agregada, sin serializar nada.
+    """
+
+    def make_etag(self, *parts):
+        digest = hashlib.md5(
+            ':'.join(str(part) for part in (self.request.get_full_path(), *parts)).encode()
+        ).hexdigest()
+        # Débil: el cuerpo puede variar en codificación (p. ej. gzip) sin cambiar su contenido
+        return f'W/"{digest}"'
+
+    def queryset_validators(self, *querysets):
+        """ETag y Last-Modified a partir de max(updated_at) y el número de filas"""
+        parts, last_modified = [], None
+        for queryset in querysets:
+            stats = queryset.order_by().aggregate(last=Max('updated_at'), count=Count('pk'))
+            parts.extend([stats['count'], stats['last']])
+            if stats['last'] and (last_modified is None or stats['last'] > last_modified):
+                last_modified = stats['last']
+        return self.make_etag(*parts), last_modified
+
+    def object_validators(self):
+        """ETag y Last-Modified del objeto de detalle sin cargarlo completo"""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            updated_at = self.get_queryset().filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            ).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError, ValidationError):
+            # PK con formato inválido: sin validadores, retrieve() responde 404 como get_object()
+            return None, None
+        if updated_at is None:
+            return None, None
+        return self.make_etag(updated_at), updated_at
+
+    def conditional(self, validators, build):
+        """Devuelve 304 si el cliente tiene la versión actual; si no, `build()` con las cabeceras"""
+        etag, last_modified = validators
+        timestamp = last_modified.timestamp() if last_modified else None
+        if etag or timestamp:
+            not_modified = get_conditional_response(self.request, etag=etag, last_modified=timestamp)
+            if not_modified is not None:
+                return not_modified
+
+        response = build()
+        if response.status_code == 200:
+            if etag:
+                response['ETag'] = etag
+            if timestamp:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def page_validators(self, page):
+        """ETag y Last-Modified de una página ya cargada, sin consultas extra"""
+        if not page:
+            return self.make_etag('empty'), None
+        # Las páginas proyectadas son filas .values() en lugar de instancias
+        rows = [(row['pk'], row['updated_at']) if isinstance(row, dict) else (row.pk, row.updated_at)
+                for row in page]
+        return (
+            self.make_etag(*(f'{pk}@{updated_at.isoformat()}' for pk, updated_at in rows)),
+            max(updated_at for _, updated_at in rows)
+        )
+
+    # Acciones de listado que se serializan por proyección (.values()) en lugar de instancias
+    projection_actions = ()
+
+    def get_projection(self, serializer):
+        if self.action not in self.projection_actions:
+            return None
+        try:
+            projection = ValuesProjection(serializer)
+        except UnsupportedProjection:
+            return None
+        # Columnas que necesitan la paginación por cursor y los validadores
+        ordering = getattr(self.paginator, 'ordering', ())
+        ordering = (ordering,) if isinstance(ordering, str) else ordering
+        projection.lookups.update(field.lstrip('-') for field in (*ordering, 'updated_at'))
+        return projection
+
+    def needed_prefetches(self, queryset, serializer):
+        """Prefetch del queryset que usan los campos seleccionados con ?fields="""
+        sources = {field.source.split('.')[0] for field in serializer.fields.values()}
+        return [
+            lookup for lookup in queryset._prefetch_related_lookups
+            if getattr(lookup, 'prefetch_to', lookup).split('__')[0] in sources
+        ]
+
+    def conditional_list(self, queryset, serializer_class=None):
+        """Lista (paginada si la vista tiene paginador) con soporte de peticiones condicionales"""
+        serializer_class = serializer_class or self.get_serializer_class()
+        context = self.get_serializer_context()
+        serializer = serializer_class(context=context)
+        projection = self.get_projection(serializer)
+        if projection is not None:
+            queryset = projection.values(queryset)
+
+            def represent(rows):
+                with metrics.serialization():
+                    return projection.represent(rows)
+        else:
+            prefetch_lookups = self.needed_prefetches(queryset, serializer)
+            queryset = queryset.prefetch_related(None)
+
+            def represent(objects):
+                prefetch_related_objects(objects, *prefetch_lookups)
+                return serializer_class(objects, many=True, context=context).data
+
+        if self.paginator is None:
+            return self.conditional(self.queryset_validators(queryset), lambda: Response(
+                represent(list(queryset))
+            ))
+
+        # Con paginación se valida solo la página: el costo no depende del tamaño de la tabla.
+        # Los prefetch se aplazan hasta saber que hay que serializar.
+        page = self.paginate_queryset(queryset)
+        return self.conditional(
+            self.page_validators(page), lambda: self.get_paginated_response(represent(page))
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_list(self.filter_queryset(self.get_queryset()))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(
+            self.object_validators(),
+            lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs)
+        )
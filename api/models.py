@@ -1,5 +1,9 @@
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from . import occupancy
 
 class BaseModel(models.Model):
     """Base model with common fields"""
@@ -32,6 +36,8 @@ class Dish(BaseModel):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='dishes')
     # ingredients = models.ManyToManyField(Ingredient, through='DishIngredient')
     image = models.ImageField(upload_to='dishes/', blank=True, null=True)
+    # Variantes redimensionadas de `image` ({'source': ..., 'thumbnail': ..., ...}), ver api/images.py
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_available = models.BooleanField(default=True)
     is_featured = models.BooleanField(default=False)
     # calories = models.IntegerField(blank=True, null=True)
@@ -78,24 +84,75 @@ class Order(BaseModel):
     # order_type = models.CharField(max_length=20, choices=ORDER_TYPE_CHOICES, default='dine_in')
     notes = models.TextField(blank=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     payment_method = models.CharField(max_length=50, blank=True)
     is_paid = models.BooleanField(default=False)
     waiter = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='orders')
     
+    class Meta:
+        # Índices alineados con las consultas de OrderService y TableService
+        indexes = [
+            models.Index(fields=['-created_at'], name='order_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='order_status_created_idx'),
+            models.Index(fields=['table', '-created_at'], name='order_table_created_idx'),
+            models.Index(fields=['customer', '-created_at'], name='order_customer_created_idx'),
+            models.Index(fields=['is_paid', 'created_at'], name='order_paid_created_idx'),
+            # Parcial (donde el motor lo soporte): solo las órdenes que ocupan mesa
+            models.Index(
+                fields=['table'], name='order_open_table_idx',
+                condition=models.Q(status__in=['pending', 'preparing'])
+            ),
+        ]
+    
     def __str__(self):
         if self.customer:
             return f"Orden #{self.id} - {self.customer.name}"
         return f"Orden #{self.id}"
     
-    def calculate_total(self):
-        """Calcula el monto total de la orden"""
-        return sum(item.subtotal for item in self.orderitem_set.all())
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._persisted_occupancy = (instance.__dict__.get('table_id'), instance.__dict__.get('status'))
+        return instance
+    
+    # Acumulados que solo se modifican con UPDATEs atómicos (F()); un save() completo no los pisa
+    COUNTER_FIELDS = ('total_amount', 'amount_paid')
+    
+    @property
+    def balance_due(self):
+        """Monto pendiente de pago"""
+        return max(self.total_amount - self.amount_paid, 0)
     
     def save(self, *args, **kwargs):
-        """Actualiza el total de la orden antes de guardar"""
-        if self.id:
-            self.total_amount = self.calculate_total()
+        """Mantiene el mapa de ocupación de mesas al crear o cambiar mesa/estado"""
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        previous = getattr(self, '_persisted_occupancy', (None, None))
         super().save(*args, **kwargs)
+        occupancy.record_change(*previous, self.table_id, self.status)
+        self._persisted_occupancy = (self.table_id, self.status)
+    
+    def delete(self, *args, **kwargs):
+        previous = getattr(self, '_persisted_occupancy', (self.table_id, self.status))
+        result = super().delete(*args, **kwargs)
+        occupancy.record_change(*previous, None, None)
+        return result
+    
+    def calculate_total(self):
+        """Calcula el monto total de la orden a partir de sus items"""
+        return sum(item.subtotal for item in self.orderitem_set.all())
+    
+    @classmethod
+    def apply_total_delta(cls, order_id, delta=0):
+        """Suma `delta` al total de la orden con un UPDATE atómico y la marca como modificada"""
+        if order_id:
+            cls.objects.filter(pk=order_id).update(
+                total_amount=F('total_amount') + delta,
+                updated_at=timezone.now()
+            )
 
 class OrderItem(BaseModel):
     """Items dentro de una orden"""
@@ -114,11 +171,54 @@ class OrderItem(BaseModel):
         """Calcula el subtotal del item"""
         return self.quantity * self.price
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_persisted_state()
+        return instance
+    
+    def _remember_persisted_state(self):
+        """Guarda la orden y el subtotal persistidos para calcular deltas"""
+        try:
+            self._persisted = (self.order_id, self.subtotal)
+        except TypeError:
+            # Instancia cargada con .only()/.defer() sin cantidad o precio
+            self._persisted = None
+    
     def save(self, *args, **kwargs):
-        """Establece el precio basado en el plato si es un nuevo item"""
+        """Establece el precio del plato si es nuevo y ajusta el total de la orden"""
         if not self.id and not self.price:
             self.price = self.dish.price
+        
+        update_fields = kwargs.get('update_fields')
+        affects_total = update_fields is None or {'order', 'order_id', 'quantity', 'price'} & set(update_fields)
+        previous = getattr(self, '_persisted', None) if self.id else (None, 0)
+        if affects_total and previous is None:
+            # No conocemos el estado persistido: lo leemos una vez
+            previous = OrderItem.objects.filter(pk=self.pk).values_list('order_id', 'quantity', 'price').first()
+            previous = (previous[0], previous[1] * previous[2]) if previous else (None, 0)
+        
         super().save(*args, **kwargs)
+        
+        if not affects_total:
+            # El detalle de la orden incluye sus items: se marca como modificada
+            Order.apply_total_delta(self.order_id)
+            return
+        
+        old_order_id, old_subtotal = previous
+        if old_order_id == self.order_id:
+            Order.apply_total_delta(self.order_id, self.subtotal - old_subtotal)
+        else:
+            Order.apply_total_delta(old_order_id, -old_subtotal)
+            Order.apply_total_delta(self.order_id, self.subtotal)
+        self._remember_persisted_state()
+    
+    def delete(self, *args, **kwargs):
+        """Descuenta el subtotal del item del total de la orden"""
+        order_id, subtotal = self.order_id, self.subtotal
+        result = super().delete(*args, **kwargs)
+        Order.apply_total_delta(order_id, -subtotal)
+        return result
 
 class Payment(BaseModel):
     """Pagos realizados por los clientes"""
@@ -127,6 +227,238 @@ class Payment(BaseModel):
     payment_method = models.CharField(max_length=50)
     payment_reference = models.CharField(max_length=100, blank=True)
     
+    class Meta:
+        indexes = [
+            # Cubre la suma de pagos por orden sin leer la tabla
+            models.Index(fields=['order', 'amount'], name='payment_order_amount_idx'),
+            # Exportaciones contables por rango de fechas
+            models.Index(fields=['created_at'], name='payment_created_idx'),
+        ]
+    
     def __str__(self):
         return f"Pago #{self.id} - Orden #{self.order.id}"
 
+
+
+# Archivo de órdenes cerradas: ArchiveService mueve aquí, por lotes, las órdenes
+# entregadas y pagadas más antiguas que ARCHIVE_AFTER_DAYS junto con sus items y
+# pagos, conservando los ids. Así las tablas calientes solo guardan la operación
+# reciente y los índices que usan las consultas del día caben en memoria.
+
+class ArchivedOrder(models.Model):
+    """Orden cerrada archivada (mismas columnas que Order)"""
+    id = models.BigIntegerField(primary_key=True)
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    table = models.ForeignKey(Table, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    notes = models.TextField(blank=True)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    payment_method = models.CharField(max_length=50, blank=True)
+    is_paid = models.BooleanField(default=False)
+    waiter = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer', '-created_at'], name='archived_customer_created_idx'),
+            models.Index(fields=['is_paid', 'created_at'], name='archived_paid_created_idx'),
+            models.Index(fields=['-created_at'], name='archived_order_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Orden archivada #{self.id}"
+
+class ArchivedOrderItem(models.Model):
+    """Item de una orden archivada"""
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    dish = models.ForeignKey(Dish, on_delete=models.CASCADE, related_name='+')
+    quantity = models.IntegerField(default=1)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    notes = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+class ArchivedPayment(models.Model):
+    """Pago de una orden archivada"""
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='payments')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    payment_method = models.CharField(max_length=50)
+    payment_reference = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='archived_payment_created_idx'),
+        ]
+
+
+# Vistas de solo lectura (UNION ALL de las tablas calientes y del archivo) para
+# los reportes y el historial por cliente. Los accesores `orderitem_set` y
+# `payment_set` son los de Order, así que los serializers y exportaciones de
+# órdenes sirven igual para el historial.
+
+class OrderHistory(models.Model):
+    """Órdenes calientes y archivadas (vista api_orderhistory)"""
+    customer = models.ForeignKey(
+        Customer, on_delete=models.DO_NOTHING, null=True, db_constraint=False, related_name='+'
+    )
+    table = models.ForeignKey(Table, on_delete=models.DO_NOTHING, null=True, db_constraint=False, related_name='+')
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    notes = models.TextField()
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2)
+    payment_method = models.CharField(max_length=50)
+    is_paid = models.BooleanField()
+    waiter = models.ForeignKey(User, on_delete=models.DO_NOTHING, null=True, db_constraint=False, related_name='+')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived = models.BooleanField()
+    
+    class Meta:
+        managed = False
+        db_table = 'api_orderhistory'
+        verbose_name_plural = "Order history"
+
+class OrderItemHistory(models.Model):
+    """Items de órdenes calientes y archivadas (vista api_orderitemhistory)"""
+    order = models.ForeignKey(
+        OrderHistory, on_delete=models.DO_NOTHING, db_constraint=False, related_name='orderitem_set'
+    )
+    dish = models.ForeignKey(Dish, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    quantity = models.IntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    notes = models.TextField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    
+    class Meta:
+        managed = False
+        db_table = 'api_orderitemhistory'
+        verbose_name_plural = "Order item history"
+    
+    @property
+    def subtotal(self):
+        return self.quantity * self.price
+
+class PaymentHistory(models.Model):
+    """Pagos de órdenes calientes y archivadas (vista api_paymenthistory)"""
+    order = models.ForeignKey(
+        OrderHistory, on_delete=models.DO_NOTHING, db_constraint=False, related_name='payment_set'
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    payment_method = models.CharField(max_length=50)
+    payment_reference = models.CharField(max_length=100)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    
+    class Meta:
+        managed = False
+        db_table = 'api_paymenthistory'
+        verbose_name_plural = "Payment history"
+
+
+
+class SalesRollup(BaseModel):
+    """Base de los acumulados de ventas de órdenes pagadas"""
+    total_sales = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+    
+    class Meta:
+        abstract = True
+
+class DailySales(SalesRollup):
+    """Ventas acumuladas por día de creación de la orden"""
+    date = models.DateField(unique=True)
+    
+    class Meta:
+        verbose_name_plural = "Daily sales"
+
+class HourlySales(SalesRollup):
+    """Ventas acumuladas por hora de creación de la orden"""
+    hour = models.DateTimeField(unique=True)
+    
+    class Meta:
+        verbose_name_plural = "Hourly sales"
+
+class PaymentMethodSales(SalesRollup):
+    """Ventas acumuladas por día y método de pago"""
+    date = models.DateField()
+    payment_method = models.CharField(max_length=50)
+    
+    class Meta:
+        verbose_name_plural = "Payment method sales"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'payment_method'], name='unique_payment_method_sales'),
+        ]
+
+class DishSales(SalesRollup):
+    """Unidades y ventas acumuladas por día y plato"""
+    date = models.DateField()
+    dish = models.ForeignKey(Dish, on_delete=models.CASCADE, related_name='sales')
+    quantity = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name_plural = "Dish sales"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'dish'], name='unique_dish_sales'),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """Primera respuesta de una creación enviada con la cabecera Idempotency-Key (ver api/idempotency.py)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    # Hash del método, la ruta y el cuerpo: la misma clave con otra petición es un error del cliente
+    fingerprint = models.CharField(max_length=64)
+    # Nulo mientras la primera petición se está procesando
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+
+
+class Job(BaseModel):
+    """Tarea en segundo plano de la cola en base de datos (ver api/jobs.py)"""
+    STATUS_CHOICES = (
+        ('queued', 'En cola'),
+        ('running', 'En ejecución'),
+        ('succeeded', 'Completada'),
+        ('failed', 'Fallida'),
+    )
+    
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    # Primer momento en que puede ejecutarse (se aplaza con cada reintento)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    class Meta:
+        indexes = [
+            # Lo que consulta el worker: tareas en cola ya vencidas, las más antiguas primero
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
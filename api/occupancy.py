@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .cache import is_shared_cache
+
+# Estado de ocupación de mesas en el cache: un contador de órdenes abiertas por mesa.
+# Los contadores se ajustan con incr/decr (atómicos en cualquier backend) cuando una
+# orden se crea, cambia de estado o de mesa. La base de datos sigue siendo la fuente
+# de verdad: si falta algún contador el estado se reconstruye desde las órdenes, y
+# el mapa completo se reconstruye cada TABLE_OCCUPANCY_REBUILD_SECONDS.
+# Los contadores solo son correctos si todos los procesos comparten el cache: con
+# un backend local (LocMemCache) cada proceso vería solo sus propios cambios, así
+# que en ese caso se consulta directamente la base de datos.
+
+OPEN_STATUSES = ('pending', 'preparing')
+READY_KEY = 'tables:occupancy:ready'
+TIMEOUT = None
+
+
+def _key(table_id):
+    return f'tables:occupancy:{table_id}'
+
+
+def enabled():
+    """Si el mapa de ocupación del cache está en uso (TABLE_OCCUPANCY_CACHE o backend compartido)"""
+    if settings.TABLE_OCCUPANCY_CACHE is None:
+        return is_shared_cache()
+    return settings.TABLE_OCCUPANCY_CACHE
+
+
+def is_open(status):
+    return status in OPEN_STATUSES
+
+
+def count_open_orders():
+    """Órdenes abiertas por mesa según la base de datos"""
+    from .services import TableService
+
+    return dict(
+        TableService.get_busy_orders().values('table_id').annotate(open_orders=Count('id'))
+        .order_by().values_list('table_id', 'open_orders')
+    )
+
+
+def rebuild():
+    """Reconstruye todos los contadores desde la base de datos"""
+    from .models import Table
+
+    counts = count_open_orders()
+    cache.set_many(
+        {_key(table_id): counts.get(table_id, 0) for table_id in Table.objects.values_list('id', flat=True)},
+        timeout=TIMEOUT
+    )
+    cache.set(READY_KEY, True, timeout=settings.TABLE_OCCUPANCY_REBUILD_SECONDS)
+    return counts
+
+
+def busy_table_ids(table_ids):
+    """IDs de las mesas con órdenes abiertas: una sola lectura del cache"""
+    table_ids = list(table_ids)
+    if not enabled():
+        counts = count_open_orders()
+        return {table_id for table_id in table_ids if counts.get(table_id)}
+    values = cache.get_many([_key(table_id) for table_id in table_ids]) if cache.get(READY_KEY) else {}
+    if len(values) < len(table_ids):
+        # Estado ausente o expulsado del cache: se reconstruye desde la base de datos
+        counts = rebuild()
+        return {table_id for table_id in table_ids if counts.get(table_id)}
+    return {table_id for table_id in table_ids if values[_key(table_id)] > 0}
+
+
+def _adjust(table_id, delta):
+    try:
+        cache.incr(_key(table_id), delta)
+    except ValueError:
+        # Contador ausente: se fuerza la reconstrucción en la próxima lectura
+        cache.delete(READY_KEY)
+
+
+def record_change(old_table_id, old_status, new_table_id, new_status):
+    """Ajusta los contadores cuando una orden cambia de mesa o de estado, tras el commit"""
+    was_busy = old_table_id if old_table_id and is_open(old_status) else None
+    now_busy = new_table_id if new_table_id and is_open(new_status) else None
+    if was_busy == now_busy or not enabled():
+        return
+
+    def apply():
+        if was_busy:
+            _adjust(was_busy, -1)
+        if now_busy:
+            _adjust(now_busy, 1)
+
+    transaction.on_commit(apply)
+
+
+def check(fix=False):
+    """Compara el cache con la base de datos; devuelve {table_id: (cache, db)} de las diferencias"""
+    from .models import Table
+
+    counts = count_open_orders()
+    table_ids = list(Table.objects.values_list('id', flat=True))
+    cached = cache.get_many([_key(table_id) for table_id in table_ids])
+    drift = {
+        table_id: (cached.get(_key(table_id)), counts.get(table_id, 0))
+        for table_id in table_ids
+        if cached.get(_key(table_id)) != counts.get(table_id, 0)
+    }
+    if fix and drift:
+        rebuild()
+    return drift
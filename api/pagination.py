@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """Paginación por cursor sobre `-created_at`, el mismo orden que usa OrderService
+
+    Cada página es un rango sobre el índice de `created_at`: su costo no crece
+    con la profundidad y no requiere COUNT(*).
+    """
+    ordering = '-created_at'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -0,0 +1,101 @@
+from collections import defaultdict
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+class UnsupportedProjection(Exception):
+    """El serializer tiene campos que no se pueden construir desde filas .values()"""
+
+
+def _check_lookup(model, lookup):
+    """Verifica que `a__b` sea una columna alcanzable con .values()"""
+    try:
+        for part in lookup.split('__'):
+            field = model._meta.get_field(part)
+            model = field.related_model or model
+    except FieldDoesNotExist:
+        raise UnsupportedProjection(lookup)
+    return lookup
+
+
+class ValuesProjection:
+    """Construye la salida de un serializer a partir de filas `.values()`, sin instancias de modelo
+
+    Se compila una vez a partir de los campos del serializer (ya filtrados por
+    ?fields=): cada campo se traduce a una columna de `.values()` y a la función
+    `to_representation` del propio campo, de modo que la salida es idéntica a la
+    del ModelSerializer. Las listas anidadas (p. ej. los items de una orden) se
+    resuelven con una consulta adicional agrupada por la clave foránea.
+    """
+
+    def __init__(self, serializer):
+        self.model = model = serializer.Meta.model
+        computed = getattr(serializer.Meta, 'projected_fields', {})
+        self.plan = []
+        self.lookups = {'pk'}
+
+        for name, field in serializer.fields.items():
+            if name in computed:
+                dependencies, function = computed[name]
+                self.plan.append((name, 'computed', (dependencies, function)))
+                self.lookups.update(dependencies)
+            elif isinstance(field, serializers.ListSerializer):
+                relation = next(
+                    (rel for rel in model._meta.related_objects if rel.get_accessor_name() == field.source), None
+                )
+                if relation is None:
+                    raise UnsupportedProjection(name)
+                self.plan.append((name, 'nested', (ValuesProjection(field.child), relation.field.name)))
+            elif isinstance(field, (serializers.FileField, serializers.BaseSerializer)):
+                raise UnsupportedProjection(name)
+            elif isinstance(field, (serializers.RelatedField, serializers.ReadOnlyField)):
+                lookup = _check_lookup(model, field.source.replace('.', '__'))
+                if '__' in lookup:
+                    # Como DRF, el campo se omite si la relación intermedia es nula
+                    relation = lookup.split('__')[0]
+                    self.plan.append((name, 'related', (lookup, relation)))
+                    self.lookups.add(relation)
+                else:
+                    self.plan.append((name, 'column', (lookup, None)))
+                self.lookups.add(lookup)
+            else:
+                lookup = _check_lookup(model, field.source)
+                self.plan.append((name, 'column', (lookup, field.to_representation)))
+                self.lookups.add(lookup)
+
+    def values(self, queryset):
+        """Queryset de filas con todas las columnas necesarias (sin prefetch)"""
+        return queryset.prefetch_related(None).values(*self.lookups)
+
+    def represent(self, rows):
+        rows = list(rows)
+        children = {}
+        parent_ids = [row['pk'] for row in rows]
+        for name, kind, (projection, foreign_key) in (step for step in self.plan if step[1] == 'nested'):
+            grouped = defaultdict(list)
+            if parent_ids:
+                child_rows = projection.model.objects.filter(**{f'{foreign_key}__in': parent_ids}).order_by('pk')
+                for child in child_rows.values(*projection.lookups, foreign_key):
+                    grouped[child[foreign_key]].append(child)
+            children[name] = grouped
+        return [self.represent_row(row, children) for row in rows]
+
+    def represent_row(self, row, children=None):
+        data = {}
+        for name, kind, args in self.plan:
+            if kind == 'column':
+                lookup, convert = args
+                value = row[lookup]
+                data[name] = convert(value) if convert is not None and value is not None else value
+            elif kind == 'related':
+                lookup, relation = args
+                if row[relation] is not None:
+                    data[name] = row[lookup]
+            elif kind == 'computed':
+                dependencies, function = args
+                data[name] = function(*(row[dependency] for dependency in dependencies))
+            else:
+                projection, _ = args
+                data[name] = [projection.represent_row(child) for child in children[name].get(row['pk'], [])]
+        return data
@@ -0,0 +1,29 @@
+import re
+
+from django.db import connections
+
+# Patrones de EXPLAIN que indican lectura completa de una tabla por motor
+_FULL_SCAN_PATTERNS = {
+    # SQLite: "SCAN api_order" (sin índice). "SCAN ... USING INDEX" recorre un índice en orden.
+    'sqlite': re.compile(r'\bSCAN (?P<table>\w+)\s*$'),
+    # PostgreSQL: "Seq Scan on api_order"
+    'postgresql': re.compile(r'Seq Scan on (?P<table>\w+)'),
+}
+
+
+def full_table_scans(queryset, allow=()):
+    """Devuelve las tablas que la consulta lee completas según EXPLAIN
+
+    `allow` lista tablas pequeñas (p. ej. mesas) cuya lectura completa es aceptable.
+    """
+    vendor = connections[queryset.db].vendor
+    pattern = _FULL_SCAN_PATTERNS.get(vendor)
+    if pattern is None:
+        return []
+
+    scans = []
+    for line in queryset.explain().splitlines():
+        match = pattern.search(line)
+        if match and match.group('table') not in allow:
+            scans.append(match.group('table'))
+    return scans
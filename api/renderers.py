@@ -0,0 +1,33 @@
+from rest_framework.renderers import JSONRenderer
+
+from . import metrics
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - sin orjson se usa el renderer de DRF
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer con orjson: misma salida que el de DRF, codificada en C
+
+    Los tipos que orjson no conoce (Decimal, fechas, UUID, textos traducibles)
+    pasan por el encoder de DRF, así que los montos siguen saliendo como el
+    texto exacto que produce DecimalField. Con `indent` (API navegable) o sin
+    orjson instalado se delega en el renderer de DRF.
+    """
+    options = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        with metrics.serialization():
+            return self.render_json(data, accepted_media_type, renderer_context)
+
+    def render_json(self, data, accepted_media_type, renderer_context):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        content = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        # Igual que DRF: JSON siempre válido como subconjunto de JavaScript
+        return content.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
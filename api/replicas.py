@@ -0,0 +1,153 @@
+import functools
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import QuerySet
+from django.utils.decorators import sync_and_async_middleware
+
+# Réplicas de lectura: los métodos de lectura de los servicios marcados con
+# @replica_safe leen de un alias de settings.DATABASE_REPLICAS; todo lo demás
+# (y toda escritura) va a la base principal. En cuanto una petición escribe
+# queda fijada a la principal, y una cookie mantiene al cliente en ella durante
+# REPLICA_PIN_SECONDS para que lea sus propias escrituras pese al retraso de
+# la replicación.
+
+PIN_COOKIE = 'primary_pinned'
+UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+_pinned = ContextVar('replicas_pinned', default=False)
+_wrote = ContextVar('replicas_wrote', default=False)
+_reading = ContextVar('replicas_reading', default=None)
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def pin():
+    """Envía el resto de lecturas del contexto actual a la base principal"""
+    _pinned.set(True)
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+def record_write():
+    """Marca que el contexto actual escribió (y lo fija a la principal)"""
+    _wrote.set(True)
+    pin()
+
+
+def has_written():
+    return _wrote.get()
+
+
+@contextmanager
+def pinning(pinned):
+    """Ámbito (una petición) con su propio estado de fijación a la principal"""
+    token, wrote_token = _pinned.set(pinned), _wrote.set(False)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+        _wrote.reset(wrote_token)
+
+
+def read_alias():
+    """Alias para una lectura tolerante al retraso de replicación"""
+    replicas = replica_aliases()
+    if not replicas or is_pinned():
+        return DEFAULT_DB_ALIAS
+    return random.choice(replicas)
+
+
+def replica_safe(method):
+    """Marca un método de lectura de un servicio como apto para leer de una réplica
+
+    Los querysets devueltos quedan ligados al alias elegido (se evalúan más tarde,
+    en la vista); las consultas que el método ejecuta por sí mismo se enrutan
+    con ReplicaRouter mientras dura la llamada.
+    """
+    def bind(result, alias):
+        if isinstance(result, QuerySet) and alias != DEFAULT_DB_ALIAS:
+            return result.using(alias)
+        return result
+
+    if iscoroutinefunction(method):
+        async def wrapper(*args, **kwargs):
+            alias = read_alias()
+            token = _reading.set(alias)
+            try:
+                return bind(await method(*args, **kwargs), alias)
+            finally:
+                _reading.reset(token)
+    else:
+        def wrapper(*args, **kwargs):
+            alias = read_alias()
+            token = _reading.set(alias)
+            try:
+                return bind(method(*args, **kwargs), alias)
+            finally:
+                _reading.reset(token)
+
+    return functools.wraps(method)(wrapper)
+
+
+class ReplicaRouter:
+    """Router de DATABASE_ROUTERS: lecturas marcadas a réplicas, escrituras a la principal"""
+
+    def db_for_read(self, model, **hints):
+        # None: Django usa la base de la instancia relacionada o la principal
+        return _reading.get()
+
+    def db_for_write(self, model, **hints):
+        # Cualquier escritura (save, update, select_for_update...) fija la petición a la principal
+        record_write()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas tienen el mismo esquema (migrate --database=<réplica> en local)
+        return True
+
+
+@sync_and_async_middleware
+def ReplicaPinMiddleware(get_response):
+    """Fija a la principal las peticiones que escriben y las que llegan poco después"""
+    pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+    def starts_pinned(request):
+        # Los métodos de escritura leen de la principal desde el principio: el objeto que
+        # se actualiza no debe venir de una réplica atrasada
+        return request.method in UNSAFE_METHODS or PIN_COOKIE in request.COOKIES
+
+    def remember(request, response, wrote):
+        # Cada escritura renueva el plazo, aunque el cliente ya traiga la cookie
+        if (wrote or request.method in UNSAFE_METHODS) and replica_aliases():
+            response.set_cookie(PIN_COOKIE, '1', max_age=pin_seconds, httponly=True, samesite='Lax')
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with pinning(starts_pinned(request)):
+                response = await get_response(request)
+                wrote = has_written()
+            return remember(request, response, wrote)
+    else:
+        def middleware(request):
+            with pinning(starts_pinned(request)):
+                response = get_response(request)
+                wrote = has_written()
+            return remember(request, response, wrote)
+
+    return middleware
@@ -0,0 +1,211 @@
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .cache import get_menu_version
+
+# Búsqueda de platos y clientes por texto parcial, sin recorrer las tablas:
+# - SQLite: una tabla virtual FTS5 por modelo (api_dish_search, api_customer_search)
+#   con rowid = id del objeto, sincronizada por las señales de guardado y borrado.
+# - PostgreSQL: índice GIN sobre el tsvector de las mismas columnas; la consulta
+#   usa exactamente esa expresión, así que no hace falta sincronizar nada.
+# - Otros motores: icontains (lectura completa), solo para que la API funcione.
+# El autocompletado del menú usa además un índice de prefijos en memoria que se
+# reconstruye cuando cambia la versión del menú.
+
+# Columnas indexadas por modelo (model_name)
+SEARCH_COLUMNS = {
+    'dish': ('name',),
+    'customer': ('name', 'document_number', 'phone', 'email'),
+}
+
+
+def normalize(text):
+    """Minúsculas y sin tildes, como el tokenizador unicode61 con remove_diacritics"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokens(text):
+    return re.findall(r'\w+', normalize(text))
+
+
+def fts_table(model):
+    return f'{model._meta.db_table}_search'
+
+
+def document(model, values):
+    """Texto indexado de un objeto a partir de sus columnas de búsqueda"""
+    text = ' '.join(value or '' for value in values)
+    if model._meta.model_name == 'customer':
+        # El teléfono también como un solo número, para buscar "3001234" en "300 123 4567"
+        text += ' ' + re.sub(r'\D', '', values[SEARCH_COLUMNS['customer'].index('phone')] or '')
+    return text
+
+
+def _tsvector(model, table=None):
+    names = SEARCH_COLUMNS[model._meta.model_name]
+    columns = " || ' ' || ".join(f'{table}.{name}' if table else name for name in names)
+    return f"to_tsvector('simple', {columns})"
+
+
+def create_indexes(model, schema_editor):
+    """Crea el índice de búsqueda del modelo según el motor (usado por la migración)"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {fts_table(model)} USING fts5("
+            f"body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        rebuild(model, using=schema_editor.connection.alias)
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE INDEX {model._meta.model_name}_search_idx ON {model._meta.db_table} USING gin ({_tsvector(model)})"
+        )
+
+
+def drop_indexes(model, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE {fts_table(model)}")
+    elif vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX {model._meta.model_name}_search_idx")
+
+
+def rebuild(model, using=DEFAULT_DB_ALIAS, batch_size=2000):
+    """Vuelve a llenar la tabla FTS del modelo (tras bulk_create o una importación)"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    table = fts_table(model)
+    rows = model._default_manager.using(using).values_list('pk', *SEARCH_COLUMNS[model._meta.model_name])
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table}")
+        batch = []
+        for pk, *values in rows.iterator(chunk_size=batch_size):
+            batch.append((pk, document(model, values)))
+            if len(batch) == batch_size:
+                cursor.executemany(f"INSERT INTO {table}(rowid, body) VALUES (%s, %s)", batch)
+                batch = []
+        if batch:
+            cursor.executemany(f"INSERT INTO {table}(rowid, body) VALUES (%s, %s)", batch)
+
+
+def index(instance, using=DEFAULT_DB_ALIAS):
+    """Actualiza la entrada del objeto (receptor de post_save)"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    model = type(instance)
+    values = [getattr(instance, name) for name in SEARCH_COLUMNS[model._meta.model_name]]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {fts_table(model)} WHERE rowid = %s", [instance.pk])
+        cursor.execute(
+            f"INSERT INTO {fts_table(model)}(rowid, body) VALUES (%s, %s)", [instance.pk, document(model, values)]
+        )
+
+
+def remove(instance, using=DEFAULT_DB_ALIAS):
+    """Elimina la entrada del objeto (receptor de post_delete)"""
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {fts_table(type(instance))} WHERE rowid = %s", [instance.pk])
+
+
+def search(queryset, query, limit):
+    """Objetos de `queryset` que contienen palabras que empiezan por cada término, por relevancia
+
+    La búsqueda y los filtros del queryset van en la misma consulta, así que el
+    LIMIT se aplica a los objetos que cumplen ambos.
+    """
+    terms = tokens(query)
+    if not terms:
+        return []
+    model = queryset.model
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    pk_column = f'{quote(model._meta.db_table)}.{quote(model._meta.pk.column)}'
+
+    if connection.vendor == 'sqlite':
+        table = fts_table(model)
+        match = ' '.join(f'"{term}"*' for term in terms)
+        matches = RawSQL(f"SELECT rowid FROM {table} WHERE {table} MATCH %s", [match])
+        rank = RawSQL(f"SELECT rank FROM {table} WHERE {table} MATCH %s AND rowid = {pk_column}", [match])
+        ordering = 'search_rank'
+    elif connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        matches = RawSQL(
+            f"SELECT id FROM {model._meta.db_table} WHERE {_tsvector(model)} @@ to_tsquery('simple', %s)", [tsquery]
+        )
+        rank = RawSQL(f"ts_rank({_tsvector(model, model._meta.db_table)}, to_tsquery('simple', %s))", [tsquery])
+        ordering = '-search_rank'
+    else:
+        columns = SEARCH_COLUMNS[model._meta.model_name]
+        condition = Q()
+        for term in terms:
+            condition &= Q.create([(f'{column}__icontains', term) for column in columns], connector=Q.OR)
+        return list(queryset.filter(condition)[:limit])
+
+    return list(queryset.filter(pk__in=matches).annotate(search_rank=rank).order_by(ordering, 'pk')[:limit])
+
+
+class PrefixIndex:
+    """Índice en memoria de prefijos: pares (palabra, id) ordenados y búsqueda binaria
+
+    Cada término de la consulta es un rango contiguo de la lista ordenada, así que
+    buscar cuesta O(log palabras + coincidencias) sin tocar la base de datos.
+    """
+
+    def __init__(self, entries):
+        # entries: (id, texto, payload)
+        self.payloads = {}
+        pairs = []
+        for pk, text, payload in entries:
+            self.payloads[pk] = (normalize(text), payload)
+            pairs.extend((word, pk) for word in set(tokens(text)))
+        pairs.sort()
+        self.words = [word for word, _ in pairs]
+        self.ids = [pk for _, pk in pairs]
+
+    def matching(self, prefix):
+        start = bisect_left(self.words, prefix)
+        end = bisect_left(self.words, prefix + '\U0010ffff', start)
+        return set(self.ids[start:end])
+
+    def search(self, query, limit):
+        terms = tokens(query)
+        if not terms:
+            return []
+        found = None
+        # Los términos más largos suelen ser los más selectivos
+        for term in sorted(terms, key=len, reverse=True):
+            found = self.matching(term) if found is None else found & self.matching(term)
+            if not found:
+                return []
+        # Primero los nombres que empiezan por la consulta, luego por orden alfabético
+        start = normalize(query).strip()
+        ranked = sorted(found, key=lambda pk: (not self.payloads[pk][0].startswith(start), self.payloads[pk][0]))
+        return [self.payloads[pk][1] for pk in ranked[:limit]]
+
+
+_menu_index = (None, None)
+_menu_lock = threading.Lock()
+
+
+def menu_index(build):
+    """Índice de prefijos del menú para la versión actual; `build()` devuelve sus entradas"""
+    global _menu_index
+    version = get_menu_version()
+    current_version, current = _menu_index
+    if current_version == version:
+        return current
+    with _menu_lock:
+        if _menu_index[0] != version:
+            _menu_index = (version, PrefixIndex(build()))
+        return _menu_index[1]
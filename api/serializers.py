@@ -1,6 +1,51 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Category, Dish, Table, Customer, Order, OrderItem, Payment
+from . import images, metrics
+from .models import (
+    Category, Dish, Table, Customer, Order, OrderItem, Payment, OrderHistory, OrderItemHistory
+)
+from .services import OrderService
+
+def selected_fields(serializer_class, request):
+    """Campos de salida pedidos con ?fields= / ?include= (None si no se restringe nada)
+
+    Los campos de `Meta.optional_fields` solo se incluyen si se piden; `Meta.expansions`
+    traduce nombres cortos de ?include= (p. ej. `customer`) al campo correspondiente.
+    """
+    meta = getattr(serializer_class, 'Meta', None)
+    optional = set(getattr(meta, 'optional_fields', ()))
+    fields, include = set(), set()
+    if request is not None and request.method in ('GET', 'HEAD'):
+        params = getattr(request, 'query_params', request.GET)
+        expansions = getattr(meta, 'expansions', {})
+        include = {expansions.get(name, name) for name in params.get('include', '').split(',') if name}
+        fields = {name for name in params.get('fields', '').split(',') if name}
+    if not fields and not optional:
+        return None
+    return (fields or set(meta.fields) - optional) | include
+
+class TimedListSerializer(serializers.ListSerializer):
+    """ListSerializer que suma su tiempo a la métrica de serialización de la petición"""
+    
+    @property
+    def data(self):
+        with metrics.serialization():
+            return super().data
+
+class DynamicFieldsMixin:
+    """Serializer cuyos campos de salida se eligen con ?fields= e ?include="""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = selected_fields(type(self), self.context.get('request'))
+        if selected is not None:
+            for name in set(self.fields) - selected:
+                self.fields.pop(name)
+    
+    @property
+    def data(self):
+        with metrics.serialization():
+            return super().data
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -8,62 +53,99 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'first_name', 'last_name', 'email']
         read_only_fields = ['id']
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'name', 'is_active', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
-class DishSerializer(serializers.ModelSerializer):
+class DishSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     category_name = serializers.ReadOnlyField(source='category.name')
+    image_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = Dish
-        fields = ['id', 'name', 'price', 'category', 'category_name', 'image', 
+        list_serializer_class = TimedListSerializer
+        fields = ['id', 'name', 'price', 'category', 'category_name', 'image', 'image_variants',
                   'is_available', 'is_featured', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def get_image_variants(self, dish):
+        # URLs con hash de contenido (thumbnail, card, full); vacío mientras se generan
+        return images.variant_urls(dish, self.context.get('request'))
 
-class TableSerializer(serializers.ModelSerializer):
+class TableSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Table
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'number', 'is_active', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user_details = UserSerializer(source='user', read_only=True)
     
     class Meta:
         model = Customer
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'document_number', 'user', 'user_details', 'name', 'email', 
                   'phone', 'address', 'loyalty_points', 'created_at', 'updated_at']
         read_only_fields = ['id', 'loyalty_points', 'created_at', 'updated_at']
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class CustomerSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Customer
+        fields = ['id', 'document_number', 'name', 'phone', 'loyalty_points']
+
+class OrderItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     dish_name = serializers.ReadOnlyField(source='dish.name')
     
     class Meta:
         model = OrderItem
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'dish', 'dish_name', 'quantity', 'price', 'notes', 
                   'status', 'subtotal', 'created_at', 'updated_at']
         read_only_fields = ['id', 'subtotal', 'created_at', 'updated_at']
+        # Campos calculados para la serialización por proyección (api/projections.py)
+        projected_fields = {'subtotal': (('quantity', 'price'), lambda quantity, price: quantity * price)}
 
 class OrderItemCreateSerializer(serializers.ModelSerializer):
+    # Se valida como entero; OrderCreateSerializer resuelve todos los platos en una consulta
+    dish = serializers.IntegerField(min_value=1)
+    
     class Meta:
         model = OrderItem
         fields = ['dish', 'quantity', 'notes']
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(source='orderitem_set', many=True, read_only=True)
     customer_name = serializers.ReadOnlyField(source='customer.name')
     table_number = serializers.ReadOnlyField(source='table.number')
     waiter_name = serializers.ReadOnlyField(source='waiter.username')
+    customer_details = CustomerSummarySerializer(source='customer', read_only=True)
     
     class Meta:
         model = Order
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'customer', 'customer_name', 'table', 'table_number', 
-                  'status', 'notes', 'total_amount', 'payment_method', 
-                  'is_paid', 'waiter', 'waiter_name', 'items', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'total_amount', 'created_at', 'updated_at']
+                  'status', 'notes', 'total_amount', 'amount_paid', 'payment_method', 
+                  'is_paid', 'waiter', 'waiter_name', 'items', 'customer_details',
+                  'created_at', 'updated_at']
+        # is_paid solo cambia con los pagos (PaymentService), que alimentan los reportes de ventas
+        read_only_fields = ['id', 'total_amount', 'amount_paid', 'is_paid', 'created_at', 'updated_at']
+        optional_fields = ['customer_details']
+        expansions = {'customer': 'customer_details'}
+
+class OrderItemHistorySerializer(OrderItemSerializer):
+    class Meta(OrderItemSerializer.Meta):
+        model = OrderItemHistory
+
+class OrderHistorySerializer(OrderSerializer):
+    """Misma salida que OrderSerializer, leída del historial (órdenes calientes y archivadas)"""
+    items = OrderItemHistorySerializer(source='orderitem_set', many=True, read_only=True)
+    
+    class Meta(OrderSerializer.Meta):
+        model = OrderHistory
 
 class OrderCreateSerializer(serializers.ModelSerializer):
     items = OrderItemCreateSerializer(many=True)
@@ -72,21 +154,26 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         model = Order
         fields = ['customer', 'table', 'notes', 'waiter', 'items']
     
-    def create(self, validated_data):
-        items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
-        
-        for item_data in items_data:
-            OrderItem.objects.create(order=order, **item_data)
+    def validate_items(self, items):
+        dish_ids = {item['dish'] for item in items}
+        dishes = Dish.objects.in_bulk(dish_ids)
+        missing = sorted(dish_ids - dishes.keys())
+        if missing:
+            raise serializers.ValidationError(f"Invalid dish ids: {missing}")
         
-        order.save()  # Esto invoca el método save() que calcula el total
-        return order
+        for item in items:
+            item['dish'] = dishes[item['dish']]
+        return items
+    
+    def create(self, validated_data):
+        return OrderService.create_order(validated_data)
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     order_id = serializers.ReadOnlyField(source='order.id')
     
     class Meta:
         model = Payment
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'order', 'order_id', 'amount', 'payment_method', 
                   'payment_reference', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
\ No newline at end of file
@@ -1,7 +1,35 @@
-from django.db.models import Sum, Count
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Sum, Count, F, Prefetch, Q
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
 from django.db import transaction
 from datetime import datetime, timedelta
-from .models import Category, Dish, Table, Customer, Order, OrderItem, Payment
+from decimal import Decimal
+from . import jobs, occupancy, search
+from .replicas import replica_safe
+from .cache import acached_menu_payload, cached_menu_payload
+from .events import publish_event
+from .models import (
+    Category, Dish, Table, Customer, Order, OrderItem, Payment,
+    DailySales, HourlySales, PaymentMethodSales, DishSales,
+    ArchivedOrder, ArchivedOrderItem, ArchivedPayment, OrderHistory, OrderItemHistory, PaymentHistory
+)
+
+def _order_queryset():
+    # Carga en bloque las relaciones que usa OrderSerializer para que el
+    # número de consultas no dependa de cuántas órdenes se devuelven
+    return Order.objects.select_related('customer', 'table', 'waiter').prefetch_related(
+        Prefetch('orderitem_set', queryset=OrderItem.objects.select_related('dish'))
+    )
+
+def _order_history_queryset():
+    # Igual que _order_queryset pero sobre las vistas que incluyen el archivo
+    return OrderHistory.objects.select_related('customer', 'table', 'waiter').prefetch_related(
+        Prefetch('orderitem_set', queryset=OrderItemHistory.objects.select_related('dish'))
+    )
 
 class CategoryService:
     @staticmethod
@@ -12,13 +40,28 @@ class CategoryService:
         return queryset
     
     @staticmethod
+    @replica_safe
     def get_category_by_id(category_id):
         return Category.objects.get(id=category_id)
+    
+    @staticmethod
+    def get_cached_categories(serialize, active_only=True, variant=''):
+        # `serialize` convierte el queryset en el payload final; solo se llama si no está en cache
+        return cached_menu_payload(
+            ('categories', active_only, variant),
+            lambda: serialize(CategoryService.get_all_categories(active_only=active_only))
+        )
+    
+    @staticmethod
+    async def aget_cached_categories(serialize, active_only=True, variant=''):
+        async def build():
+            return serialize([c async for c in CategoryService.get_all_categories(active_only=active_only)])
+        return await acached_menu_payload(('categories', active_only, variant), build)
 
 class DishService:
     @staticmethod
     def get_all_dishes(available_only=True, category_id=None):
-        queryset = Dish.objects.all()
+        queryset = Dish.objects.select_related('category')
         
         if available_only:
             queryset = queryset.filter(is_available=True)
@@ -30,14 +73,60 @@ class DishService:
     
     @staticmethod
     def get_featured_dishes():
-        return Dish.objects.filter(is_featured=True, is_available=True)
+        return Dish.objects.select_related('category').filter(is_featured=True, is_available=True)
     
     @staticmethod
+    @replica_safe
     def get_dish_by_id(dish_id):
         return Dish.objects.get(id=dish_id)
+    
+    @staticmethod
+    def get_cached_dishes(serialize, available_only=True, category_id=None, variant=''):
+        return cached_menu_payload(
+            ('dishes', available_only, category_id, variant),
+            lambda: serialize(DishService.get_all_dishes(available_only=available_only, category_id=category_id))
+        )
+    
+    @staticmethod
+    @replica_safe
+    def search_dishes(query, limit, available_only=True):
+        """Platos cuyo nombre contiene palabras que empiezan por los términos de `query`"""
+        return search.search(DishService.get_all_dishes(available_only=available_only), query, limit)
+    
+    @staticmethod
+    def autocomplete_dishes(query, limit):
+        """Sugerencias del menú disponible desde el índice de prefijos en memoria (sin consultas)"""
+        def entries():
+            for dish in DishService.get_all_dishes().filter(category__is_active=True):
+                yield dish.id, dish.name, {
+                    'id': dish.id, 'name': dish.name, 'price': str(dish.price),
+                    'category': dish.category_id, 'category_name': dish.category.name,
+                }
+        return search.menu_index(entries).search(query, limit)
+    
+    @staticmethod
+    def get_cached_featured_dishes(serialize, variant=''):
+        return cached_menu_payload(
+            ('featured', variant),
+            lambda: serialize(DishService.get_featured_dishes())
+        )
+    
+    @staticmethod
+    async def aget_cached_dishes(serialize, available_only=True, category_id=None, variant=''):
+        async def build():
+            dishes = DishService.get_all_dishes(available_only=available_only, category_id=category_id)
+            return serialize([dish async for dish in dishes])
+        return await acached_menu_payload(('dishes', available_only, category_id, variant), build)
+    
+    @staticmethod
+    async def aget_cached_featured_dishes(serialize, variant=''):
+        async def build():
+            return serialize([dish async for dish in DishService.get_featured_dishes()])
+        return await acached_menu_payload(('featured', variant), build)
 
 class TableService:
     @staticmethod
+    @replica_safe
     def get_all_tables(active_only=True):
         queryset = Table.objects.all()
         if active_only:
@@ -45,17 +134,30 @@ class TableService:
         return queryset
     
     @staticmethod
-    def get_available_tables():
-        # Mesas que no tienen órdenes pendientes o en preparación
-        active_tables = Table.objects.filter(is_active=True)
-        busy_tables = Order.objects.filter(
-            status__in=['pending', 'preparing'],
+    def get_busy_orders():
+        # Órdenes que mantienen ocupada una mesa (fuente de verdad del mapa de ocupación)
+        return Order.objects.filter(
+            status__in=occupancy.OPEN_STATUSES,
             table__isnull=False
-        ).values_list('table_id', flat=True)
-        
-        return active_tables.exclude(id__in=busy_tables)
+        )
+    
+    @staticmethod
+    @replica_safe
+    def get_available_tables():
+        # Mesas activas sin órdenes pendientes o en preparación, según el mapa de ocupación
+        tables = list(Table.objects.filter(is_active=True))
+        busy = occupancy.busy_table_ids(table.id for table in tables)
+        return [table for table in tables if table.id not in busy]
+    
+    @staticmethod
+    @replica_safe
+    async def aget_available_tables():
+        tables = [table async for table in Table.objects.filter(is_active=True)]
+        busy = await sync_to_async(occupancy.busy_table_ids)([table.id for table in tables])
+        return [table for table in tables if table.id not in busy]
     
     @staticmethod
+    @replica_safe
     def get_table_by_id(table_id):
         return Table.objects.get(id=table_id)
 
@@ -72,54 +174,104 @@ class CustomerService:
     def get_customer_by_document(document_number):
         return Customer.objects.filter(document_number=document_number).first()
     
+    @staticmethod
+    @replica_safe
+    def search_customers(query, limit):
+        """Clientes por nombre, documento, teléfono o email parciales"""
+        return search.search(Customer.objects.select_related('user'), query, limit)
+    
     @staticmethod
     def update_loyalty_points(customer_id, points_to_add):
-        customer = Customer.objects.get(id=customer_id)
-        customer.loyalty_points += points_to_add
-        customer.save()
-        return customer
+        # UPDATE atómico: la API y las tareas en segundo plano pueden sumar puntos a la vez
+        updated = Customer.objects.filter(id=customer_id).update(
+            loyalty_points=F('loyalty_points') + points_to_add, updated_at=timezone.now()
+        )
+        if not updated:
+            raise Customer.DoesNotExist
+        return Customer.objects.get(id=customer_id)
 
 class OrderService:
     @staticmethod
+    @replica_safe
     def get_all_orders(status=None):
-        queryset = Order.objects.all()
+        queryset = _order_queryset()
         if status:
             queryset = queryset.filter(status=status)
         return queryset.order_by('-created_at')
     
     @staticmethod
+    @replica_safe
     def get_orders_by_table(table_id):
-        return Order.objects.filter(table_id=table_id).order_by('-created_at')
+        return _order_queryset().filter(table_id=table_id).order_by('-created_at')
     
     @staticmethod
+    @replica_safe
     def get_orders_by_customer(customer_id):
-        return Order.objects.filter(customer_id=customer_id).order_by('-created_at')
+        """Historial completo del cliente: órdenes calientes y archivadas"""
+        return _order_history_queryset().filter(customer_id=customer_id).order_by('-created_at')
     
     @staticmethod
+    @replica_safe
     def get_order_by_id(order_id):
-        return Order.objects.get(id=order_id)
+        return _order_queryset().get(id=order_id)
+    
+    @staticmethod
+    @replica_safe
+    async def aget_order_by_id(order_id):
+        return await _order_queryset().aget(id=order_id)
+    
+    @staticmethod
+    @replica_safe
+    async def aget_orders_by_table(table_id, limit, before=None, before_id=None):
+        # Paginación por clave (created_at, id) para no depender del paginador síncrono de DRF;
+        # el id desempata las órdenes creadas en el mismo instante
+        queryset = OrderService.get_orders_by_table(table_id).order_by('-created_at', '-id')
+        if before and before_id is not None:
+            queryset = queryset.filter(Q(created_at__lt=before) | Q(created_at=before, id__lt=before_id))
+        elif before:
+            queryset = queryset.filter(created_at__lt=before)
+        return [order async for order in queryset[:limit]]
+    
+    @staticmethod
+    @replica_safe
+    def get_all_order_items():
+        return OrderItem.objects.select_related('dish')
     
     @staticmethod
     @transaction.atomic
     def create_order(data):
         items_data = data.pop('items', [])
-        order = Order.objects.create(**data)
         
+        # Los platos pueden llegar ya resueltos (desde el serializer) o como IDs;
+        # los que faltan se traen en una sola consulta
+        missing_ids = {item['dish'] for item in items_data if not isinstance(item['dish'], Dish)}
+        dishes = Dish.objects.in_bulk(missing_ids) if missing_ids else {}
+        
+        items = []
         for item_data in items_data:
-            dish_id = item_data.get('dish')
-            quantity = item_data.get('quantity', 1)
-            notes = item_data.get('notes', '')
-            
-            dish = Dish.objects.get(id=dish_id)
-            OrderItem.objects.create(
-                order=order,
+            dish = item_data['dish']
+            if not isinstance(dish, Dish):
+                if dish not in dishes:
+                    raise Dish.DoesNotExist(f"Dish {dish} does not exist")
+                dish = dishes[dish]
+            items.append(OrderItem(
                 dish=dish,
-                quantity=quantity,
+                quantity=item_data.get('quantity', 1),
                 price=dish.price,
-                notes=notes
-            )
+                notes=item_data.get('notes', '')
+            ))
         
-        order.save()  # Esto invoca el método save() que calcula el total
+        # El total se calcula en memoria y la orden se escribe una sola vez
+        data['total_amount'] = sum((item.subtotal for item in items), Decimal('0'))
+        order = Order.objects.create(**data)
+        for item in items:
+            item.order = order
+        OrderItem.objects.bulk_create(items)
+        
+        publish_event(
+            'order.created', order_id=order.id, table=order.table_id, status=order.status,
+            station=sorted({item.dish.category_id for item in items})
+        )
         return order
     
     @staticmethod
@@ -127,56 +279,323 @@ class OrderService:
     def update_order_status(order_id, new_status):
         order = Order.objects.get(id=order_id)
         order.status = new_status
-        order.save()
+        order.save(update_fields=['status', 'updated_at'])
+        publish_event('order.status', order_id=order.id, table=order.table_id, status=new_status)
         return order
     
     @staticmethod
     @transaction.atomic
     def update_order_item_status(item_id, new_status):
-        item = OrderItem.objects.get(id=item_id)
+        item = OrderItem.objects.select_related('order', 'dish').get(id=item_id)
         item.status = new_status
-        item.save()
+        item.save(update_fields=['status', 'updated_at'])
+        publish_event(
+            'order_item.status', item_id=item.id, order_id=item.order_id,
+            table=item.order.table_id, status=new_status, station=item.dish.category_id
+        )
         return item
     
     @staticmethod
+    def _update_orders_status(orders, new_status, now):
+        """UPDATE único de estado para `orders` (id, table_id, status) con ocupación y eventos"""
+        Order.objects.filter(id__in=[order_id for order_id, _, _ in orders]).update(
+            status=new_status, updated_at=now
+        )
+        for order_id, table_id, old_status in orders:
+            occupancy.record_change(table_id, old_status, table_id, new_status)
+            publish_event('order.status', order_id=order_id, table=table_id, status=new_status)
+    
+    @staticmethod
+    @transaction.atomic
+    def bulk_update_order_status(order_ids, new_status):
+        orders = list(Order.objects.filter(id__in=order_ids).values_list('id', 'table_id', 'status'))
+        changed = [order for order in orders if order[2] != new_status]
+        OrderService._update_orders_status(changed, new_status, timezone.now())
+        return {
+            'status': new_status,
+            'updated': [order_id for order_id, _, _ in changed],
+            'not_found': sorted(set(order_ids) - {order_id for order_id, _, _ in orders}),
+        }
+    
+    @staticmethod
+    @transaction.atomic
+    def bulk_update_order_item_status(item_ids, new_status):
+        """Mueve varios items a `new_status` y actualiza las órdenes cuyos items quedan todos igual"""
+        items = list(
+            OrderItem.objects.filter(id__in=item_ids)
+            .values_list('id', 'order_id', 'order__table_id', 'dish__category_id')
+        )
+        now = timezone.now()
+        OrderItem.objects.filter(id__in=[item_id for item_id, _, _, _ in items]).update(
+            status=new_status, updated_at=now
+        )
+        
+        order_ids = {order_id for _, order_id, _, _ in items}
+        # El detalle de la orden incluye sus items: se marcan como modificadas
+        Order.objects.filter(id__in=order_ids).update(updated_at=now)
+        
+        # Órdenes cuyos items quedaron todos en el nuevo estado (p. ej. todo listo -> orden lista).
+        # Solo avanzan: una orden no retrocede, y las entregadas o canceladas no se tocan
+        statuses = [status for status, _ in Order.STATUS_CHOICES]
+        earlier = [
+            status for status in statuses[:statuses.index(new_status)] if status not in ('delivered', 'canceled')
+        ]
+        pending_items = OrderItem.objects.filter(order_id__in=order_ids).exclude(status=new_status)
+        rolled_up = list(
+            Order.objects.filter(id__in=order_ids, status__in=earlier)
+            .exclude(id__in=pending_items.values('order_id'))
+            .values_list('id', 'table_id', 'status')
+        )
+        OrderService._update_orders_status(rolled_up, new_status, now)
+        
+        by_order = {}
+        for item_id, order_id, table_id, station in items:
+            event = by_order.setdefault(order_id, {'table': table_id, 'item_ids': [], 'station': set()})
+            event['item_ids'].append(item_id)
+            event['station'].add(station)
+        for order_id, event in by_order.items():
+            publish_event(
+                'order_items.status', order_id=order_id, table=event['table'], status=new_status,
+                item_ids=event['item_ids'], station=sorted(event['station'])
+            )
+        
+        return {
+            'status': new_status,
+            'updated': [item_id for item_id, _, _, _ in items],
+            'not_found': sorted(set(item_ids) - {item_id for item_id, _, _, _ in items}),
+            'orders_updated': [order_id for order_id, _, _ in rolled_up],
+        }
+    
+    @staticmethod
+    @replica_safe
+    def get_paid_orders_between(start, end):
+        return OrderHistory.objects.filter(
+            created_at__gte=start,
+            created_at__lt=end,
+            is_paid=True
+        )
+    
+    @staticmethod
+    @replica_safe
     def get_daily_sales(date=None):
         if not date:
             date = datetime.now().date()
         
         end_date = date + timedelta(days=1)
-        return Order.objects.filter(
-            created_at__gte=date,
-            created_at__lt=end_date,
-            is_paid=True
-        ).aggregate(
+        return OrderService.get_paid_orders_between(date, end_date).aggregate(
             total_sales=Sum('total_amount'),
             order_count=Count('id')
         )
 
+    @staticmethod
+    @replica_safe
+    def get_orders_for_export(start, end):
+        """Órdenes creadas en [start, end) con sus items y pagos, en orden cronológico"""
+        return OrderHistory.objects.filter(created_at__gte=start, created_at__lt=end).select_related(
+            'customer', 'table', 'waiter'
+        ).prefetch_related(
+            Prefetch('orderitem_set', queryset=OrderItemHistory.objects.select_related('dish').order_by('pk')),
+            Prefetch('payment_set', queryset=PaymentHistory.objects.order_by('pk')),
+        ).order_by('created_at', 'pk')
+
 class PaymentService:
     @staticmethod
+    @replica_safe
+    def get_all_payments():
+        return Payment.objects.select_related('order')
+    
+    @staticmethod
+    @replica_safe
     def get_payments_by_order(order_id):
-        return Payment.objects.filter(order_id=order_id)
+        return Payment.objects.select_related('order').filter(order_id=order_id)
+    
+    @staticmethod
+    @replica_safe
+    def get_payments_for_export(start, end):
+        """Pagos registrados en [start, end) con su orden, en orden cronológico"""
+        return PaymentHistory.objects.filter(created_at__gte=start, created_at__lt=end).select_related(
+            'order', 'order__customer', 'order__table'
+        ).order_by('created_at', 'pk')
     
     @staticmethod
     @transaction.atomic
     def create_payment(order_id, amount, payment_method, payment_reference=''):
-        order = Order.objects.get(id=order_id)
+        # Bloquea la orden (donde el motor lo soporte) para serializar pagos concurrentes
+        order = Order.objects.select_for_update().get(id=order_id)
         payment = Payment.objects.create(
             order=order,
-            amount=amount,
+            amount=Decimal(str(amount)),
             payment_method=payment_method,
             payment_reference=payment_reference
         )
         
-        # Calcular el total pagado
-        total_paid = Payment.objects.filter(order=order).aggregate(
-            total=Sum('amount'))['total'] or 0
+        # Acumula lo pagado con un UPDATE atómico en lugar de volver a sumar los pagos
+        Order.objects.filter(pk=order.pk).update(
+            amount_paid=F('amount_paid') + payment.amount,
+            updated_at=timezone.now()
+        )
+        order.amount_paid += payment.amount
         
-        # Actualizar el estado de pago de la orden
-        if total_paid >= order.total_amount:
+        # Marca la orden como pagada solo si este pago completa el total
+        became_paid = Order.objects.filter(
+            pk=order.pk, is_paid=False, amount_paid__gte=F('total_amount')
+        ).update(is_paid=True, payment_method=payment_method)
+        if became_paid:
             order.is_paid = True
             order.payment_method = payment_method
-            order.save()
+            # Fuera de la petición: la transacción del pago solo cubre el pago y la orden
+            jobs.enqueue('sales.record_paid_order', order_id=order.id)
+            if order.customer_id and settings.LOYALTY_SPEND_PER_POINT:
+                jobs.enqueue('customers.award_loyalty_points', order_id=order.id)
         
-        return payment
\ No newline at end of file
+        publish_event(
+            'payment.created', payment_id=payment.id, order_id=order.id, table=order.table_id,
+            amount=str(payment.amount), is_paid=order.is_paid
+        )
+        return payment
+
+class SalesReportService:
+    # Agrupaciones disponibles y el acumulado que las responde
+    GROUPINGS = {
+        'day': (DailySales, 'date', ['date']),
+        'hour': (HourlySales, 'hour__date', ['hour']),
+        'payment_method': (PaymentMethodSales, 'date', ['date', 'payment_method']),
+        'dish': (DishSales, 'date', ['date', 'dish_id', 'dish__name', 'quantity']),
+    }
+    
+    @staticmethod
+    def _increment(model, lookup, **amounts):
+        # get_or_create resuelve la carrera de inserción; el incremento es un UPDATE atómico
+        row, _ = model.objects.get_or_create(**lookup)
+        model.objects.filter(pk=row.pk).update(
+            updated_at=timezone.now(),
+            **{field: F(field) + value for field, value in amounts.items()}
+        )
+    
+    @staticmethod
+    def record_paid_order(order):
+        """Suma una orden recién pagada a todos los acumulados"""
+        created_at = timezone.localtime(order.created_at)
+        day = created_at.date()
+        hour = created_at.replace(minute=0, second=0, microsecond=0)
+        increment = SalesReportService._increment
+        
+        increment(DailySales, {'date': day}, total_sales=order.total_amount, order_count=1)
+        increment(HourlySales, {'hour': hour}, total_sales=order.total_amount, order_count=1)
+        increment(
+            PaymentMethodSales, {'date': day, 'payment_method': order.payment_method},
+            total_sales=order.total_amount, order_count=1
+        )
+        dish_totals = OrderItem.objects.filter(order_id=order.id).values('dish_id').annotate(
+            units=Sum('quantity'), total=Sum(F('quantity') * F('price'))
+        )
+        for row in dish_totals:
+            increment(
+                DishSales, {'date': day, 'dish_id': row['dish_id']},
+                total_sales=row['total'], quantity=row['units'], order_count=1
+            )
+    
+    @staticmethod
+    def get_sales(start, end, group_by='day'):
+        """Ventas entre `start` y `end` (inclusive) leídas de los acumulados: O(días), no O(órdenes)"""
+        model, date_field, fields = SalesReportService.GROUPINGS[group_by]
+        return model.objects.filter(**{
+            f'{date_field}__gte': start,
+            f'{date_field}__lte': end,
+        }).order_by(*fields[:2]).values(*fields, 'total_sales', 'order_count')
+    
+    @staticmethod
+    @transaction.atomic
+    def rebuild(start=None, end=None):
+        """Recalcula los acumulados desde las órdenes pagadas (todo el histórico por defecto)"""
+        def in_range(queryset, field):
+            if start:
+                queryset = queryset.filter(**{f'{field}__gte': start})
+            if end:
+                queryset = queryset.filter(**{f'{field}__lte': end})
+            return queryset
+        
+        for model, date_field, _ in SalesReportService.GROUPINGS.values():
+            in_range(model.objects.all(), date_field).delete()
+        # Incluye las órdenes archivadas
+        orders = in_range(OrderHistory.objects.filter(is_paid=True), 'created_at__date')
+        items = in_range(OrderItemHistory.objects.filter(order__is_paid=True), 'order__created_at__date')
+        
+        totals = {'total_sales': Sum('total_amount'), 'order_count': Count('id')}
+        DailySales.objects.bulk_create(
+            DailySales(**row) for row in
+            orders.annotate(date=TruncDate('created_at')).values('date').annotate(**totals).order_by()
+        )
+        HourlySales.objects.bulk_create(
+            HourlySales(**row) for row in
+            orders.annotate(hour=TruncHour('created_at')).values('hour').annotate(**totals).order_by()
+        )
+        PaymentMethodSales.objects.bulk_create(
+            PaymentMethodSales(**row) for row in
+            orders.annotate(date=TruncDate('created_at')).values('date', 'payment_method')
+            .annotate(**totals).order_by()
+        )
+        DishSales.objects.bulk_create(
+            DishSales(
+                date=row['date'], dish_id=row['dish_id'], quantity=row['units'],
+                total_sales=row['total'], order_count=row['orders']
+            ) for row in
+            items.annotate(date=TruncDate('order__created_at')).values('date', 'dish_id').annotate(
+                units=Sum('quantity'),
+                total=Sum(F('quantity') * F('price')),
+                orders=Count('order_id', distinct=True)
+            ).order_by()
+        )
+
+class ArchiveService:
+    # Modelo caliente -> modelo de archivo, en el orden en que se copian
+    TABLES = ((Order, ArchivedOrder, 'pk'), (OrderItem, ArchivedOrderItem, 'order_id'),
+              (Payment, ArchivedPayment, 'order_id'))
+    
+    @staticmethod
+    def get_archivable_orders(before):
+        """Órdenes cerradas (entregadas y pagadas) creadas antes de `before`"""
+        return Order.objects.filter(status='delivered', is_paid=True, created_at__lt=before)
+    
+    @staticmethod
+    def _archive_batch(before, batch_size):
+        # Una transacción corta por lote; skip_locked salta las órdenes que otra
+        # transacción tiene bloqueadas (p. ej. un pago en curso) en lugar de esperarlas
+        with transaction.atomic():
+            order_ids = list(
+                ArchiveService.get_archivable_orders(before).select_for_update(skip_locked=True)
+                .order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not order_ids:
+                return 0
+            for hot, archived, key in ArchiveService.TABLES:
+                hot_fields = {field.attname for field in hot._meta.concrete_fields}
+                fields = [field.attname for field in archived._meta.concrete_fields if field.attname in hot_fields]
+                rows = hot.objects.filter(**{f'{key}__in': order_ids}).values(*fields)
+                archived.objects.bulk_create(archived(**row) for row in rows)
+            # Hijos primero: el borrado en cascada de Order ya no tiene nada que recorrer
+            for hot, _, key in reversed(ArchiveService.TABLES):
+                hot.objects.filter(**{f'{key}__in': order_ids}).delete()
+        return len(order_ids)
+    
+    @staticmethod
+    def archive_orders(before=None, batch_size=None, pause=0, progress=None):
+        """Mueve al archivo, por lotes, las órdenes cerradas anteriores a `before`
+
+        Por defecto `before` es ahora menos ARCHIVE_AFTER_DAYS. Devuelve cuántas
+        órdenes se archivaron; `progress(total)` se llama tras cada lote.
+        """
+        if before is None:
+            before = timezone.now() - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+        batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+        total = 0
+        while True:
+            archived = ArchiveService._archive_batch(before, batch_size)
+            total += archived
+            if progress:
+                progress(total)
+            if archived < batch_size:
+                return total
+            if pause:
+                # Deja pasar a las escrituras de la operación entre lotes
+                time.sleep(pause)
@@ -0,0 +1,34 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import images, search
+from .cache import bump_menu_version
+from .models import Category, Customer, Dish
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Dish)
+def invalidate_menu_cache(sender, **kwargs):
+    # Tras el commit, para que nadie vuelva a cachear datos aún no confirmados
+    transaction.on_commit(bump_menu_version)
+
+
+@receiver(post_save, sender=Dish)
+def generate_image_variants(sender, instance, **kwargs):
+    # Tras el commit, para que el worker lea la imagen ya confirmada
+    if images.needs_variants(instance):
+        transaction.on_commit(lambda: images.schedule(instance.pk))
+
+
+@receiver(post_save, sender=Dish)
+@receiver(post_save, sender=Customer)
+def update_search_index(sender, instance, using, **kwargs):
+    # En la misma transacción que la fila: si se revierte, el índice también
+    search.index(instance, using=using)
+
+
+@receiver(post_delete, sender=Dish)
+@receiver(post_delete, sender=Customer)
+def remove_from_search_index(sender, instance, using, **kwargs):
+    search.remove(instance, using=using)
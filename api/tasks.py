@@ -0,0 +1,28 @@
+from django.conf import settings
+
+from . import jobs
+from .models import Order
+from .services import CustomerService, SalesReportService
+
+# Efectos secundarios de órdenes y pagos que se ejecutan fuera de la petición
+# (api/jobs.py). Cada tarea corre en una transacción con su marca de completada:
+# o se aplica entera una sola vez o se reintenta.
+
+
+@jobs.register('sales.record_paid_order')
+def record_paid_order(order_id):
+    """Suma una orden recién pagada a los acumulados de ventas"""
+    order = Order.objects.filter(pk=order_id).first()
+    if order is not None:
+        SalesReportService.record_paid_order(order)
+
+
+@jobs.register('customers.award_loyalty_points')
+def award_loyalty_points(order_id):
+    """Puntos de fidelidad por una orden pagada: uno por cada LOYALTY_SPEND_PER_POINT gastado"""
+    order = Order.objects.filter(pk=order_id).values('customer_id', 'total_amount').first()
+    if order is None or order['customer_id'] is None:
+        return
+    points = int(order['total_amount'] // settings.LOYALTY_SPEND_PER_POINT)
+    if points:
+        CustomerService.update_loyalty_points(order['customer_id'], points)
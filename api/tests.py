@@ -1,3 +1,1395 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from urllib.request import urlopen
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import images, jobs, metrics, occupancy, replicas, search
+from .events import get_broker
+from .exports import ORDER_COLUMNS
+from .models import (
+    Category, Dish, Table, Customer, Order, OrderItem, Payment,
+    DailySales, PaymentMethodSales, DishSales, ArchivedOrder, IdempotencyKey, Job
+)
+from .query_plans import full_table_scans
+from .renderers import FastJSONRenderer
+from .replicas import ReplicaPinMiddleware, ReplicaRouter
+from .serializers import OrderSerializer, OrderItemSerializer, PaymentSerializer
+from .services import (
+    ArchiveService, DishService, OrderService, PaymentService, SalesReportService, TableService
+)
+
+
+class ApiTestCase(TestCase):
+    """Datos mínimos compartidos por las pruebas de la API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('waiter', password='secret')
+        cls.category = Category.objects.create(name='Platos fuertes')
+        cls.dishes = [
+            Dish.objects.create(name=f'Plato {i}', price=Decimal('10.50') + i, category=cls.category)
+            for i in range(3)
+        ]
+        cls.tables = [Table.objects.create(number=i) for i in range(1, 4)]
+        cls.customer = Customer.objects.create(
+            document_number='123', name='Ana', email='ana@example.com'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_order(self, table=None, customer=None, status='pending', items=2):
+        # Ejecuta los callbacks on_commit (mapa de ocupación, eventos) como en producción
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(
+                table=table or self.tables[0],
+                customer=customer or self.customer,
+                waiter=self.user,
+                status=status,
+            )
+            for dish in self.dishes[:items]:
+                OrderItem.objects.create(order=order, dish=dish, quantity=2, price=dish.price)
+        return order
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+
+class OrderQueryCountTests(ApiTestCase):
+    """El número de consultas no debe crecer con el número de órdenes"""
+
+    def assertConstantQueries(self, url, make_more):
+        make_more()
+        baseline = self.count_queries(url)
+        for _ in range(5):
+            make_more()
+        self.assertEqual(self.count_queries(url), baseline)
+
+    def test_order_list(self):
+        self.assertConstantQueries('/api/orders/', self.make_order)
+
+    def test_orders_by_table(self):
+        url = f'/api/orders/by_table/?table_id={self.tables[0].id}'
+        self.assertConstantQueries(url, self.make_order)
+
+    def test_orders_by_customer(self):
+        url = f'/api/orders/by_customer/?customer_id={self.customer.id}'
+        self.assertConstantQueries(url, self.make_order)
+
+    def test_order_items(self):
+        self.assertConstantQueries('/api/order-items/', self.make_order)
+
+    def test_payments(self):
+        def make_payment():
+            order = self.make_order()
+            Payment.objects.create(order=order, amount=1, payment_method='cash')
+
+        self.assertConstantQueries('/api/payments/', make_payment)
+
+
+class CreateOrderTests(ApiTestCase):
+    """La creación de órdenes usa un número fijo de consultas"""
+
+    def create_order(self, item_count):
+        payload = {
+            'table': self.tables[0].id,
+            'customer': self.customer.id,
+            'items': [
+                {'dish': self.dishes[i % len(self.dishes)].id, 'quantity': 2}
+                for i in range(item_count)
+            ],
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/orders/', payload, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response, len(ctx.captured_queries)
+
+    def test_query_count_independent_of_items(self):
+        _, few = self.create_order(1)
+        _, many = self.create_order(12)
+        self.assertEqual(few, many)
+
+    def test_total_computed_in_memory(self):
+        response, _ = self.create_order(3)
+        expected = sum(d.price * 2 for d in self.dishes)
+        self.assertEqual(Decimal(response.data['total_amount']), expected)
+        self.assertEqual(len(response.data['items']), 3)
+        order = Order.objects.get(id=response.data['id'])
+        self.assertEqual(order.calculate_total(), expected)
+
+    def test_unknown_dish_rejected(self):
+        response = self.client.post('/api/orders/', {
+            'table': self.tables[0].id,
+            'items': [{'dish': 999999, 'quantity': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_service_accepts_dish_ids(self):
+        order = OrderService.create_order({
+            'table': self.tables[1],
+            'items': [{'dish': self.dishes[0].id, 'quantity': 3}],
+        })
+        self.assertEqual(order.total_amount, self.dishes[0].price * 3)
+        self.assertEqual(order.orderitem_set.count(), 1)
+
+
+class OrderTotalTests(ApiTestCase):
+    """El total de la orden se mantiene con deltas atómicos"""
+
+    def test_item_changes_adjust_total(self):
+        order = self.make_order(items=2)
+        expected = (self.dishes[0].price + self.dishes[1].price) * 2
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, expected)
+
+        item = OrderItem.objects.get(order=order, dish=self.dishes[0])
+        item.quantity = 5
+        item.save()
+        expected += self.dishes[0].price * 3
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, expected)
+
+        item.delete()
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, self.dishes[1].price * 2)
+
+    def test_item_moved_between_orders(self):
+        source, target = self.make_order(items=1), self.make_order(items=1)
+        item = source.orderitem_set.get()
+        item.order = target
+        item.save()
+        source.refresh_from_db()
+        target.refresh_from_db()
+        self.assertEqual(source.total_amount, 0)
+        self.assertEqual(target.total_amount, self.dishes[0].price * 4)
+
+    def test_status_update_does_not_touch_items(self):
+        order = self.make_order()
+        with CaptureQueriesContext(connection) as ctx:
+            OrderService.update_order_status(order.id, 'preparing')
+        self.assertFalse(any('api_orderitem' in q['sql'] for q in ctx.captured_queries))
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'preparing')
+
+    def test_check_command_repairs_drift(self):
+        order = self.make_order()
+        Order.objects.filter(pk=order.pk).update(total_amount=1)
+        out = StringIO()
+        call_command('check_order_totals', '--fix', stdout=out)
+        self.assertIn(f"Orden #{order.id}", out.getvalue())
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, order.calculate_total())
+
+
+class MenuCacheTests(ApiTestCase):
+    """El menú se sirve desde cache y se invalida al cambiar platos o categorías"""
+
+    def test_cached_menu_needs_no_queries(self):
+        for url in ('/api/categories/', '/api/dishes/', '/api/dishes/featured/'):
+            self.client.get(url)
+            self.assertEqual(self.count_queries(url), 0, url)
+
+    def test_dish_change_invalidates(self):
+        self.client.get('/api/dishes/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Dish.objects.create(name='Postre', price=Decimal('4.00'), category=self.category)
+        names = [dish['name'] for dish in self.client.get('/api/dishes/').data]
+        self.assertIn('Postre', names)
+
+    def test_category_delete_invalidates(self):
+        self.client.get('/api/categories/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Bebidas').delete()
+            self.category.name = 'Fuertes'
+            self.category.save()
+        self.assertEqual([c['name'] for c in self.client.get('/api/categories/').data], ['Fuertes'])
+
+    def test_query_params_are_cached_separately(self):
+        other = Category.objects.create(name='Bebidas')
+        Dish.objects.create(name='Jugo', price=Decimal('2.00'), category=other)
+        response = self.client.get(f'/api/dishes/?category_id={other.id}')
+        self.assertEqual([dish['name'] for dish in response.data], ['Jugo'])
+        self.assertEqual(len(self.client.get('/api/dishes/').data), 4)
+
+    @override_settings(MENU_LOCAL_CACHE_SECONDS=0)
+    def test_local_cache_does_not_keep_menu(self):
+        # Con LocMemCache otro proceso no vería bump_menu_version: el menú no se retiene
+        self.client.get('/api/dishes/')
+        Dish.objects.filter(pk=self.dishes[0].pk).update(name='Cambiado en otro proceso')
+        self.assertIn('Cambiado en otro proceso', [dish['name'] for dish in self.client.get('/api/dishes/').data])
+
+    def test_sparse_fields_are_cached_separately(self):
+        sparse = self.client.get('/api/dishes/?fields=id,name').data
+        self.assertEqual(set(sparse[0]), {'id', 'name'})
+        self.assertIn('price', self.client.get('/api/dishes/').data[0])
+        # Las vistas asíncronas comparten las mismas claves del cache
+        self.client.force_login(self.user)
+        self.async_client.cookies = self.client.cookies
+        self.assertIn('price', async_to_sync(self.async_client.get)('/api/async/dishes/').json()[0])
+
+
+class ConditionalGetTests(ApiTestCase):
+    """Las respuestas incluyen ETag y se responde 304 si nada cambió"""
+
+    def revalidate(self, url, etag):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        return response, len(ctx.captured_queries)
+
+    def test_order_list_not_modified(self):
+        self.make_order()
+        response = self.client.get('/api/orders/')
+        self.assertIn('Last-Modified', response)
+        not_modified, queries = self.revalidate('/api/orders/', response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(queries, 1)
+
+    def test_item_status_change_invalidates_order(self):
+        order = self.make_order()
+        url = f'/api/orders/{order.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidate(url, etag)[0].status_code, 304)
+
+        OrderService.update_order_item_status(order.orderitem_set.first().id, 'ready')
+        response, _ = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_deleted_row_invalidates_list(self):
+        orders = [self.make_order(), self.make_order()]
+        etag = self.client.get('/api/orders/')['ETag']
+        Order.objects.filter(pk=orders[0].pk).delete()
+        self.assertEqual(self.revalidate('/api/orders/', etag)[0].status_code, 200)
+
+    def test_filters_have_distinct_etags(self):
+        self.make_order()
+        all_orders = self.client.get('/api/orders/')['ETag']
+        pending = self.client.get('/api/orders/?status=pending')['ETag']
+        self.assertNotEqual(all_orders, pending)
+
+    def test_invalid_pk_is_not_found(self):
+        for url in ('/api/orders/abc/', '/api/tables/abc/', '/api/customers/x/'):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_menu_not_modified_without_queries(self):
+        etag = self.client.get('/api/dishes/')['ETag']
+        response, queries = self.revalidate('/api/dishes/', etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(queries, 0)
+
+    def test_available_tables_follow_orders(self):
+        etag = self.client.get('/api/tables/available/')['ETag']
+        self.make_order(table=self.tables[1])
+        response, _ = self.revalidate('/api/tables/available/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+    def test_missing_object_still_404(self):
+        self.assertEqual(self.client.get('/api/orders/999999/').status_code, 404)
+
+
+class CursorPaginationTests(ApiTestCase):
+    """Las listas de órdenes, items y pagos se paginan por cursor sin COUNT(*)"""
+
+    def walk(self, url):
+        seen = []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(any('COUNT(' in q['sql'].upper() for q in ctx.captured_queries))
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return seen
+
+    def test_orders_walk_all_pages(self):
+        orders = [self.make_order() for _ in range(5)]
+        seen = self.walk('/api/orders/?page_size=2')
+        self.assertEqual(seen, [order.id for order in reversed(orders)])
+
+    def test_by_table_is_paginated(self):
+        orders = [self.make_order(table=self.tables[2]) for _ in range(3)]
+        self.make_order(table=self.tables[0])
+        seen = self.walk(f'/api/orders/by_table/?table_id={self.tables[2].id}&page_size=2')
+        self.assertEqual(sorted(seen), sorted(order.id for order in orders))
+
+    def test_items_and_payments_are_paginated(self):
+        for _ in range(3):
+            Payment.objects.create(order=self.make_order(), amount=1, payment_method='cash')
+        self.assertEqual(len(self.walk('/api/order-items/?page_size=4')), 6)
+        self.assertEqual(len(self.walk('/api/payments/?page_size=2')), 3)
+
+
+class QueryPlanTests(ApiTestCase):
+    """Las consultas de los servicios deben usar índices, no lecturas completas"""
+
+    def assertIndexed(self, queryset, allow=()):
+        self.assertEqual(full_table_scans(queryset, allow=allow), [], str(queryset.query))
+
+    def test_order_queries(self):
+        self.assertIndexed(OrderService.get_all_orders())
+        self.assertIndexed(OrderService.get_all_orders(status='pending'))
+        self.assertIndexed(OrderService.get_orders_by_table(self.tables[0].id))
+        self.assertIndexed(OrderService.get_orders_by_customer(self.customer.id))
+
+    def test_daily_sales_range(self):
+        start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.assertIndexed(OrderService.get_paid_orders_between(start, start + timedelta(days=1)))
+
+    def test_busy_orders(self):
+        # Consulta con la que se reconstruye el mapa de ocupación de mesas
+        self.assertIndexed(TableService.get_busy_orders())
+
+    def test_payments_by_order(self):
+        self.assertIndexed(PaymentService.get_payments_by_order(1).values('order').annotate(total=Sum('amount')))
+
+    def test_detects_full_scan(self):
+        self.assertEqual(full_table_scans(Order.objects.filter(notes='x')), ['api_order'])
+
+
+class SalesRollupTests(ApiTestCase):
+    """Los acumulados se actualizan al pagar y se pueden reconstruir"""
+
+    def pay(self, order, method='card'):
+        order.refresh_from_db()
+        # Los acumulados se actualizan en una tarea en segundo plano tras el commit
+        with self.captureOnCommitCallbacks(execute=True):
+            PaymentService.create_payment(order.id, order.total_amount, method)
+        jobs.run_pending()
+
+    def snapshot(self):
+        today = timezone.localdate()
+        return {
+            group: [dict(row) for row in SalesReportService.get_sales(today, today, group_by=group)]
+            for group in SalesReportService.GROUPINGS
+        }
+
+    def test_paid_orders_update_rollups(self):
+        first, second = self.make_order(items=2), self.make_order(items=1)
+        self.pay(first, 'card')
+        self.pay(second, 'cash')
+
+        today = timezone.localdate()
+        daily = DailySales.objects.get(date=today)
+        self.assertEqual(daily.order_count, 2)
+        self.assertEqual(daily.total_sales, first.calculate_total() + second.calculate_total())
+        self.assertEqual(DishSales.objects.get(date=today, dish=self.dishes[0]).quantity, 4)
+        self.assertEqual(
+            sorted(PaymentMethodSales.objects.values_list('payment_method', flat=True)), ['card', 'cash']
+        )
+
+    def test_rebuild_matches_incremental(self):
+        self.pay(self.make_order(items=3))
+        self.pay(self.make_order(items=2), 'cash')
+        self.make_order()  # sin pagar
+        incremental = self.snapshot()
+
+        call_command('rebuild_sales_rollups', stdout=StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_sales_report_endpoint(self):
+        self.pay(self.make_order())
+        today = timezone.localdate().isoformat()
+        response = self.client.get(f'/api/orders/sales_report/?start={today}&end={today}&group_by=dish')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({row['dish__name'] for row in response.data}, {'Plato 0', 'Plato 1'})
+        self.assertEqual(self.client.get('/api/orders/sales_report/?start=x').status_code, 400)
+        self.assertEqual(self.client.get(f'/api/orders/sales_report/?start={today}&group_by=x').status_code, 400)
+
+    def test_is_paid_only_changes_through_payments(self):
+        order = self.make_order()
+        response = self.client.patch(f'/api/orders/{order.id}/', {'is_paid': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        order.refresh_from_db()
+        self.assertFalse(order.is_paid)
+        self.assertFalse(DailySales.objects.exists())
+
+
+class OrderEventTests(ApiTestCase):
+    """Los servicios publican eventos al confirmar y los clientes los reciben filtrados"""
+
+    def collect(self, filters, action):
+        async def run():
+            broker = get_broker()
+            subscription = broker.subscribe(filters)
+            try:
+                await sync_to_async(action)()
+                events = []
+                while not subscription.queue.empty():
+                    events.append(await subscription.get())
+                return events
+            finally:
+                broker.unsubscribe(subscription)
+
+        return async_to_sync(run)()
+
+    def test_events_published_on_commit(self):
+        order = self.make_order(table=self.tables[1])
+
+        def action():
+            with self.captureOnCommitCallbacks(execute=True):
+                OrderService.update_order_status(order.id, 'preparing')
+
+        events = self.collect({'table': self.tables[1].id}, action)
+        self.assertEqual(events, [{
+            'type': 'order.status', 'order_id': order.id,
+            'table': self.tables[1].id, 'status': 'preparing',
+        }])
+
+    def test_rolled_back_writes_publish_nothing(self):
+        order = self.make_order()
+        events = self.collect({}, lambda: OrderService.update_order_status(order.id, 'ready'))
+        self.assertEqual(events, [])
+
+    def test_filters_by_station_and_status(self):
+        order = self.make_order()
+        item = order.orderitem_set.first()
+
+        def action():
+            with self.captureOnCommitCallbacks(execute=True):
+                OrderService.update_order_item_status(item.id, 'ready')
+                OrderService.update_order_status(order.id, 'delivered')
+
+        events = self.collect({'station': self.category.id, 'status': 'ready'}, action)
+        self.assertEqual([e['type'] for e in events], ['order_item.status'])
+
+    def test_stream_requires_authentication(self):
+        self.assertEqual(APIClient().get('/api/events/').status_code, 401)
+
+    def test_stream_emits_events(self):
+        self.client.force_login(self.user)
+
+        async def run():
+            response = await self.async_client.get('/api/events/?table=1')
+            chunks = aiter(response.streaming_content)
+            self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+            get_broker().publish({'type': 'order.status', 'order_id': 1, 'table': 1, 'status': 'ready'})
+            chunk = await asyncio.wait_for(anext(chunks), timeout=1)
+            await chunks.aclose()
+            return chunk
+
+        self.async_client.cookies = self.client.cookies
+        chunk = async_to_sync(run)()
+        self.assertTrue(chunk.startswith(b'event: order.status\ndata: '))
+
+
+class AsyncEndpointTests(ApiTestCase):
+    """Las lecturas asíncronas devuelven lo mismo que sus equivalentes síncronas"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.async_client.cookies = self.client.cookies
+
+    def async_get(self, url):
+        response = async_to_sync(self.async_client.get)(url)
+        return response, response.json()
+
+    def test_matches_sync_endpoints(self):
+        order = self.make_order()
+        pairs = [
+            ('/api/dishes/', '/api/async/dishes/'),
+            ('/api/dishes/featured/', '/api/async/dishes/featured/'),
+            ('/api/categories/', '/api/async/categories/'),
+            ('/api/tables/available/', '/api/async/tables/available/'),
+            (f'/api/orders/{order.id}/', f'/api/async/orders/{order.id}/'),
+        ]
+        for sync_url, async_url in pairs:
+            response, data = self.async_get(async_url)
+            self.assertEqual(response.status_code, 200, async_url)
+            self.assertEqual(data, self.client.get(sync_url).json(), async_url)
+
+    def test_orders_by_table_keyset_pages(self):
+        orders = [self.make_order(table=self.tables[1]) for _ in range(3)]
+        url = f'/api/async/orders/by_table/?table_id={self.tables[1].id}&page_size=2'
+        seen = []
+        while url:
+            response, data = self.async_get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(order['id'] for order in data['results'])
+            url = data['next']
+        self.assertEqual(seen, [order.id for order in reversed(orders)])
+
+    def test_keyset_pages_break_timestamp_ties(self):
+        orders = [self.make_order(table=self.tables[1]) for _ in range(3)]
+        Order.objects.filter(pk__in=[order.pk for order in orders]).update(created_at=timezone.now())
+        url = f'/api/async/orders/by_table/?table_id={self.tables[1].id}&page_size=1'
+        seen = []
+        while url:
+            data = self.async_get(url)[1]
+            seen.extend(order['id'] for order in data['results'])
+            url = data['next']
+        self.assertEqual(seen, sorted((order.id for order in orders), reverse=True))
+
+    def test_basic_auth(self):
+        self.async_client.cookies.clear()
+        for password, expected in (('secret', 200), ('nope', 401)):
+            credentials = base64.b64encode(f'waiter:{password}'.encode()).decode()
+            response = async_to_sync(self.async_client.get)(
+                '/api/async/dishes/', headers={'Authorization': f'Basic {credentials}'}
+            )
+            self.assertEqual(response.status_code, expected, password)
+
+    def test_errors(self):
+        self.assertEqual(self.async_get('/api/async/orders/999999/')[0].status_code, 404)
+        self.assertEqual(self.async_get('/api/async/orders/by_table/')[0].status_code, 400)
+        self.async_client.cookies.clear()
+        self.assertEqual(self.async_get('/api/async/dishes/')[0].status_code, 401)
+
+
+@override_settings(TABLE_OCCUPANCY_CACHE=True)
+class TableOccupancyTests(ApiTestCase):
+    """La disponibilidad de mesas se resuelve con el mapa de ocupación"""
+
+    def available_ids(self):
+        return {table.id for table in TableService.get_available_tables()}
+
+    def test_transitions_update_map(self):
+        order = self.make_order(table=self.tables[0])
+        self.assertEqual(self.available_ids(), {self.tables[1].id, self.tables[2].id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order.table = self.tables[1]
+            order.save()
+        self.assertEqual(self.available_ids(), {self.tables[0].id, self.tables[2].id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderService.update_order_status(order.id, 'delivered')
+        self.assertEqual(len(self.available_ids()), 3)
+
+    def test_lookup_does_not_query_orders(self):
+        self.make_order()
+        self.available_ids()
+        with CaptureQueriesContext(connection) as ctx:
+            self.available_ids()
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn('api_order', ctx.captured_queries[0]['sql'])
+
+    def test_rebuilds_when_cache_is_lost(self):
+        self.make_order(table=self.tables[2])
+        cache.clear()
+        self.assertNotIn(self.tables[2].id, self.available_ids())
+
+    def test_check_command_repairs_drift(self):
+        order = self.make_order(table=self.tables[0])
+        self.available_ids()
+        Order.objects.filter(pk=order.pk).update(status='delivered')
+        out = StringIO()
+        call_command('check_table_occupancy', '--fix', stdout=out)
+        self.assertIn(f"Mesa {self.tables[0].id}", out.getvalue())
+        self.assertEqual(len(self.available_ids()), 3)
+
+    @override_settings(TABLE_OCCUPANCY_CACHE=None)
+    def test_local_cache_falls_back_to_database(self):
+        # Con LocMemCache otro proceso no vería estos contadores: se consulta la base
+        order = self.make_order(table=self.tables[0])
+        self.assertFalse(occupancy.enabled())
+        Order.objects.filter(pk=order.pk).update(status='delivered')
+        self.assertEqual(len(self.available_ids()), 3)
+        with self.assertRaises(CommandError):
+            call_command('check_table_occupancy')
+
+    def test_map_is_rebuilt_periodically(self):
+        order = self.make_order(table=self.tables[0])
+        self.available_ids()
+        Order.objects.filter(pk=order.pk).update(status='delivered')
+        self.assertEqual(len(self.available_ids()), 2)
+        cache.delete(occupancy.READY_KEY)  # lo que ocurre al vencer TABLE_OCCUPANCY_REBUILD_SECONDS
+        self.assertEqual(len(self.available_ids()), 3)
+
+
+class PaymentTests(ApiTestCase):
+    """Los pagos acumulan amount_paid sin volver a sumar los pagos de la orden"""
+
+    def test_split_bill(self):
+        order = self.make_order(items=1)
+        order.refresh_from_db()
+        share = order.total_amount / 3
+        for _ in range(2):
+            PaymentService.create_payment(order.id, share, 'card')
+        order.refresh_from_db()
+        self.assertEqual(order.amount_paid, share * 2)
+        self.assertFalse(order.is_paid)
+
+        with CaptureQueriesContext(connection) as ctx:
+            PaymentService.create_payment(order.id, order.balance_due, 'cash')
+        self.assertFalse(any('SUM(' in q['sql'] and 'api_payment' in q['sql'] for q in ctx.captured_queries))
+        order.refresh_from_db()
+        self.assertTrue(order.is_paid)
+        self.assertEqual(order.amount_paid, order.total_amount)
+        self.assertEqual(order.payment_method, 'cash')
+
+    def test_full_save_keeps_counters(self):
+        order = self.make_order()
+        stale = Order.objects.get(pk=order.pk)
+        PaymentService.create_payment(order.id, '5.00', 'card')
+        stale.notes = 'sin cebolla'
+        stale.save()
+        order.refresh_from_db()
+        self.assertEqual(order.amount_paid, Decimal('5.00'))
+        self.assertEqual(order.notes, 'sin cebolla')
+
+    def test_invalid_amount(self):
+        order = self.make_order()
+        response = self.client.post('/api/payments/', {'order': order.id, 'amount': 'x', 'payment_method': 'card'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_reconcile_command(self):
+        order = self.make_order()
+        Payment.objects.create(order=order, amount=order.calculate_total(), payment_method='card')
+        out = StringIO()
+        call_command('reconcile_payments', '--fix', stdout=out)
+        self.assertIn(f"Orden #{order.id}", out.getvalue())
+        order.refresh_from_db()
+        self.assertTrue(order.is_paid)
+        self.assertEqual(order.amount_paid, order.total_amount)
+
+
+class BulkStatusTests(ApiTestCase):
+    """Los cambios de estado en bloque usan un UPDATE y actualizan la orden padre"""
+
+    def test_items_ready_rolls_up_order(self):
+        first, second = self.make_order(items=2), self.make_order(items=2)
+        first_items = list(first.orderitem_set.values_list('id', flat=True))
+        one_of_second = second.orderitem_set.values_list('id', flat=True)[0]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/order-items/bulk_update_status/', {
+                'ids': first_items + [one_of_second, 999999], 'status': 'ready',
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['orders_updated'], [first.id])
+        self.assertEqual(response.data['not_found'], [999999])
+        self.assertEqual(len(response.data['updated']), 3)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, 'ready')
+        self.assertEqual(second.status, 'pending')
+        self.assertEqual(OrderItem.objects.filter(status='ready').count(), 3)
+
+    def test_query_count_independent_of_items(self):
+        def bump(order_count):
+            orders = [self.make_order(items=3) for _ in range(order_count)]
+            ids = list(OrderItem.objects.filter(order__in=orders).values_list('id', flat=True))
+            with CaptureQueriesContext(connection) as ctx:
+                OrderService.bulk_update_order_item_status(ids, 'preparing')
+            return len(ctx.captured_queries)
+
+        self.assertEqual(bump(1), bump(5))
+
+    def test_roll_up_only_moves_orders_forward(self):
+        orders = {status: self.make_order(status=status, items=1) for status in ('ready', 'delivered', 'canceled')}
+        ids = list(OrderItem.objects.filter(order__in=orders.values()).values_list('id', flat=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            result = OrderService.bulk_update_order_item_status(ids, 'preparing')
+        self.assertEqual(result['orders_updated'], [])
+        for status, order in orders.items():
+            order.refresh_from_db()
+            self.assertEqual(order.status, status)
+
+        result = OrderService.bulk_update_order_item_status(ids, 'delivered')
+        self.assertEqual(result['orders_updated'], [orders['ready'].id])
+
+    def test_bulk_orders(self):
+        orders = [self.make_order(table=table) for table in self.tables]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/orders/bulk_update_status/', {
+                'ids': [order.id for order in orders], 'status': 'delivered',
+            }, format='json')
+        self.assertEqual(sorted(response.data['updated']), sorted(order.id for order in orders))
+        self.assertEqual(len(TableService.get_available_tables()), 3)
+
+    def test_validation(self):
+        url = '/api/order-items/bulk_update_status/'
+        self.assertEqual(self.client.post(url, {'ids': [1], 'status': 'x'}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'ids': [], 'status': 'ready'}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'ids': [True], 'status': 'ready'}, format='json').status_code, 400)
+        with override_settings(BULK_STATUS_MAX_IDS=2):
+            response = self.client.post(url, {'ids': [1, 2, 3], 'status': 'ready'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchTests(ApiTestCase):
+    """Varias peticiones a la API en una sola llamada"""
+
+    def batch(self, requests, **options):
+        response = self.client.post('/api/batch/', {'requests': requests, **options}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_reads_in_one_call(self):
+        order = self.make_order()
+        data = self.batch([
+            {'url': f'/api/tables/{self.tables[0].id}/'},
+            {'url': f'/api/orders/by_table/?table_id={self.tables[0].id}'},
+            {'url': f'/api/payments/by_order/?order_id={order.id}'},
+            {'url': '/api/dishes/'},
+        ])
+        statuses = [item['status'] for item in data['responses']]
+        self.assertEqual(statuses, [200, 200, 200, 200])
+        self.assertEqual(data['responses'][1]['body']['results'][0]['id'], order.id)
+        self.assertIn('ETag', data['responses'][0]['headers'])
+
+    def test_conditional_sub_request(self):
+        etag = self.client.get('/api/dishes/')['ETag']
+        data = self.batch([{'url': '/api/dishes/', 'headers': {'If-None-Match': etag}}])
+        self.assertEqual(data['responses'][0]['status'], 304)
+
+    def test_atomic_write_batch_rolls_back(self):
+        data = self.batch([
+            {'method': 'POST', 'url': '/api/tables/', 'body': {'number': 50}},
+            {'method': 'POST', 'url': '/api/tables/', 'body': {'number': 50}},
+        ], atomic=True)
+        self.assertTrue(data['rolled_back'])
+        self.assertEqual([item['status'] for item in data['responses']], [201, 400])
+        self.assertFalse(Table.objects.filter(number=50).exists())
+
+    def test_non_atomic_keeps_successes(self):
+        data = self.batch([
+            {'method': 'POST', 'url': '/api/tables/', 'body': {'number': 60}},
+            {'url': '/api/batch/'},
+            {'url': '/api/async/dishes/'},
+        ])
+        self.assertEqual([item['status'] for item in data['responses']], [201, 404, 404])
+        self.assertTrue(Table.objects.filter(number=60).exists())
+
+    def test_sub_request_errors_stay_in_their_entry(self):
+        day = timezone.localdate().isoformat()
+        with mock.patch.object(TableService, 'get_all_tables', side_effect=RuntimeError('boom')), \
+                self.assertLogs('api.batch', 'ERROR'):
+            data = self.batch([
+                {'method': 'POST', 'url': '/api/tables/', 'body': {'number': 61}},
+                {'url': '/api/tables/'},
+                {'url': f'/api/orders/export/?start={day}'},
+            ])
+        self.assertEqual([item['status'] for item in data['responses']], [201, 500, 400])
+        self.assertTrue(Table.objects.filter(number=61).exists())
+
+    def test_requires_authentication(self):
+        response = APIClient().post('/api/batch/', {'requests': [{'url': '/api/dishes/'}]}, format='json')
+        self.assertIn(response.status_code, (401, 403))
+
+
+class SparseFieldsetTests(ApiTestCase):
+    """Los listados aceptan ?fields= / ?include= y se serializan por proyección"""
+
+    def test_projection_matches_model_serializer(self):
+        orders = [self.make_order(), self.make_order(table=self.tables[1], items=1)]
+        Order.objects.filter(pk=orders[1].pk).update(customer=None)
+        Payment.objects.create(order=orders[0], amount=5, payment_method='cash')
+        request = self.client.get('/api/orders/').wsgi_request
+        for url, queryset, serializer_class in (
+            ('/api/orders/', OrderService.get_all_orders(), OrderSerializer),
+            ('/api/order-items/', OrderService.get_all_order_items().order_by('-created_at'), OrderItemSerializer),
+            ('/api/payments/', Payment.objects.order_by('-created_at'), PaymentSerializer),
+        ):
+            expected = serializer_class(queryset, many=True, context={'request': request}).data
+            self.assertEqual(self.client.get(url).data['results'], expected, url)
+
+    def test_fields_restricts_output(self):
+        self.make_order()
+        response = self.client.get('/api/orders/?fields=id,status,total_amount')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'status', 'total_amount'})
+        self.assertNotIn('customer_details', self.client.get('/api/orders/').data['results'][0])
+
+    def test_include_expands_customer(self):
+        self.make_order()
+        row = self.client.get('/api/orders/?fields=id&include=customer').data['results'][0]
+        self.assertEqual(row['customer_details']['document_number'], '123')
+        self.assertEqual(set(row), {'id', 'customer_details'})
+
+    def test_unselected_nested_lists_are_not_loaded(self):
+        for _ in range(3):
+            self.make_order()
+        full = self.count_queries('/api/orders/')
+        self.assertEqual(self.count_queries('/api/orders/?fields=id,status'), full - 1)
+        self.assertEqual(self.count_queries('/api/orders/?fields=id&include=customer'), full - 1)
+
+
+class RendererTests(ApiTestCase):
+    """El renderer y el parser rápidos producen lo mismo que los de DRF"""
+
+    def test_output_matches_drf_renderer(self):
+        self.make_order()
+        orders = self.client.get('/api/orders/').data
+        payload = {
+            'orders': orders,
+            'raw': [Decimal('12.30'), timezone.now(), 'línea\u2028separada', {1: 'clave numérica'}],
+        }
+        self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+        self.assertEqual(orders['results'][0]['total_amount'], '44.00')
+
+    def test_parse_error_is_bad_request(self):
+        response = self.client.post('/api/tables/', data='{"number": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/tables/', data='{"number": 90}', content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_gzip_is_negotiated(self):
+        for _ in range(3):
+            self.make_order()
+        plain = self.client.get('/api/orders/')
+        compressed = self.client.get('/api/orders/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(ApiTestCase):
+    """Las lecturas marcadas van a la réplica salvo tras una escritura"""
+
+    def test_marked_reads_use_replica(self):
+        with replicas.pinning(False):
+            self.assertEqual(OrderService.get_all_orders().db, 'replica')
+            self.assertEqual(OrderService.get_orders_by_customer(self.customer.id).db, 'replica')
+            self.assertEqual(PaymentService.get_payments_by_order(1).db, 'replica')
+            # Las lecturas sin marcar y las que alimentan el mapa de ocupación siguen en la principal
+            self.assertEqual(TableService.get_busy_orders().db, 'default')
+
+            probe = replicas.replica_safe(lambda: ReplicaRouter().db_for_read(Order))
+            self.assertEqual(probe(), 'replica')
+            self.assertIsNone(ReplicaRouter().db_for_read(Order))
+
+    def test_write_pins_to_primary(self):
+        with replicas.pinning(False):
+            Table.objects.filter(number=1).update(is_active=True)
+            self.assertEqual(OrderService.get_all_orders().db, 'default')
+        with replicas.pinning(False):
+            self.assertEqual(OrderService.get_all_orders().db, 'replica')
+
+    def test_middleware_pins_writers(self):
+        seen = []
+        middleware = ReplicaPinMiddleware(lambda request: seen.append(replicas.read_alias()) or HttpResponse())
+        factory = RequestFactory()
+        self.assertNotIn(replicas.PIN_COOKIE, middleware(factory.get('/')).cookies)
+        response = middleware(factory.post('/'))
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+        request = factory.get('/')
+        request.COOKIES[replicas.PIN_COOKIE] = '1'
+        middleware(request)
+        self.assertEqual(seen, ['replica', 'default', 'default'])
+
+    def test_write_request_sets_cookie(self):
+        response = self.client.post('/api/tables/', {'number': 70}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+        self.assertNotIn(replicas.PIN_COOKIE, self.client.get('/api/tables/').cookies)
+
+    def test_write_refreshes_pin_cookie(self):
+        # Una segunda escritura dentro del plazo lo renueva; las lecturas no
+        self.client.cookies[replicas.PIN_COOKIE] = '1'
+        response = self.client.post('/api/tables/', {'number': 71}, format='json')
+        self.assertEqual(response.cookies[replicas.PIN_COOKIE]['max-age'], 5)
+        self.assertNotIn(replicas.PIN_COOKIE, self.client.get('/api/tables/').cookies)
+
+        def write(request):
+            Table.objects.filter(number=1).update(is_active=True)
+            return HttpResponse()
+
+        middleware = ReplicaPinMiddleware(write)
+        request = RequestFactory().get('/')
+        request.COOKIES[replicas.PIN_COOKIE] = '1'
+        self.assertIn(replicas.PIN_COOKIE, middleware(request).cookies)
+
+
+class BenchmarkToolsTests(ApiTestCase):
+    """El generador de datos deja totales coherentes y el benchmark recorre todos los endpoints"""
+
+    def generate(self):
+        call_command(
+            'generate_restaurant_data', tables=3, categories=2, dishes=4, customers=5, orders=40,
+            days=2, seed=1, waiter='waiter', stdout=StringIO()
+        )
+
+    def test_generated_data_is_consistent(self):
+        self.generate()
+        self.assertEqual(Order.objects.count(), 40)
+        for order in Order.objects.prefetch_related('orderitem_set', 'payment_set'):
+            self.assertEqual(order.total_amount, order.calculate_total())
+            self.assertEqual(order.amount_paid, sum(payment.amount for payment in order.payment_set.all()))
+        self.assertTrue(DailySales.objects.exists())
+        out = StringIO()
+        call_command('reconcile_payments', stdout=out)
+        self.assertIn('conciliados', out.getvalue())
+
+    def test_benchmark_writes_report(self):
+        self.generate()
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'run.json')
+            call_command(
+                'benchmark_endpoints', username='waiter', requests=2, concurrency=1, output=output,
+                stdout=StringIO()
+            )
+            with open(output) as report_file:
+                report = json.load(report_file)
+        names = {endpoint['name'] for endpoint in report['endpoints']}
+        self.assertTrue({'order-list', 'order-by-table', 'async-order-detail', 'batch'} <= names)
+        for endpoint in report['endpoints']:
+            self.assertEqual(endpoint['errors'], 0, endpoint['name'])
+            self.assertEqual(endpoint['requests'], 2)
+
+
+class MetricsTests(ApiTestCase):
+    """El middleware registra tiempo, SQL y serialización por acción y /metrics los expone"""
+
+    def setUp(self):
+        super().setUp()
+        metrics.registry.clear()
+
+    def series(self, name, view):
+        labels = (('view', view),)
+        return dict(metrics.registry.histograms[(name, labels)].samples())
+
+    def test_records_per_action(self):
+        self.make_order()
+        queries = self.count_queries(f'/api/orders/by_table/?table_id={self.tables[0].id}')
+        sql = self.series('waiterdnd_request_queries', 'OrderViewSet.by_table')
+        self.assertEqual((sql['count'], sql['sum']), (1, queries))
+        self.assertGreater(self.series('waiterdnd_request_serialization_seconds', 'OrderViewSet.by_table')['sum'], 0)
+
+        self.client.get('/api/tables/available/')
+        # Vista asíncrona a través de la cadena de middleware ASGI
+        self.client.force_login(self.user)
+        self.async_client.cookies = self.client.cookies
+        response = async_to_sync(self.async_client.get)(f'/api/async/orders/{Order.objects.first().id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(self.series('waiterdnd_request_queries', 'api.async_views.order_detail')['sum'], 0)
+
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('# TYPE waiterdnd_request_duration_seconds histogram', body)
+        self.assertIn('waiterdnd_request_duration_seconds_count{view="TableViewSet.available"} 1', body)
+        self.assertIn('waiterdnd_request_duration_seconds_count{view="api.async_views.order_detail"} 1', body)
+        self.assertIn(
+            'waiterdnd_requests_total{view="OrderViewSet.by_table",method="GET",status="200"} 1', body
+        )
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.0/8'], METRICS_TOKEN='s3cret')
+    def test_scrape_is_restricted(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer nope'}).status_code, 403)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code, 200)
+
+    @override_settings(SLOW_QUERY_SECONDS=0)
+    def test_slow_query_log(self):
+        with self.assertLogs('api.slow_queries', level='WARNING') as logs:
+            self.client.get('/api/tables/')
+        self.assertIn('TableViewSet.list', logs.output[0])
+        self.assertGreater(metrics.registry.counters[('waiterdnd_slow_queries_total', (('view', 'TableViewSet.list'),))], 0)
+
+
+class ExportTests(ApiTestCase):
+    """Las exportaciones contables salen en streaming, por rango de fechas, en CSV o NDJSON"""
+
+    def setUp(self):
+        super().setUp()
+        self.order = self.make_order(items=2)
+        PaymentService.create_payment(self.order.id, '10.00', 'card')
+        old = self.make_order(items=1)
+        Order.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=3))
+        self.today = timezone.localdate().isoformat()
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_orders_csv(self):
+        response = self.client.get(f'/api/orders/export/?start={self.today}')
+        self.assertIn('attachment; filename="orders-', response['Content-Disposition'])
+        rows = self.read(response).splitlines()
+        self.assertTrue(rows[0].startswith('order_id,created_at,status'))
+        # Una fila por item, solo de la orden de hoy
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(row.startswith(f'{self.order.id},') for row in rows[1:]))
+        self.assertIn('card 10.00', rows[1])
+
+    def test_orders_ndjson(self):
+        body = self.read(self.client.get(f'/api/orders/export/?start={self.today}&type=ndjson'))
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([record['id'] for record in records], [self.order.id])
+        self.assertEqual(len(records[0]['items']), 2)
+        self.assertEqual(records[0]['payments'][0]['amount'], '10.00')
+        self.assertEqual(records[0]['amount_paid'], '10.00')
+
+    def test_payments_and_validation(self):
+        body = self.read(self.client.get(f'/api/payments/export/?start={self.today}&type=ndjson'))
+        self.assertEqual(json.loads(body)['order_id'], self.order.id)
+        self.assertEqual(self.client.get('/api/orders/export/').status_code, 400)
+        self.assertEqual(self.client.get(f'/api/orders/export/?start={self.today}&type=xml').status_code, 400)
+        yesterday = (timezone.localdate() - timedelta(days=1)).isoformat()
+        response = self.client.get(f'/api/orders/export/?start={self.today}&end={yesterday}')
+        self.assertEqual(response.status_code, 400)
+
+    def test_csv_neutralizes_formulas(self):
+        Customer.objects.filter(pk=self.customer.pk).update(name='=HYPERLINK("http://x")')
+        rows = list(csv.reader(self.read(self.client.get(f'/api/orders/export/?start={self.today}')).splitlines()))
+        self.assertEqual(rows[1][ORDER_COLUMNS.index('customer_name')], '\'=HYPERLINK("http://x")')
+        self.assertEqual(rows[1][ORDER_COLUMNS.index('total_amount')], str(self.order.calculate_total()))
+
+    def test_export_command(self):
+        out = StringIO()
+        start = (timezone.localdate() - timedelta(days=5)).isoformat()
+        call_command(
+            'export_orders', f'--start={start}', f'--end={self.today}', '--type=ndjson', '--chunk-size=1', stdout=out
+        )
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+
+class ArchiveTests(ApiTestCase):
+    """Las órdenes cerradas antiguas pasan al archivo y el historial y los reportes las siguen viendo"""
+
+    def setUp(self):
+        super().setUp()
+        self.old_day = timezone.now() - timedelta(days=120)
+        self.closed = self.closed_order(self.old_day)
+        self.recent = self.closed_order(timezone.now())
+        # Antigua pero sin pagar: sigue en las tablas calientes
+        self.unpaid = self.make_order(status='delivered', items=1)
+        Order.objects.filter(pk=self.unpaid.pk).update(created_at=self.old_day)
+
+    def closed_order(self, created_at):
+        order = self.make_order(status='delivered')
+        order.refresh_from_db()
+        PaymentService.create_payment(order.id, order.total_amount, 'card')
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        return order
+
+    def test_moves_closed_orders_in_batches(self):
+        out = StringIO()
+        call_command('archive_orders', '--dry-run', stdout=out)
+        self.assertIn('1 órdenes', out.getvalue())
+        self.closed_order(self.old_day)
+
+        self.assertEqual(ArchiveService.archive_orders(batch_size=1), 2)
+        self.assertFalse(Order.objects.filter(pk=self.closed.pk).exists())
+        self.assertEqual(Order.objects.filter(pk__in=[self.recent.pk, self.unpaid.pk]).count(), 2)
+        archived = ArchivedOrder.objects.get(pk=self.closed.pk)
+        self.assertEqual(archived.total_amount, self.closed.total_amount)
+        self.assertEqual(archived.items.count(), 2)
+        self.assertEqual(archived.payments.get().amount, self.closed.total_amount)
+        self.assertFalse(OrderItem.objects.filter(order_id=self.closed.pk).exists())
+        self.assertFalse(Payment.objects.filter(order_id=self.closed.pk).exists())
+
+    def test_history_reads_hot_and_archive(self):
+        ArchiveService.archive_orders()
+        response = self.client.get(f'/api/orders/by_customer/?customer_id={self.customer.id}')
+        self.assertEqual(response.status_code, 200)
+        results = {order['id']: order for order in response.json()['results']}
+        self.assertEqual(set(results), {self.closed.pk, self.recent.pk, self.unpaid.pk})
+        self.assertEqual(len(results[self.closed.pk]['items']), 2)
+        self.assertEqual(results[self.closed.pk]['customer_name'], 'Ana')
+
+        day = timezone.localtime(self.old_day).date()
+        sales = self.client.get(f'/api/orders/daily_sales/?date={day.isoformat()}').json()
+        self.assertEqual(Decimal(str(sales['total_sales'])), self.closed.total_amount)
+        SalesReportService.rebuild()
+        self.assertEqual(DailySales.objects.get(date=day).total_sales, self.closed.total_amount)
+
+        body = b''.join(self.client.get(f'/api/orders/export/?start={day}&type=ndjson').streaming_content)
+        self.assertEqual([json.loads(line)['id'] for line in body.splitlines()], [self.closed.pk, self.unpaid.pk])
+
+
+class SearchTests(ApiTestCase):
+    """Búsqueda parcial indexada de clientes y platos, sincronizada con los cambios"""
+
+    def test_customer_search(self):
+        other = Customer.objects.create(
+            document_number='98765', name='Andrés Gómez', email='andres@example.com', phone='300 123 4567'
+        )
+        for query in ('andres', 'GÓM', 'and góm', '3001234', '9876'):
+            response = self.client.get('/api/customers/search/', {'q': query})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([customer['id'] for customer in response.json()], [other.id], query)
+        self.assertEqual({c['id'] for c in self.client.get('/api/customers/search/?q=an').json()},
+                         {other.id, self.customer.id})
+
+        other.name = 'Beatriz'
+        other.save()
+        self.assertEqual(self.client.get('/api/customers/search/?q=gomez').json(), [])
+        other.delete()
+        self.assertEqual(self.client.get('/api/customers/search/?q=beat').json(), [])
+        self.assertEqual(self.client.get('/api/customers/search/').status_code, 400)
+        self.assertEqual(self.client.get('/api/customers/search/?q=an&limit=500').status_code, 400)
+
+    def test_dish_search_and_autocomplete(self):
+        dish = Dish.objects.create(name='Ajiaco santafereño', price=Decimal('25.00'), category=self.category)
+        response = self.client.get('/api/dishes/search/?q=santaf')
+        self.assertEqual([found['id'] for found in response.json()], [dish.id])
+        self.assertEqual(len(self.client.get('/api/dishes/search/?q=plato').json()), 3)
+
+        # Los platos no disponibles no ocupan el límite de resultados
+        Dish.objects.bulk_create([
+            Dish(name=f'Pasta carbonara {i}', price=Decimal('20.00'), category=self.category, is_available=False)
+            for i in range(5)
+        ])
+        search.rebuild(Dish)
+        pesto = Dish.objects.create(name='Pasta al pesto', price=Decimal('18.00'), category=self.category)
+        self.assertEqual(DishService.search_dishes('pasta', 5), [pesto])
+        self.assertEqual(len(DishService.search_dishes('pasta', 10, available_only=False)), 6)
+
+        response = self.client.get('/api/dishes/autocomplete/?q=aji')
+        self.assertEqual(response.json(), [{
+            'id': dish.id, 'name': 'Ajiaco santafereño', 'price': '25.00',
+            'category': self.category.id, 'category_name': 'Platos fuertes',
+        }])
+        # El índice en memoria responde sin consultas mientras el menú no cambie
+        with self.assertNumQueries(0):
+            self.assertEqual(len(DishService.autocomplete_dishes('pla', 2)), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            dish.name = 'Sancocho'
+            dish.save()
+        self.assertEqual(DishService.autocomplete_dishes('aji', 5), [])
+        self.assertEqual([found['id'] for found in DishService.autocomplete_dishes('sanc', 5)], [dish.id])
+
+
+@override_settings(DISH_IMAGE_WORKERS=0)
+class DishImageTests(ApiTestCase):
+    """Las fotos de los platos se sirven como variantes redimensionadas con cache inmutable"""
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+
+    def upload(self, size=(2000, 1500), color='red'):
+        buffer = BytesIO()
+        Image.new('RGB', size, color).save(buffer, 'JPEG')
+        return SimpleUploadedFile('ajiaco.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_variants_generated_on_save(self):
+        dish = self.dishes[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            dish.image = self.upload()
+            dish.save()
+        dish.refresh_from_db()
+        self.assertEqual(dish.image_variants['source'], dish.image.name)
+        for variant, (width, height, crop) in images.VARIANTS.items():
+            with default_storage.open(dish.image_variants[variant]) as variant_file:
+                self.assertEqual(Image.open(variant_file).size, (width, height) if crop else (1600, 1200))
+
+        data = self.client.get(f'/api/dishes/{dish.id}/').json()
+        self.assertEqual(set(data['image_variants']), {'thumbnail', 'card', 'full'})
+        response = self.client.get(data['image_variants']['thumbnail'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(response['Cache-Control'], images.CACHE_CONTROL)
+        cached = self.client.get(data['image_variants']['thumbnail'], HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        # Una imagen nueva produce otros nombres; sin imagen no hay variantes
+        with self.captureOnCommitCallbacks(execute=True):
+            dish.image = self.upload(color='blue')
+            dish.save()
+        dish.refresh_from_db()
+        self.assertNotEqual(dish.image_variants['thumbnail'], data['image_variants']['thumbnail'].split('/media/')[1])
+        dish.image = None
+        dish.save()
+        self.assertEqual(self.client.get(f'/api/dishes/{dish.id}/').json()['image_variants'], {})
+
+    def test_backfill_command(self):
+        Dish.objects.filter(pk=self.dishes[1].pk).update(image=default_storage.save('dishes/old.jpg', self.upload()))
+        out = StringIO()
+        call_command('generate_dish_images', stdout=out)
+        self.assertIn('1 platos', out.getvalue())
+        self.assertIn('card', Dish.objects.get(pk=self.dishes[1].pk).image_variants)
+
+
+class IdempotencyTests(ApiTestCase):
+    """Los reintentos con Idempotency-Key devuelven la primera respuesta sin volver a crear nada"""
+
+    def post(self, url, payload, key):
+        return self.client.post(url, payload, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_order_retry_replays_response(self):
+        payload = {'table': self.tables[0].id, 'items': [{'dish': self.dishes[0].id, 'quantity': 1}]}
+        first = self.post('/api/orders/', payload, 'order-1')
+        self.assertEqual(first.status_code, 201)
+        with CaptureQueriesContext(connection) as ctx:
+            retry = self.post('/api/orders/', payload, 'order-1')
+        self.assertEqual((retry.status_code, retry.json()), (201, first.json()))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertFalse(any('api_order' in query['sql'] for query in ctx.captured_queries))
+        self.assertEqual(Order.objects.count(), 1)
+
+        # Otra clave crea otra orden; la misma clave con otro cuerpo es un error
+        self.assertEqual(self.post('/api/orders/', payload, 'order-2').status_code, 201)
+        payload['table'] = self.tables[1].id
+        self.assertEqual(self.post('/api/orders/', payload, 'order-1').status_code, 422)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_payment_retry_charges_once(self):
+        order = self.make_order()
+        payload = {'order': order.id, 'amount': '5.00', 'payment_method': 'card'}
+        for _ in range(3):
+            self.assertEqual(self.post('/api/payments/', payload, 'pay-1').status_code, 201)
+        order.refresh_from_db()
+        self.assertEqual(order.amount_paid, Decimal('5.00'))
+        self.assertEqual(Payment.objects.count(), 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0.1)
+    def test_in_progress_and_stale_keys(self):
+        order = self.make_order()
+        payload = {'order': order.id, 'amount': '5.00', 'payment_method': 'card'}
+        response = self.post('/api/payments/', payload, 'pay-2')
+        record = IdempotencyKey.objects.get(key='pay-2')
+        # Simula la primera petición aún en curso
+        IdempotencyKey.objects.filter(pk=record.pk).update(status_code=None)
+        self.assertEqual(self.post('/api/payments/', payload, 'pay-2').status_code, 409)
+
+        # Abandonada (el proceso murió): la siguiente petición la reclama y se ejecuta
+        IdempotencyKey.objects.filter(pk=record.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.post('/api/payments/', payload, 'pay-2').status_code, 201)
+        self.assertEqual(Payment.objects.count(), 2)
+        self.assertNotEqual(response.json()['id'], IdempotencyKey.objects.get(key='pay-2').response['id'])
+
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        out = StringIO()
+        call_command('purge_idempotency_keys', stdout=out)
+        self.assertIn('1 claves', out.getvalue())
+
+    def test_validation_error_releases_key(self):
+        payload = {'table': self.tables[0].id, 'items': [{'dish': 999999, 'quantity': 1}]}
+        self.assertEqual(self.post('/api/orders/', payload, 'bad').status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class JobTests(ApiTestCase):
+    """Los efectos secundarios de los pagos corren en la cola en base de datos, con reintentos"""
+
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+        metrics.registry.clear()
+        jobs.register('tests.flaky', max_attempts=2)(self.flaky)
+        self.addCleanup(jobs.HANDLERS.pop, 'tests.flaky')
+
+    def flaky(self, fail):
+        self.calls.append(fail)
+        if fail:
+            raise RuntimeError('sin conexión con la impresora')
+
+    def test_payment_side_effects_run_after_commit(self):
+        order = self.make_order(items=2)
+        order.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            PaymentService.create_payment(order.id, order.total_amount, 'card')
+            self.assertFalse(Job.objects.exists())
+        self.assertEqual(list(Job.objects.values_list('name', flat=True)), ['sales.record_paid_order'])
+        self.assertFalse(DailySales.objects.exists())
+
+        out = StringIO()
+        call_command('run_jobs', '--once', '--threads=1', stdout=out)
+        self.assertIn('1 tareas', out.getvalue())
+        self.assertEqual(DailySales.objects.get().order_count, 1)
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.loyalty_points, 0)
+        self.assertEqual(Job.objects.get().status, 'succeeded')
+
+    @override_settings(LOYALTY_SPEND_PER_POINT=10)
+    def test_loyalty_points_when_enabled(self):
+        order = self.make_order(items=2)
+        order.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            PaymentService.create_payment(order.id, order.total_amount, 'card')
+        self.assertEqual(jobs.run_pending(), 2)
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.loyalty_points, int(order.total_amount // 10))
+
+    def test_retries_with_backoff(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.enqueue('tests.flaky', fail=True)
+        self.assertEqual(jobs.run_pending(), 1)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn('impresora', job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+        # No vuelve a ejecutarse hasta que vence la espera
+        self.assertEqual(jobs.run_pending(), 0)
+
+        Job.objects.update(run_at=timezone.now())
+        jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertEqual(self.calls, [True, True])
+
+        # El estado de la cola sale de la base: lo ve /metrics de cualquier worker web
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('waiterdnd_jobs{job="tests.flaky",status="failed"} 1', body)
+
+        # Los resultados y duraciones son del proceso que ejecuta las tareas (run_jobs
+        # --metrics-port); los collectors de la base se omiten porque el hilo del servidor
+        # no ve la transacción de la prueba
+        with mock.patch.object(metrics.registry, 'collectors', []):
+            server = metrics.serve(0)
+            self.addCleanup(server.server_close)
+            self.addCleanup(server.shutdown)
+            body = urlopen(f'http://127.0.0.1:{server.server_port}/metrics').read().decode()
+        self.assertIn('waiterdnd_jobs_total{job="tests.flaky",outcome="failed"} 1', body)
+        self.assertIn('waiterdnd_job_duration_seconds_count{job="tests.flaky"} 2', body)
+
+    @override_settings(JOBS_RUN_INLINE=True)
+    def test_inline_without_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.enqueue('tests.flaky', fail=False)
+        self.assertEqual(self.calls, [False])
+        self.assertEqual(Job.objects.get().status, 'succeeded')
+
+    def test_stale_jobs_requeued(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.enqueue('tests.flaky', fail=False)
+        Job.objects.update(status='running', locked_by='muerto', locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(Job.objects.get().status, 'succeeded')
+        self.assertEqual(self.calls, [False])
+
+    def test_reclaimed_job_rolls_back(self):
+        jobs.register('tests.write')(lambda: Category.objects.create(name='Efecto'))
+        self.addCleanup(jobs.HANDLERS.pop, 'tests.write')
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.enqueue('tests.write')
+        [stale] = jobs.claim('worker', 1)
+        # Mientras corre pasa JOBS_LOCK_SECONDS y el mismo proceso la vuelve a reclamar
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        jobs.requeue_stale()
+        [current] = jobs.claim('worker', 1)
+
+        self.assertEqual(jobs.execute(stale), 'lost')
+        self.assertFalse(Category.objects.filter(name='Efecto').exists())
+        self.assertEqual(Job.objects.get().status, 'running')
+        self.assertEqual(jobs.execute(current), 'succeeded')
+        self.assertEqual(Category.objects.filter(name='Efecto').count(), 1)
@@ -1,5 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
+from .batch import BatchView
 from .views import (
     CategoryViewSet, DishViewSet, TableViewSet, CustomerViewSet,
     OrderViewSet, OrderItemViewSet, PaymentViewSet
@@ -14,6 +16,19 @@ router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'order-items', OrderItemViewSet, basename='order-item')
 router.register(r'payments', PaymentViewSet, basename='payment')
 
+# Lecturas calientes en versión asíncrona (ASGI)
+async_urlpatterns = [
+    path('categories/', async_views.menu_categories, name='async-categories'),
+    path('dishes/', async_views.menu_dishes, name='async-dishes'),
+    path('dishes/featured/', async_views.featured_dishes, name='async-featured-dishes'),
+    path('tables/available/', async_views.available_tables, name='async-available-tables'),
+    path('orders/by_table/', async_views.orders_by_table, name='async-orders-by-table'),
+    path('orders/<int:pk>/', async_views.order_detail, name='async-order-detail'),
+]
+
 urlpatterns = [
     path('', include(router.urls)),
-]
\ No newline at end of file
+    path('async/', include(async_urlpatterns)),
+    path('batch/', BatchView.as_view(), name='batch'),
+    path('events/', async_views.order_events, name='order-events'),
+]
@@ -1,27 +1,94 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from datetime import datetime
+from decimal import InvalidOperation
+from . import exports
 from .models import Category, Dish, Table, Customer, Order, OrderItem, Payment
 from .serializers import (
     CategorySerializer, DishSerializer, TableSerializer, CustomerSerializer,
-    OrderSerializer, OrderCreateSerializer, OrderItemSerializer, PaymentSerializer
+    OrderSerializer, OrderCreateSerializer, OrderHistorySerializer, OrderItemSerializer, PaymentSerializer
 )
+from .idempotency import idempotent
+from .mixins import ConditionalGetMixin, MenuCacheMixin
+from .pagination import CreatedAtCursorPagination
 from .services import (
     CategoryService, DishService, TableService, CustomerService,
-    OrderService, PaymentService
+    OrderService, PaymentService, SalesReportService
 )
 
-class CategoryViewSet(viewsets.ModelViewSet):
+def parse_bulk_status(data):
+    """Valida el cuerpo {"ids": [...], "status": "..."} de los cambios de estado en bloque"""
+    ids, new_status = data.get('ids'), data.get('status')
+    if new_status not in dict(Order.STATUS_CHOICES):
+        return None, None, Response({"error": "A valid status is required"}, status=status.HTTP_400_BAD_REQUEST)
+    # bool es subclase de int: true/false no son ids
+    if not isinstance(ids, list) or not ids or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+        return None, None, Response({"error": "A non-empty list of ids is required"},
+                                    status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) > settings.BULK_STATUS_MAX_IDS:
+        return None, None, Response({"error": f"At most {settings.BULK_STATUS_MAX_IDS} ids per request"},
+                                    status=status.HTTP_400_BAD_REQUEST)
+    return ids, new_status, None
+
+def parse_search(query_params):
+    """Valida ?q= y ?limit= de los endpoints de búsqueda"""
+    query = query_params.get('q', '').strip()
+    if not query:
+        return None, None, Response({"error": "Search query is required"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = int(query_params.get('limit', settings.SEARCH_DEFAULT_RESULTS))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= settings.SEARCH_MAX_RESULTS:
+        return None, None, Response({"error": f"limit must be between 1 and {settings.SEARCH_MAX_RESULTS}"},
+                                    status=status.HTTP_400_BAD_REQUEST)
+    return query, limit, None
+
+def export_response(request, resource):
+    """Exportación en streaming (CSV o NDJSON) de `resource` para ?start=&end=&type="""
+    file_format = request.query_params.get('type', 'csv')
+    if file_format not in exports.FORMATS:
+        return Response({"error": f"type must be one of: {', '.join(exports.FORMATS)}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        start = datetime.strptime(request.query_params['start'], '%Y-%m-%d').date()
+        end = datetime.strptime(request.query_params.get('end', request.query_params['start']), '%Y-%m-%d').date()
+    except KeyError:
+        return Response({"error": "Start date is required"}, status=status.HTTP_400_BAD_REQUEST)
+    except ValueError:
+        return Response({"error": "Invalid date format. Use YYYY-MM-DD"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if end < start:
+        return Response({"error": "End date must not be before start date"}, status=status.HTTP_400_BAD_REQUEST)
+    
+    response = StreamingHttpResponse(
+        exports.stream(resource, file_format, start, end), content_type=exports.FORMATS[file_format]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{exports.filename(resource, file_format, start, end)}"'
+    return response
+
+class CategoryViewSet(ConditionalGetMixin, MenuCacheMixin, viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         active_only = self.request.query_params.get('active_only', 'true').lower() == 'true'
         return CategoryService.get_all_categories(active_only=active_only)
+    
+    def list(self, request, *args, **kwargs):
+        active_only = request.query_params.get('active_only', 'true').lower() == 'true'
+        return self.conditional(self.menu_validators(), lambda: Response(
+            CategoryService.get_cached_categories(
+                self.serialize_list, active_only=active_only, variant=self.cache_variant()
+            )
+        ))
 
-class DishViewSet(viewsets.ModelViewSet):
+class DishViewSet(ConditionalGetMixin, MenuCacheMixin, viewsets.ModelViewSet):
     serializer_class = DishSerializer
     permission_classes = [IsAuthenticated]
     
@@ -30,13 +97,43 @@ class DishViewSet(viewsets.ModelViewSet):
         category_id = self.request.query_params.get('category_id')
         return DishService.get_all_dishes(available_only=available_only, category_id=category_id)
     
+    def list(self, request, *args, **kwargs):
+        available_only = request.query_params.get('available_only', 'true').lower() == 'true'
+        category_id = request.query_params.get('category_id')
+        return self.conditional(self.menu_validators(), lambda: Response(
+            DishService.get_cached_dishes(
+                self.serialize_list, available_only=available_only,
+                category_id=category_id, variant=self.cache_variant()
+            )
+        ))
+    
     @action(detail=False, methods=['GET'])
     def featured(self, request):
-        dishes = DishService.get_featured_dishes()
-        serializer = self.get_serializer(dishes, many=True)
-        return Response(serializer.data)
+        return self.conditional(self.menu_validators(), lambda: Response(
+            DishService.get_cached_featured_dishes(self.serialize_list, variant=self.cache_variant())
+        ))
+    
+    @action(detail=False, methods=['GET'])
+    def search(self, request):
+        query, limit, error = parse_search(request.query_params)
+        if error:
+            return error
+        
+        available_only = request.query_params.get('available_only', 'true').lower() == 'true'
+        dishes = DishService.search_dishes(query, limit, available_only=available_only)
+        return Response(self.get_serializer(dishes, many=True).data)
+    
+    @action(detail=False, methods=['GET'])
+    def autocomplete(self, request):
+        query, limit, error = parse_search(request.query_params)
+        if error:
+            return error
+        
+        return self.conditional(self.menu_validators(), lambda: Response(
+            DishService.autocomplete_dishes(query, limit)
+        ))
 
-class TableViewSet(viewsets.ModelViewSet):
+class TableViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = TableSerializer
     permission_classes = [IsAuthenticated]
     
@@ -46,11 +143,13 @@ class TableViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['GET'])
     def available(self, request):
+        # La disponibilidad sale del mapa de ocupación: basta una consulta de mesas
         tables = TableService.get_available_tables()
-        serializer = self.get_serializer(tables, many=True)
-        return Response(serializer.data)
+        return self.conditional(self.page_validators(tables), lambda: Response(
+            self.get_serializer(tables, many=True).data
+        ))
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     permission_classes = [IsAuthenticated]
@@ -68,6 +167,15 @@ class CustomerViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(customer)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['GET'])
+    def search(self, request):
+        query, limit, error = parse_search(request.query_params)
+        if error:
+            return error
+        
+        customers = CustomerService.search_customers(query, limit)
+        return Response(self.get_serializer(customers, many=True).data)
+    
     @action(detail=True, methods=['POST'])
     def update_loyalty_points(self, request, pk=None):
         points_to_add = request.data.get('points', 0)
@@ -78,8 +186,10 @@ class CustomerViewSet(viewsets.ModelViewSet):
         except Customer.DoesNotExist:
             return Response({"error": "Customer not found"}, status=status.HTTP_404_NOT_FOUND)
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    projection_actions = ('list', 'by_table', 'by_customer')
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -90,11 +200,12 @@ class OrderViewSet(viewsets.ModelViewSet):
         status_filter = self.request.query_params.get('status')
         return OrderService.get_all_orders(status=status_filter)
     
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         order = OrderService.create_order(serializer.validated_data)
-        response_serializer = OrderSerializer(order)
+        response_serializer = OrderSerializer(OrderService.get_order_by_id(order.id))
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
     
     @action(detail=True, methods=['PATCH'])
@@ -110,6 +221,14 @@ class OrderViewSet(viewsets.ModelViewSet):
         except Order.DoesNotExist:
             return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
     
+    @action(detail=False, methods=['POST'])
+    def bulk_update_status(self, request):
+        order_ids, new_status, error = parse_bulk_status(request.data)
+        if error:
+            return error
+        
+        return Response(OrderService.bulk_update_order_status(order_ids, new_status))
+    
     @action(detail=False, methods=['GET'])
     def by_table(self, request):
         table_id = request.query_params.get('table_id')
@@ -117,8 +236,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             return Response({"error": "Table ID is required"}, status=status.HTTP_400_BAD_REQUEST)
         
         orders = OrderService.get_orders_by_table(table_id)
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        return self.conditional_list(orders, OrderSerializer)
     
     @action(detail=False, methods=['GET'])
     def by_customer(self, request):
@@ -127,8 +245,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             return Response({"error": "Customer ID is required"}, status=status.HTTP_400_BAD_REQUEST)
         
         orders = OrderService.get_orders_by_customer(customer_id)
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        return self.conditional_list(orders, OrderHistorySerializer)
     
     @action(detail=False, methods=['GET'])
     def daily_sales(self, request):
@@ -143,13 +260,37 @@ class OrderViewSet(viewsets.ModelViewSet):
         
         sales_data = OrderService.get_daily_sales(date=date)
         return Response(sales_data)
+    
+    @action(detail=False, methods=['GET'])
+    def sales_report(self, request):
+        group_by = request.query_params.get('group_by', 'day')
+        if group_by not in SalesReportService.GROUPINGS:
+            return Response({"error": f"group_by must be one of: {', '.join(SalesReportService.GROUPINGS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            start = datetime.strptime(request.query_params['start'], '%Y-%m-%d').date()
+            end = datetime.strptime(request.query_params.get('end', request.query_params['start']), '%Y-%m-%d').date()
+        except KeyError:
+            return Response({"error": "Start date is required"}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"error": "Invalid date format. Use YYYY-MM-DD"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(list(SalesReportService.get_sales(start, end, group_by=group_by)))
+    
+    @action(detail=False, methods=['GET'])
+    def export(self, request):
+        return export_response(request, 'orders')
 
-class OrderItemViewSet(viewsets.ModelViewSet):
+class OrderItemViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = OrderItemSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    projection_actions = ('list',)
     
     def get_queryset(self):
-        return OrderItem.objects.all()
+        return OrderService.get_all_order_items()
     
     @action(detail=True, methods=['PATCH'])
     def update_status(self, request, pk=None):
@@ -163,14 +304,25 @@ class OrderItemViewSet(viewsets.ModelViewSet):
             return Response(serializer.data)
         except OrderItem.DoesNotExist:
             return Response({"error": "Order item not found"}, status=status.HTTP_404_NOT_FOUND)
+    
+    @action(detail=False, methods=['POST'])
+    def bulk_update_status(self, request):
+        item_ids, new_status, error = parse_bulk_status(request.data)
+        if error:
+            return error
+        
+        return Response(OrderService.bulk_update_order_item_status(item_ids, new_status))
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    projection_actions = ('list', 'by_order')
     
     def get_queryset(self):
-        return Payment.objects.all()
+        return PaymentService.get_all_payments()
     
+    @idempotent
     def create(self, request, *args, **kwargs):
         order_id = request.data.get('order')
         amount = request.data.get('amount')
@@ -185,6 +337,8 @@ class PaymentViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         except Order.DoesNotExist:
             return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
+        except InvalidOperation:
+            return Response({"error": "Invalid amount"}, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=False, methods=['GET'])
     def by_order(self, request):
@@ -193,5 +347,8 @@ class PaymentViewSet(viewsets.ModelViewSet):
             return Response({"error": "Order ID is required"}, status=status.HTTP_400_BAD_REQUEST)
         
         payments = PaymentService.get_payments_by_order(order_id)
-        serializer = self.get_serializer(payments, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return self.conditional_list(payments)
+    
+    @action(detail=False, methods=['GET'])
+    def export(self, request):
+        return export_response(request, 'payments')
\ No newline at end of file
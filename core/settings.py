@@ -47,7 +47,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir la petición completa (ver /metrics)
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Comprime con gzip las respuestas a clientes que envían Accept-Encoding: gzip
+    'django.middleware.gzip.GZipMiddleware',
+    'api.replicas.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -92,6 +97,140 @@ DATABASES = {
     }
 }
 
+# Réplicas de solo lectura: alias de DATABASES a los que van las lecturas de los
+# servicios marcadas con @replica_safe (api/replicas.py). Para probar en local con
+# dos archivos SQLite:
+#
+#     DATABASES['replica'] = {
+#         'ENGINE': 'django.db.backends.sqlite3',
+#         'NAME': BASE_DIR / 'replica.sqlite3',
+#         'TEST': {'MIRROR': 'default'},
+#     }
+#     DATABASE_REPLICAS = ['replica']
+#
+# y copiar db.sqlite3 en replica.sqlite3 para simular la replicación (con dos
+# PostgreSQL locales, la réplica apunta al servidor en modo standby).
+
+DATABASE_REPLICAS = []
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+
+# Segundos que un cliente sigue leyendo de la principal después de escribir
+REPLICA_PIN_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Con varios procesos (workers de gunicorn/uvicorn) debe ser un backend compartido
+# (Redis, Memcached): la invalidación del menú y el mapa de ocupación se coordinan
+# a través de él. Con LocMemCache cada proceso tiene su propio cache, así que el menú
+# se cachea solo MENU_LOCAL_CACHE_SECONDS y la ocupación se lee de la base de datos.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'waiterdnd',
+    }
+}
+
+# Tiempo máximo que se conserva un payload del menú; la invalidación real es por versión
+MENU_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Con un cache local (no compartido) la versión del menú y sus payloads caducan a
+# los pocos segundos: es lo que puede tardar otro proceso en ver un cambio del menú
+MENU_LOCAL_CACHE_SECONDS = 30
+
+# Mapa de ocupación de mesas en el cache (/api/tables/available/). Requiere un cache
+# compartido por todos los procesos (Redis, Memcached): con None se usa solo si el
+# backend por defecto no es local; con LocMemCache y varios workers las mesas libres
+# se calculan desde la base de datos. True lo fuerza (un solo proceso), False lo desactiva.
+TABLE_OCCUPANCY_CACHE = None
+
+# Segundos tras los que el mapa se reconstruye desde la base aunque no falte nada
+TABLE_OCCUPANCY_REBUILD_SECONDS = 60 * 10
+
+
+# Eventos en tiempo real (SSE en /api/events/)
+# El broker en memoria reparte eventos dentro del proceso; un broker compartido
+# con la misma interfaz permite repartirlos entre varios procesos ASGI
+
+EVENT_BROKER = 'api.events.InProcessBroker'
+
+EVENT_HEARTBEAT_SECONDS = 15
+
+
+# Máximo de sub-peticiones por llamada a /api/batch/
+BATCH_MAX_REQUESTS = 20
+
+# Máximo de ids por cambio de estado en bloque (bulk_update_status): acota las filas
+# bloqueadas y actualizadas por una sola petición (el mismo tope que una página)
+BULK_STATUS_MAX_IDS = 200
+
+
+# Métricas por acción (tiempo, consultas SQL, serialización) expuestas en /metrics
+METRICS_ENABLED = True
+
+# Las consultas más lentas que esto se registran en el logger 'api.slow_queries' (None lo desactiva)
+SLOW_QUERY_SECONDS = 0.2
+
+# Quién puede leer /metrics (y el puerto de métricas de run_jobs): las IPs o redes de
+# METRICS_ALLOWED_IPS, o quien envíe "Authorization: Bearer <METRICS_TOKEN>".
+# Por defecto solo la propia máquina; añadir aquí la red del servidor de Prometheus
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+METRICS_TOKEN = None
+
+
+# Archivo de órdenes cerradas (ArchiveService / manage.py archive_orders)
+# Las órdenes entregadas y pagadas con más de estos días pasan a las tablas de archivo
+ARCHIVE_AFTER_DAYS = 90
+
+# Órdenes movidas por transacción: lotes cortos para no retener bloqueos
+ARCHIVE_BATCH_SIZE = 500
+
+
+# Resultados por defecto y máximos de /search/ y /autocomplete/ (?limit=)
+SEARCH_DEFAULT_RESULTS = 20
+SEARCH_MAX_RESULTS = 50
+
+
+# Cabecera Idempotency-Key en POST /api/orders/ y /api/payments/ (api/idempotency.py)
+# Tiempo que se guarda la primera respuesta para devolverla en los reintentos
+IDEMPOTENCY_KEY_TTL_SECONDS = 60 * 60 * 24
+
+# Espera máxima de un duplicado mientras la primera petición sigue en curso
+IDEMPOTENCY_WAIT_SECONDS = 10
+
+# Una clave en curso más antigua que esto se da por abandonada
+IDEMPOTENCY_STALE_SECONDS = 60
+
+
+# Tareas en segundo plano (api/jobs.py, manage.py run_jobs)
+# Requieren un proceso `manage.py run_jobs` junto a los workers web: sin él, entre
+# otras cosas, los acumulados de ventas dejan de actualizarse. Con JOBS_RUN_INLINE
+# (desarrollo, despliegues sin worker) las tareas se ejecutan en el proceso que las
+# encola, tras el commit; los reintentos esperan a la siguiente tarea encolada.
+JOBS_RUN_INLINE = False
+
+# Intentos por tarea y espera entre ellos: base * 2^(intento - 1), con tope
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_BASE_SECONDS = 5
+JOBS_RETRY_MAX_SECONDS = 60 * 30
+
+# Una tarea en ejecución más antigua que esto se da por perdida y vuelve a la cola
+JOBS_LOCK_SECONDS = 60 * 5
+
+# Tiempo que se conservan las tareas completadas (las fallidas no se borran)
+JOBS_KEEP_SECONDS = 60 * 60 * 24 * 7
+
+# run_jobs expone sus métricas (duración y resultado de las tareas) en este puerto
+# propio, ya que /metrics de los workers web no las ve; None no las expone
+JOBS_METRICS_PORT = None
+JOBS_METRICS_HOST = '127.0.0.1'
+
+# Un punto de fidelidad por cada tantas unidades pagadas, como tarea en segundo plano.
+# Desactivado (None): cambia los saldos de los clientes, así que se activa explícitamente
+LOYALTY_SPEND_PER_POINT = None
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -129,6 +268,14 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Archivos subidos (fotos de los platos y sus variantes)
+MEDIA_URL = 'media/'
+
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Hilos que generan las variantes de las fotos de los platos (0: en el hilo que guarda el plato)
+DISH_IMAGE_WORKERS = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -142,4 +289,14 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
+    # orjson en lugar del encoder JSON en Python puro de DRF
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
\ No newline at end of file
@@ -14,10 +14,17 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from api.images import VARIANTS_DIR, variant_view
+from api.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
-]
+    path('metrics', metrics_view, name='metrics'),
+    path(f"{settings.MEDIA_URL.lstrip('/')}{VARIANTS_DIR}/<str:name>", variant_view, name='dish-image-variant'),
+] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -119,6 +119,9 @@ export const api = {
     getByOrder: (orderId) => apiClient.get(`/payments/by_order/?order_id=${orderId}`),
     create: (data) => apiClient.post('/payments/', data),
   },
+  
+  // Batch: varias peticiones en un solo viaje, p. ej. [{ method: 'GET', url: '/api/tables/1/' }]
+  batch: (requests, atomic = false) => apiClient.post('/batch/', { requests, atomic }),
 };
 
 export default apiClient;
\ No newline at end of file